@@ -1,7 +1,9 @@
-from typing import Literal
-from pydantic import BaseModel, EmailStr
+from typing import Generic, Literal, TypeVar
+from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
 
+# items per batch request (likes, attendance, comments)
+MAX_BATCH_SIZE = 100
 
 class UserLogin(BaseModel):
     email: str
@@ -58,6 +60,36 @@ class EventBase(BaseModel):
     visibility: Literal["public", "private"]
     created_by: int
 
+class EventResponse(BaseModel):
+    id: int
+    title: str
+    description: str | None = None
+    location: str | None = None
+    datetime: datetime
+    visibility: str | None = None
+    created_by: int | None = None
+    created_at: datetime | None = None
+    like_count: int = 0
+    going_count: int = 0
+    interested_count: int = 0
+    comment_count: int = 0
+    latitude: float | None = None
+    longitude: float | None = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class NearbyEventResponse(EventResponse):
+    distance_km: float
+
+class FeedEventResponse(EventResponse):
+    score: float
+    friends_going: int
+    friends_interested: int
+    friends_liked: int
+    friends_created: int
+
 class EventUpdate(BaseModel):
     title: str | None = None
     description: str | None = None
@@ -78,6 +110,18 @@ class CommentBase(BaseModel):
     user_id: int
     content: str
 
+#GET /comments/{event_id} lists comments without their authors
+class PlainCommentResponse(CommentBase):
+    id: int
+    created_at: datetime | None = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class CommentResponse(PlainCommentResponse):
+    author: UserResponsePublic | None = Field(default=None, validation_alias="user")
+
 class Friendship(BaseModel):
     user_id: int
     friend_id: int
@@ -100,4 +144,99 @@ class MediaBase(BaseModel):
 class MediaResponse(MediaBase):
     id: int
     url: str
-    uploaded_at: datetime
\ No newline at end of file
+    uploaded_at: datetime
+    # uploaded files only (POST /media/upload)
+    content_type: str | None = None
+    size_bytes: int | None = None
+    width: int | None = None
+    height: int | None = None
+    variants: dict[str, str] | None = None
+    status: Literal["processing", "ready", "failed"] | None = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+#EVENT DETAIL (event page in one request)
+class EventDetailResponse(BaseModel):
+    event: EventResponse
+    attendance_counts: dict[str, int]
+    viewer_status: str | None = None
+    like_count: int
+    liked_by_viewer: bool
+    media: list[MediaResponse]
+    comments: list[CommentResponse]
+
+
+#SYNC (changes since a token, GET /sync)
+T = TypeVar("T")
+K = TypeVar("K")
+
+class LikeResponse(LikeBase):
+    created_at: datetime | None = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class AttendanceResponse(AttendanceBase):
+    timestamp: datetime | None = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class EventUserKey(BaseModel):
+    event_id: int
+    user_id: int
+
+class SyncChanges(BaseModel, Generic[T, K]):
+    upserted: list[T] = []
+    deleted: list[K] = []
+
+class SyncResponse(BaseModel):
+    token: str
+    has_more: bool = False
+    events: SyncChanges[EventResponse, int] = Field(default_factory=SyncChanges[EventResponse, int])
+    comments: SyncChanges[CommentResponse, int] = Field(default_factory=SyncChanges[CommentResponse, int])
+    likes: SyncChanges[LikeResponse, EventUserKey] = Field(default_factory=SyncChanges[LikeResponse, EventUserKey])
+    attendance: SyncChanges[AttendanceResponse, EventUserKey] = Field(default_factory=SyncChanges[AttendanceResponse, EventUserKey])
+
+
+#BATCHES (several writes of the current user in one request, e.g. actions queued offline)
+class LikeBatch(BaseModel):
+    event_ids: list[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+class AttendanceBatchItem(BaseModel):
+    event_id: int
+    status: Literal["going", "interested", "not going"]
+
+class AttendanceBatch(BaseModel):
+    items: list[AttendanceBatchItem] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+class CommentBatchItem(BaseModel):
+    event_id: int
+    content: str
+
+class CommentBatch(BaseModel):
+    comments: list[CommentBatchItem] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+class BatchItemResult(BaseModel):
+    event_id: int
+    # false: already done before, repeated in the batch, or no such event
+    changed: bool
+    comment_id: int | None = None
+
+class BatchResponse(BaseModel):
+    changed: int
+    results: list[BatchItemResult]
+
+    @classmethod
+    def of(cls, event_ids: list[int], changed: set[int]) -> "BatchResponse":
+        # one result per item, in order; an event repeated in the batch changes once
+        seen = set()
+        results = []
+        for event_id in event_ids:
+            results.append(BatchItemResult(event_id=event_id, changed=event_id in changed and event_id not in seen))
+            seen.add(event_id)
+        return cls(changed=len(changed), results=results)
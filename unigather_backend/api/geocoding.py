@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import re
+import unicodedata
+from typing import Optional
+
+import httpx
+
+from api.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+Coordinates = tuple[float, float]
+
+_COORDINATES = re.compile(r"^\s*(-?\d{1,2}(?:\.\d+)?)\s*[,;]\s*(-?\d{1,3}(?:\.\d+)?)\s*$")
+
+
+def _normalize(address: str) -> str:
+    # "Plac Grunwaldzki, Wrocław" -> "plac grunwaldzki wroclaw"
+    plain = unicodedata.normalize("NFKD", address.replace("ł", "l").replace("Ł", "L"))
+    plain = "".join(c for c in plain if not unicodedata.combining(c)).lower()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", plain).split())
+
+
+class OfflineGeocoder:
+    """
+    Resolves "lat, lon" strings and a small built-in list of places around the
+    campus, without any network access. The default, and what the tests use.
+    """
+
+    PLACES = {
+        "plac grunwaldzki": (51.1116, 17.0604),
+        "politechnika wroclawska": (51.1075, 17.0625),
+        "pwr": (51.1075, 17.0625),
+        "wybrzeze wyspianskiego 27": (51.1075, 17.0625),
+        "uniwersytet wroclawski": (51.1141, 17.0345),
+        "rynek": (51.1100, 17.0320),
+        "hala stulecia": (51.1069, 17.0773),
+        "ostrow tumski": (51.1143, 17.0465),
+        "dworzec glowny": (51.0982, 17.0367),
+        "pasaz grunwaldzki": (51.1123, 17.0597),
+        "wroclaw": (51.1079, 17.0385),
+    }
+
+    def __init__(self, places: Optional[dict[str, Coordinates]] = None):
+        self.places = {_normalize(k): v for k, v in (places or self.PLACES).items()}
+
+    async def geocode(self, address: str) -> Optional[Coordinates]:
+        match = _COORDINATES.match(address)
+        if match:
+            lat, lon = float(match.group(1)), float(match.group(2))
+            if -90 <= lat <= 90 and -180 <= lon <= 180:
+                return lat, lon
+            return None
+        normalized = _normalize(address)
+        if normalized in self.places:
+            return self.places[normalized]
+        # the longest known place named in the address ("Rynek 1, Wrocław" -> "rynek")
+        padded = f" {normalized} "
+        for name in sorted(self.places, key=len, reverse=True):
+            if f" {name} " in padded:
+                return self.places[name]
+        return None
+
+
+class NominatimGeocoder:
+    """OpenStreetMap Nominatim (or a compatible self-hosted server)."""
+
+    def __init__(self, url: str, user_agent: str, timeout: float = 3.0):
+        self.url = url
+        self.user_agent = user_agent
+        self.timeout = timeout
+
+    async def geocode(self, address: str) -> Optional[Coordinates]:
+        async with httpx.AsyncClient(timeout=self.timeout, headers={"User-Agent": self.user_agent}) as client:
+            response = await client.get(self.url, params={"q": address, "format": "jsonv2", "limit": 1})
+            response.raise_for_status()
+            results = response.json()
+        if not results:
+            return None
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+
+class NullGeocoder:
+    async def geocode(self, address: str) -> Optional[Coordinates]:
+        return None
+
+
+class Geocoder:
+    """
+    Front for the configured provider: caches results (events at the same
+    place share an address) and never raises - an address that cannot be
+    resolved just leaves the event without coordinates.
+
+    Lookups run while an event is being saved, so they are cut off after
+    `timeout` seconds. The event is then stored without coordinates (not
+    cached as a miss) and python -m db.event_locations fills them in later.
+    """
+
+    def __init__(self, provider, max_size: int = 1024, ttl: float = 24 * 3600, timeout: float = 1.0):
+        self.provider = provider
+        self.timeout = timeout
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    async def geocode(self, address: Optional[str]) -> Optional[Coordinates]:
+        if not address or not address.strip():
+            return None
+        key = (type(self.provider).__name__, address.strip().lower())
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached or None
+        try:
+            result = await asyncio.wait_for(self.provider.geocode(address), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Geocoding %r took longer than %ss", address, self.timeout)
+            return None
+        except Exception as e:
+            logger.warning("Geocoding %r failed: %s", address, e)
+            return None
+        # misses are cached too (as ()), so a bad address is not looked up on every save
+        self._cache.set(key, result or ())
+        return result
+
+
+def build_provider(kind: Optional[str] = None):
+    kind = (kind or os.getenv("GEOCODER", "offline")).lower()
+    if kind == "offline":
+        return OfflineGeocoder()
+    if kind == "nominatim":
+        return NominatimGeocoder(
+            os.getenv("GEOCODER_URL", "https://nominatim.openstreetmap.org/search"),
+            os.getenv("GEOCODER_USER_AGENT", "UniGather backend"),
+        )
+    if kind == "off":
+        return NullGeocoder()
+    raise ValueError(f"Unknown GEOCODER {kind!r}, expected offline, nominatim or off")
+
+
+geocoder = Geocoder(build_provider(), timeout=float(os.getenv("GEOCODER_TIMEOUT", "1")))
@@ -0,0 +1,71 @@
+"""
+Geohash encoding and the cells covering a search circle.
+
+events.geohash holds a full precision geohash of the event's coordinates.
+Every cell is a prefix of the hashes inside it, so "events within r km of a
+point" becomes a few prefix range scans on the geohash index (see
+covering_cells) followed by an exact distance check on the candidates.
+"""
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+PRECISION = 9  # ~4.8 m x 4.8 m
+EARTH_RADIUS_KM = 6371.0088
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode(latitude: float, longitude: float, precision: int = PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    # (height, width) of a cell in degrees; longitude gets the extra bit on odd lengths
+    total = 5 * precision
+    return 180.0 / 2 ** (total // 2), 360.0 / 2 ** ((total + 1) // 2)
+
+
+def covering_cells(latitude: float, longitude: float, radius_km: float) -> list[str]:
+    """
+    Cells whose union contains the circle: the cell of the centre and its 8
+    neighbours, at the finest precision whose cells are at least radius_km
+    in both directions. Returns [] when the circle needs no filter at all.
+    """
+    # longitude degrees shrink towards the poles, measure at the edge nearest to one
+    lat_edge = min(89.9, abs(latitude) + radius_km / _KM_PER_DEGREE)
+    lon_km = _KM_PER_DEGREE * math.cos(math.radians(lat_edge))
+
+    precision = 0
+    for p in range(1, PRECISION + 1):
+        height, width = cell_size(p)
+        if height * _KM_PER_DEGREE < radius_km or width * lon_km < radius_km:
+            break
+        precision = p
+    if precision == 0:
+        return []
+
+    height, width = cell_size(precision)
+    cells = set()
+    for dlat in (-height, 0.0, height):
+        lat = latitude + dlat
+        if not -90.0 <= lat <= 90.0:
+            continue
+        for dlon in (-width, 0.0, width):
+            lon = (longitude + dlon + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
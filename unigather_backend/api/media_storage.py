@@ -0,0 +1,457 @@
+"""
+Object storage for uploaded media (POST /media/upload).
+
+The multipart body is parsed as it arrives and the file part is written to a
+staging file while it is hashed, so memory use does not depend on the file
+size. Parsing, hashing and all file reads and writes run on threads, in
+batches of WRITE_BATCH bytes, so a slow disk never stalls the event loop. The object is then stored under its SHA-256 ("originals/ab/abcd...jpg"):
+a file uploaded twice, to any event, is stored once.
+
+The type a client declares is not trusted: it is read from the file's first
+bytes, only JPEG, PNG, WebP and GIF images (which Pillow must also open) and
+MP4 and WebM videos are accepted, and the detected type is what is stored
+and served (with X-Content-Type-Options: nosniff). An SVG or HTML file is
+refused whatever it claims to be.
+
+MEDIA_STORE selects the backend:
+  local  files under MEDIA_ROOT, served by the app at MEDIA_URL (the default)
+  s3     an S3-compatible bucket (AWS, MinIO, R2, ...) through its REST API,
+         signed with AWS Signature Version 4; configured by MEDIA_S3_*
+"""
+import asyncio
+import hashlib
+import hmac
+import mimetypes
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, Mapping, Optional
+from urllib.parse import parse_qsl, quote, urlsplit
+
+import httpx
+from PIL import Image
+from python_multipart.multipart import MultipartParseError, MultipartParser, parse_options_header
+from starlette.staticfiles import StaticFiles
+
+CHUNK_SIZE = 64 * 1024
+# body bytes collected before they are parsed and written on a thread
+WRITE_BATCH = 4 * CHUNK_SIZE
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+# bytes kept from the start of an upload to detect its type
+SNIFF_BYTES = 512
+# image types accepted, with the name Pillow gives their format
+IMAGE_FORMATS = {"image/jpeg": "JPEG", "image/png": "PNG", "image/webp": "WEBP", "image/gif": "GIF"}
+# major brands of the ftyp box that are plain MP4 (not QuickTime, HEIF or AVIF)
+MP4_BRANDS = {b"isom", b"iso2", b"iso3", b"iso4", b"iso5", b"iso6", b"mp41", b"mp42", b"avc1", b"dash", b"M4V ", b"mmp4", b"MSNV"}
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+class UnsupportedMediaType(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class StoredUpload:
+    key: str
+    url: str
+    content_hash: str
+    content_type: str
+    size: int
+    filename: Optional[str]
+    # the same bytes were already stored, nothing was written
+    deduplicated: bool
+
+    @property
+    def type(self) -> str:
+        return self.content_type.split("/", 1)[0]
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """The media type of a file starting with `head`, None unless it is one of the accepted ones."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in MP4_BRANDS:
+        return "video/mp4"
+    # an EBML header with the "webm" DocType (Matroska says "matroska")
+    if head.startswith(b"\x1a\x45\xdf\xa3") and b"\x42\x82" in head[:64] and b"webm" in head[:64]:
+        return "video/webm"
+    return None
+
+
+def is_image(path: Path, content_type: str) -> bool:
+    """Whether Pillow reads `path` as an intact image of `content_type`; blocking, run it on a thread."""
+    try:
+        with Image.open(path, formats=[IMAGE_FORMATS[content_type]]) as image:
+            image.verify()
+        return True
+    except Exception:
+        # Pillow raises anything from SyntaxError to struct.error for broken files
+        return False
+
+
+class MediaFiles(StaticFiles):
+    """StaticFiles for the local store, telling browsers not to second-guess the stored types."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        return response
+
+
+def original_key(content_hash: str, content_type: str) -> str:
+    return f"originals/{content_hash[:2]}/{content_hash}{mimetypes.guess_extension(content_type) or ''}"
+
+
+def _open_chunks(path: Path):
+    async def chunks():
+        f = await asyncio.to_thread(open, path, "rb")
+        try:
+            while chunk := await asyncio.to_thread(f.read, CHUNK_SIZE):
+                yield chunk
+        finally:
+            f.close()
+    return chunks()
+
+
+def _move(path: Path, target: Path) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(path, target)
+
+
+class LocalMediaStore:
+    """Files under `root`; the app serves them at `base_url` (see main.py)."""
+
+    def __init__(self, root: str, base_url: str = "/files"):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+
+    def staging_dir(self) -> Path:
+        # inside root, so storing a staged file is a rename, not a copy
+        path = self.root / ".staging"
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def url(self, key: str) -> str:
+        return f"{self.base_url}/{key}"
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread((self.root / key).is_file)
+
+    async def put(self, key: str, path: Path, content_type: str) -> None:
+        await asyncio.to_thread(_move, path, self.root / key)
+
+    @asynccontextmanager
+    async def local_file(self, key: str) -> AsyncIterator[Path]:
+        yield self.root / key
+
+    async def delete(self, key: str) -> None:
+        await asyncio.to_thread((self.root / key).unlink, missing_ok=True)
+
+
+def sign_v4(
+    method: str,
+    url: str,
+    headers: Mapping[str, str],
+    access_key: str,
+    secret_key: str,
+    region: str,
+    now: Optional[datetime] = None,
+    service: str = "s3",
+) -> dict[str, str]:
+    """
+    Returns `headers` plus x-amz-date and the Authorization header of AWS
+    Signature Version 4 for `url` (already percent-encoded). The payload hash
+    is taken from x-amz-content-sha256 (UNSIGNED-PAYLOAD if missing, which S3
+    accepts and lets a body be streamed without hashing it first).
+    """
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    day = amz_date[:8]
+    parts = urlsplit(url)
+    signed = {k.lower(): " ".join(str(v).split()) for k, v in headers.items()}
+    signed.setdefault("host", parts.netloc)
+    signed.setdefault("x-amz-content-sha256", UNSIGNED_PAYLOAD)
+    signed["x-amz-date"] = amz_date
+
+    query = sorted((quote(k, safe="-_.~"), quote(v, safe="-_.~")) for k, v in parse_qsl(parts.query, keep_blank_values=True))
+    names = sorted(signed)
+    canonical = "\n".join([
+        method.upper(),
+        parts.path or "/",
+        "&".join(f"{k}={v}" for k, v in query),
+        "".join(f"{name}:{signed[name]}\n" for name in names),
+        ";".join(names),
+        signed["x-amz-content-sha256"],
+    ])
+    scope = f"{day}/{region}/{service}/aws4_request"
+    to_sign = "\n".join(["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical.encode()).hexdigest()])
+
+    key = f"AWS4{secret_key}".encode()
+    for part in (day, region, service, "aws4_request"):
+        key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+    signature = hmac.new(key, to_sign.encode(), hashlib.sha256).hexdigest()
+
+    result = {k: v for k, v in headers.items() if k.lower() != "host"}
+    result["x-amz-content-sha256"] = signed["x-amz-content-sha256"]
+    result["x-amz-date"] = amz_date
+    result["Authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={';'.join(names)}, Signature={signature}"
+    )
+    return result
+
+
+class S3MediaStore:
+    """
+    An S3-compatible bucket, addressed path-style (endpoint/bucket/key) so it
+    works with MinIO and other self-hosted servers as well as AWS.
+    `public_url` is where clients read objects (a CDN or the bucket itself).
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        region: str = "us-east-1",
+        public_url: Optional[str] = None,
+        timeout: float = 30.0,
+    ):
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.region = region
+        self.public_url = (public_url or f"{self.endpoint}/{bucket}").rstrip("/")
+        self.timeout = timeout
+
+    def staging_dir(self) -> Path:
+        return Path(tempfile.gettempdir())
+
+    def url(self, key: str) -> str:
+        return f"{self.public_url}/{key}"
+
+    def _request(self, client: httpx.AsyncClient, method: str, key: str, headers=None, content=None) -> httpx.Request:
+        url = f"{self.endpoint}/{self.bucket}/{quote(key)}"
+        headers = sign_v4(method, url, headers or {}, self.access_key, self.secret_key, self.region)
+        return client.build_request(method, url, headers=headers, content=content)
+
+    async def exists(self, key: str) -> bool:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.send(self._request(client, "HEAD", key))
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def put(self, key: str, path: Path, content_type: str) -> None:
+        # S3 needs the length up front; the body is streamed from the staging file
+        headers = {"Content-Type": content_type, "Content-Length": str(path.stat().st_size)}
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.send(self._request(client, "PUT", key, headers, _open_chunks(path)))
+        response.raise_for_status()
+
+    @asynccontextmanager
+    async def local_file(self, key: str) -> AsyncIterator[Path]:
+        fd, name = tempfile.mkstemp(prefix="media-")
+        try:
+            async with httpx.AsyncClient(timeout=self.timeout) as client:
+                response = await client.send(self._request(client, "GET", key), stream=True)
+                try:
+                    response.raise_for_status()
+                    with os.fdopen(fd, "wb") as f:
+                        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                            await asyncio.to_thread(f.write, chunk)
+                finally:
+                    await response.aclose()
+            yield Path(name)
+        finally:
+            Path(name).unlink(missing_ok=True)
+
+    async def delete(self, key: str) -> None:
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            response = await client.send(self._request(client, "DELETE", key))
+        if response.status_code != 404:
+            response.raise_for_status()
+
+
+class _FilePart:
+    """
+    python-multipart callbacks writing the "file" part of a form to a staging
+    file as it is parsed, hashing it on the way. Other fields are ignored.
+    The callbacks block; the parser is fed on a thread.
+    """
+
+    def __init__(self, staging: Path, max_bytes: int):
+        self.staging = staging
+        self.max_bytes = max_bytes
+        self.path: Optional[Path] = None
+        self.file = None
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        # the first SNIFF_BYTES of the file, and the type the client claims (only for error messages)
+        self.head = b""
+        self.declared_type = ""
+        self.filename: Optional[str] = None
+        self._headers: dict[bytes, bytes] = {}
+        self._name = b""
+        self._value = b""
+        self._writing = False
+
+    def on_part_begin(self) -> None:
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def on_header_end(self) -> None:
+        self._headers[self._name.lower()] = self._value
+        self._name, self._value = b"", b""
+
+    def on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._writing = self.file is None and options.get(b"name") == b"file" and b"filename" in options
+        if self._writing:
+            self.filename = options[b"filename"].decode("utf-8", "replace") or None
+            self.declared_type = self._headers.get(b"content-type", b"").decode("latin-1").split(";")[0].strip().lower()
+            fd, name = tempfile.mkstemp(dir=self.staging, prefix="upload-")
+            self.path = Path(name)
+            self.file = os.fdopen(fd, "wb")
+
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if not self._writing:
+            return
+        self.size += end - start
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"File is larger than {self.max_bytes} bytes")
+        chunk = data[start:end]
+        if len(self.head) < SNIFF_BYTES:
+            self.head += chunk[:SNIFF_BYTES - len(self.head)]
+        self.sha256.update(chunk)
+        self.file.write(chunk)
+
+    def on_part_end(self) -> None:
+        if self._writing:
+            self._writing = False
+            self.file.close()
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+
+class MediaUploads:
+    """
+    Front for the configured store: receives an upload from a request body
+    and stores it once per content hash.
+    """
+
+    def __init__(self, store, max_bytes: int = 50 * 1024 * 1024, types: tuple = ("image", "video")):
+        self.store = store
+        self.max_bytes = max_bytes
+        self.types = types
+
+    async def receive(self, headers: Mapping[str, str], body: AsyncIterator[bytes]) -> StoredUpload:
+        content_type, options = parse_options_header(headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in options:
+            raise InvalidUpload("Expected a multipart/form-data body")
+        # the form around the file is small; refuse what cannot fit before reading it
+        if int(headers.get("content-length") or 0) > self.max_bytes + CHUNK_SIZE:
+            raise UploadTooLarge(f"File is larger than {self.max_bytes} bytes")
+
+        part = _FilePart(self.store.staging_dir(), self.max_bytes)
+        parser = MultipartParser(options[b"boundary"], part.callbacks())
+        try:
+            batch, size = [], 0
+            async for chunk in body:
+                batch.append(chunk)
+                size += len(chunk)
+                if size >= WRITE_BATCH:
+                    await asyncio.to_thread(parser.write, b"".join(batch))
+                    batch, size = [], 0
+            if batch:
+                await asyncio.to_thread(parser.write, b"".join(batch))
+            await asyncio.to_thread(parser.finalize)
+            if part.path is None or part.file is None or not part.file.closed:
+                raise InvalidUpload('The form needs a complete "file" field')
+            if part.size == 0:
+                raise InvalidUpload("The file is empty")
+            content_type = sniff_content_type(part.head)
+            if (
+                content_type is None
+                or content_type.split("/", 1)[0] not in self.types
+                or (content_type in IMAGE_FORMATS and not await asyncio.to_thread(is_image, part.path, content_type))
+            ):
+                raise UnsupportedMediaType(
+                    f"Unsupported file type {part.declared_type or 'unknown'!r}: expected a JPEG, PNG, WebP or GIF image "
+                    "or an MP4 or WebM video"
+                )
+            return await self._store(part, content_type)
+        except MultipartParseError as e:
+            raise InvalidUpload(f"Malformed multipart body: {e}") from e
+        finally:
+            if part.file is not None and not part.file.closed:
+                part.file.close()
+            if part.path is not None:
+                part.path.unlink(missing_ok=True)
+
+    async def _store(self, part: _FilePart, content_type: str) -> StoredUpload:
+        digest = part.sha256.hexdigest()
+        key = original_key(digest, content_type)
+        deduplicated = await self.store.exists(key)
+        if not deduplicated:
+            await self.store.put(key, part.path, content_type)
+        return StoredUpload(
+            key=key,
+            url=self.store.url(key),
+            content_hash=digest,
+            content_type=content_type,
+            size=part.size,
+            filename=part.filename,
+            deduplicated=deduplicated,
+        )
+
+
+def build_store(kind: Optional[str] = None):
+    kind = (kind or os.getenv("MEDIA_STORE", "local")).lower()
+    if kind == "local":
+        return LocalMediaStore(os.getenv("MEDIA_ROOT", "media"), os.getenv("MEDIA_URL", "/files"))
+    if kind == "s3":
+        return S3MediaStore(
+            os.environ["MEDIA_S3_ENDPOINT"],
+            os.environ["MEDIA_S3_BUCKET"],
+            os.environ["MEDIA_S3_ACCESS_KEY"],
+            os.environ["MEDIA_S3_SECRET_KEY"],
+            region=os.getenv("MEDIA_S3_REGION", "us-east-1"),
+            public_url=os.getenv("MEDIA_S3_PUBLIC_URL"),
+        )
+    raise ValueError(f"Unknown MEDIA_STORE {kind!r}, expected local or s3")
+
+
+media_uploads = MediaUploads(build_store(), max_bytes=int(os.getenv("MEDIA_MAX_UPLOAD_BYTES", str(50 * 1024 * 1024))))
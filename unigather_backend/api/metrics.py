@@ -0,0 +1,201 @@
+"""
+Prometheus metrics (GET /metrics) and per-request query accounting.
+
+QueryMetricsMiddleware records, per route template and method, request
+counts by status, latency, and the SQL statements and database time of each
+request (db.query_stats). Requests that run a statement
+REPEATED_STATEMENT_THRESHOLD times or more are counted and logged as likely
+N+1 patterns, once per route and statement; statements slower than
+SLOW_QUERY_MS are counted per route. Time and runs of each distinct
+statement are exported with a short fingerprint as label; GET /health/queries
+lists the statements behind the fingerprints.
+
+Every worker process keeps its own numbers, so scrape each worker (or run
+one per container) rather than a load balancer in front of several.
+"""
+import logging
+import time
+from typing import Optional
+
+from db import query_stats
+from db.query_stats import RequestQueries, current_request, fingerprint
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34, 55, 89)
+# distinct (route, statement) pairs kept; more are not tracked individually
+MAX_STATEMENTS = 2000
+
+
+def _labels(names: tuple, values: tuple, le: Optional[str] = None) -> str:
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    if le is not None:
+        names, values = (*names, "le"), (*values, le)
+    pairs = [f'{n}="{escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple):
+        self.name, self.help, self.labels = name, help, labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_labels(self.labels, k)} {v:g}" for k, v in self.values.items()]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple, buckets: tuple):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        # labels -> [count per bucket..., sum, count]
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, labels: tuple, value: float) -> None:
+        entry = self.values.get(labels)
+        if entry is None:
+            entry = self.values[labels] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[i] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, entry in self.values.items():
+            bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, entry[:len(self.buckets)] + [entry[-1]]):
+                lines.append(f"{self.name}_bucket{_labels(self.labels, key, bound)} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {entry[-2]:g}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {entry[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self, prefix: str = "unigather"):
+        route = ("route", "method")
+        self.requests = Counter(f"{prefix}_http_requests_total", "Requests served.", (*route, "status"))
+        self.latency = Histogram(f"{prefix}_http_request_duration_seconds", "Time to serve a request.", route, LATENCY_BUCKETS)
+        self.statements = Histogram(f"{prefix}_db_statements_per_request", "SQL statements run by one request.", route, STATEMENT_BUCKETS)
+        self.db_time = Histogram(f"{prefix}_db_time_seconds", "Database time of one request.", route, LATENCY_BUCKETS)
+        self.slow = Counter(f"{prefix}_db_slow_statements_total", "Statements slower than SLOW_QUERY_MS.", route)
+        self.repeated = Counter(
+            f"{prefix}_db_repeated_statement_requests_total",
+            "Requests running one statement REPEATED_STATEMENT_THRESHOLD times or more (likely N+1).", route,
+        )
+        self.statement_runs = Counter(f"{prefix}_db_statement_runs_total", "Runs of each statement.", ("route", "statement"))
+        self.statement_time = Counter(f"{prefix}_db_statement_seconds_total", "Database time of each statement.", ("route", "statement"))
+        # (route, fingerprint) -> [normalized SQL, runs, seconds, slowest run of a request]
+        self.statement_texts: dict[tuple, list] = {}
+        self._reported: set[tuple] = set()
+
+    def observe(self, route: str, method: str, status: int, seconds: float, queries: RequestQueries) -> None:
+        key = (route, method)
+        self.requests.inc((route, method, status))
+        self.latency.observe(key, seconds)
+        self.statements.observe(key, queries.statements)
+        self.db_time.observe(key, queries.seconds)
+        if queries.slow:
+            self.slow.inc(key, queries.slow)
+
+        repeated = False
+        for statement, (count, statement_seconds) in queries.normalized().items():
+            statement_key = (route, fingerprint(statement))
+            entry = self.statement_texts.get(statement_key)
+            if entry is None:
+                if len(self.statement_texts) >= MAX_STATEMENTS:
+                    continue
+                entry = self.statement_texts[statement_key] = [statement, 0, 0.0, 0.0]
+            entry[1] += count
+            entry[2] += statement_seconds
+            entry[3] = max(entry[3], statement_seconds)
+            self.statement_runs.inc(statement_key, count)
+            self.statement_time.inc(statement_key, statement_seconds)
+            if count >= query_stats.REPEATED_STATEMENT_THRESHOLD:
+                repeated = True
+                if statement_key not in self._reported:
+                    self._reported.add(statement_key)
+                    logger.warning("%s ran one statement %d times (N+1?): %s", queries.label, count, statement[:1000])
+        if repeated:
+            self.repeated.inc(key)
+
+    def render(self) -> str:
+        metrics = (
+            self.requests, self.latency, self.statements, self.db_time,
+            self.slow, self.repeated, self.statement_runs, self.statement_time,
+        )
+        return "\n".join(line for metric in metrics for line in metric.render()) + "\n"
+
+    def top_statements(self, limit: int = 50) -> list[dict]:
+        """The statements that took the most database time, with their fingerprints."""
+        entries = sorted(self.statement_texts.items(), key=lambda item: -item[1][2])[:limit]
+        return [
+            {
+                "route": route,
+                "statement": key,
+                "sql": sql,
+                "runs": runs,
+                "total_ms": round(seconds * 1000, 1),
+                "mean_ms": round(seconds * 1000 / runs, 2),
+                "max_per_request_ms": round(slowest * 1000, 1),
+            }
+            for (route, key), (sql, runs, seconds, slowest) in entries
+        ]
+
+
+metrics = MetricsRegistry()
+
+# endpoint -> route template, filled from the routers requests went through
+_route_paths: dict = {}
+
+
+def route_template(scope) -> str:
+    """
+    The template of the route that served `scope` (/events/{event_id}), or
+    "unmatched", so labels and span names stay a bounded set.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    path = _route_paths.get(endpoint)
+    if path is None and "router" in scope:
+        # the router puts the matched endpoint in the scope, but not the route
+        _route_paths.update({getattr(r, "endpoint", None) or getattr(r, "app", None): r.path for r in scope["router"].routes})
+        path = _route_paths.get(endpoint)
+    return path or "unmatched"
+
+
+class QueryMetricsMiddleware:
+    """ASGI middleware recording every HTTP request in `registry`, by route_template()."""
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.registry = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(f"{scope['method']} {scope['path']}")
+        token = current_request.set(queries)
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            current_request.reset(token)
+            self.registry.observe(route_template(scope), scope["method"], status, time.perf_counter() - started, queries)
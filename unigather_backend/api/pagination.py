@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 2000
+
+# row ids are int4 columns; a larger id from a crafted cursor would fail in the driver
+MAX_ROW_ID = 2**31 - 1
+
+
+def _encode(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode(token: str) -> dict:
+    padded = token + "=" * (-len(token) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def _row_id(value) -> int:
+    row_id = int(value)
+    if not -MAX_ROW_ID - 1 <= row_id <= MAX_ROW_ID:
+        raise ValueError("row id out of range")
+    return row_id
+
+
+def encode_cursor(sort_value: datetime, row_id: int) -> str:
+    return _encode({"v": sort_value.isoformat(), "id": row_id})
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        data = _decode(cursor)
+        return datetime.fromisoformat(data["v"]), _row_id(data["id"])
+    except (ValueError, KeyError, TypeError, OverflowError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_score_cursor(score: float, row_id: int) -> str:
+    # search ranks (float4) and feed scores (float8) - JSON carries both exactly as a Python float
+    return _encode({"r": score, "id": row_id})
+
+
+def decode_score_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        data = _decode(cursor)
+        return float(data["r"]), _row_id(data["id"])
+    except (ValueError, KeyError, TypeError, OverflowError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_sync_token(txid: int, change_id: int, issued_at: float) -> str:
+    # position in change_log (see db/db_controller_sync.py) and when the token was issued
+    return _encode({"x": txid, "c": change_id, "t": int(issued_at)})
+
+
+def decode_sync_token(token: str) -> tuple[int, int, float]:
+    try:
+        data = _decode(token)
+        return int(data["x"]), int(data["c"]), float(data["t"])
+    except (ValueError, KeyError, TypeError, OverflowError) as e:
+        raise ValueError("Invalid sync token") from e
@@ -0,0 +1,75 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class PasswordPoolBusy(Exception):
+    pass
+
+
+class PasswordWorkerPool:
+    """
+    Runs CPU heavy password hashing/verification on a bounded thread pool so
+    it never blocks the event loop. bcrypt releases the GIL, so threads scale.
+    At most `max_workers` jobs run at once; callers above that wait in line
+    and are rejected once `max_queue` are already waiting (0 = unbounded).
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue: int = 0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password")
+        # created on the running loop by _slots(), not at import
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.in_flight = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        return self._semaphore
+
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if self.max_queue and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PasswordPoolBusy()
+
+        semaphore = self._slots()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.in_flight += 1
+        try:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        except BaseException:
+            self._finished(semaphore)
+            raise
+        # a cancelled caller leaves the thread running, so the slot is freed when the job is done
+        future.add_done_callback(lambda _: self._finished(semaphore))
+        return await asyncio.shield(future)
+
+    def _finished(self, semaphore: asyncio.Semaphore) -> None:
+        self.in_flight -= 1
+        self.completed += 1
+        semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
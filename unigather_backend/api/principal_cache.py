@@ -0,0 +1,20 @@
+from dataclasses import dataclass
+
+from api.ttl_cache import TTLCache
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    role: str
+    token_version: int = 0
+
+
+class PrincipalCache(TTLCache):
+    """
+    Authenticated principals keyed by user id.
+    Entries must be invalidated whenever the user's role/credentials change.
+    """
+
+    def set(self, principal: Principal) -> None:
+        super().set(principal.id, principal)
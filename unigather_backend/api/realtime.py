@@ -0,0 +1,457 @@
+"""
+Push updates of events to connected clients (WebSocket /ws and SSE /sse).
+
+Controllers publish a message per write (new comment, changed like /
+attendance counts, edited or deleted event) after committing. Messages go
+through a broker to every worker process, and each worker's hub fans them
+out to its own connections subscribed to that event:
+
+    controller -> realtime.publish -> broker -> hub of every worker -> connections
+
+Brokers: "memory" (one worker, the default), "postgres" (LISTEN/NOTIFY on
+the application database) and "redis" (PUBLISH/SUBSCRIBE).
+
+Fan-out never waits for a client. Each connection has a bounded queue; a
+client that falls behind by more than max_queue_bytes loses its queued
+messages and gets one {"type": "resync"} instead, after which it reloads
+through GET /sync or the regular endpoints. The same message is sent when a
+broker connection was lost, since messages may have been missed meanwhile.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Optional
+
+import asyncpg
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+
+from api.response_cache import CacheUnavailable, RedisCacheBackend, encode_command, read_reply
+
+logger = logging.getLogger(__name__)
+
+RESYNC = json.dumps({"type": "resync", "event_id": None, "data": None})
+MAX_COMMAND_SIZE = 4096
+SSE_HEARTBEAT = 15.0
+
+
+def counters(event) -> tuple:
+    # the "counts" message of a like / attendance change, from a CTE returning the events counters
+    return event.c.like_count, event.c.going_count, event.c.interested_count
+
+
+class BrokerUnavailable(Exception):
+    pass
+
+
+class RealtimeFull(Exception):
+    pass
+
+
+class TooManySubscriptions(ValueError):
+    pass
+
+
+class MemoryBroker:
+    """In-process delivery; only connections of the publishing worker get the message."""
+
+    MAX_PAYLOAD = None
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[str], None]] = None
+
+    async def start(self, deliver: Callable[[str], None]) -> None:
+        self._deliver = deliver
+
+    async def publish(self, payload: str) -> None:
+        if self._deliver is not None:
+            self._deliver(payload)
+
+    async def close(self) -> None:
+        self._deliver = None
+
+
+class PostgresBroker:
+    """
+    LISTEN/NOTIFY on the application database, no extra service needed. Each
+    worker keeps one listening and one publishing connection outside the pool.
+    NOTIFY payloads are limited to 8000 bytes.
+    """
+
+    MAX_PAYLOAD = 7900
+
+    def __init__(self, connect: Callable, channel: str = "ug_realtime", retry_delay: float = 2.0):
+        self._connect = connect
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self._deliver: Optional[Callable[[str], None]] = None
+        self._listener = None
+        self._publisher = None
+        self._lock = asyncio.Lock()
+        self._closed = False
+        self._reconnecting: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Callable[[str], None]) -> None:
+        self._deliver = deliver
+        self._closed = False
+        await self._listen()
+
+    async def publish(self, payload: str) -> None:
+        async with self._lock:
+            try:
+                if self._publisher is None or self._publisher.is_closed():
+                    self._publisher = await self._connect()
+                await self._publisher.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+            except (OSError, asyncio.TimeoutError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                self._publisher = None
+                raise BrokerUnavailable(str(e)) from e
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+        for connection in (self._listener, self._publisher):
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        self._listener = self._publisher = None
+
+    async def _listen(self) -> None:
+        self._listener = await self._connect()
+        await self._listener.add_listener(self.channel, self._on_notify)
+        self._listener.add_termination_listener(self._on_lost)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        self._deliver(payload)
+
+    def _on_lost(self, connection) -> None:
+        if not self._closed:
+            self._reconnecting = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(self.retry_delay)
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.warning("Realtime broker reconnect failed: %s", e)
+                continue
+            # anything published while we were away is lost
+            self._deliver(RESYNC)
+            return
+
+
+class RedisBroker:
+    """
+    Redis PUBLISH/SUBSCRIBE. Publishing shares the RESP client of the response
+    cache; a second connection stays subscribed and feeds the hub.
+    """
+
+    MAX_PAYLOAD = None
+
+    def __init__(self, url: str, channel: str = "ug:realtime", retry_delay: float = 2.0, timeout: float = 1.0):
+        self._publisher = RedisCacheBackend(url, timeout=timeout)
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self._deliver: Optional[Callable[[str], None]] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def start(self, deliver: Callable[[str], None]) -> None:
+        self._deliver = deliver
+        reader = await self._subscribe()
+        self._reader_task = asyncio.get_running_loop().create_task(self._read(reader))
+
+    async def publish(self, payload: str) -> None:
+        try:
+            await self._publisher.command("PUBLISH", self.channel, payload)
+        except CacheUnavailable as e:
+            raise BrokerUnavailable(str(e)) from e
+
+    async def close(self) -> None:
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+        await self._publisher.close()
+
+    async def _subscribe(self) -> asyncio.StreamReader:
+        publisher = self._publisher
+        reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(publisher.host, publisher.port), self.timeout
+        )
+        commands = ([("AUTH", publisher.password)] if publisher.password else []) + [("SUBSCRIBE", self.channel)]
+        for command in commands:
+            self._writer.write(encode_command(command))
+            await self._writer.drain()
+            await asyncio.wait_for(read_reply(reader), self.timeout)
+        return reader
+
+    async def _read(self, reader: asyncio.StreamReader) -> None:
+        while True:
+            try:
+                reply = await read_reply(reader)
+            except (OSError, asyncio.IncompleteReadError, CacheUnavailable) as e:
+                logger.warning("Realtime broker connection lost: %s", e)
+                reader = await self._resubscribe()
+                continue
+            if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                self._deliver(reply[2].decode(errors="replace"))
+
+    async def _resubscribe(self) -> asyncio.StreamReader:
+        while True:
+            await asyncio.sleep(self.retry_delay)
+            try:
+                reader = await self._subscribe()
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, CacheUnavailable) as e:
+                logger.warning("Realtime broker reconnect failed: %s", e)
+                continue
+            self._deliver(RESYNC)
+            return reader
+
+
+class Subscriber:
+    """
+    One connection: its subscribed event ids and the queue of messages not
+    sent yet, capped at max_bytes (see the module docstring).
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.event_ids: set[int] = set()
+        self.dropped = 0
+        self._queue: deque[str] = deque()
+        self._size = 0
+        self._ready = asyncio.Event()
+
+    def push(self, message: str) -> None:
+        if self._size + len(message) > self.max_bytes:
+            self.dropped += len(self._queue) + 1
+            self._queue.clear()
+            message = RESYNC
+            self._size = 0
+        self._queue.append(message)
+        self._size += len(message)
+        self._ready.set()
+
+    async def next(self) -> str:
+        while not self._queue:
+            self._ready.clear()
+            await self._ready.wait()
+        message = self._queue.popleft()
+        self._size -= len(message)
+        return message
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+
+class RealtimeHub:
+    def __init__(
+        self,
+        broker,
+        max_connections: int = 10000,
+        max_subscriptions: int = 100,
+        max_queue_bytes: int = 64 * 1024,
+        send_timeout: float = 10.0,
+    ):
+        self.broker = broker
+        self.max_connections = max_connections
+        self.max_subscriptions = max_subscriptions
+        self.max_queue_bytes = max_queue_bytes
+        self.send_timeout = send_timeout
+        self._subscribers: dict[int, set[Subscriber]] = {}
+        self._connections: set[Subscriber] = set()
+        self._started = False
+        self._start_lock = asyncio.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.errors = 0
+
+    async def publish(self, event_id: int, kind: str, data: Any = None) -> None:
+        """Sends {"type": kind, "event_id": ..., "data": ...} to the event's subscribers on every worker."""
+        message = {"type": kind, "event_id": event_id, "data": jsonable_encoder(data)}
+        payload = json.dumps(message, separators=(",", ":"))
+        if self.broker.MAX_PAYLOAD is not None and len(payload) > self.broker.MAX_PAYLOAD:
+            # too big for the broker: clients fetch the data themselves
+            payload = json.dumps({**message, "data": None}, separators=(",", ":"))
+        try:
+            await self.broker.publish(payload)
+            self.published += 1
+        except BrokerUnavailable as e:
+            # the write is committed either way, clients catch up through GET /sync
+            self.errors += 1
+            logger.warning("Realtime publish failed: %s", e)
+
+    async def connect(self) -> Subscriber:
+        if len(self._connections) >= self.max_connections:
+            raise RealtimeFull("Too many realtime connections, try again later")
+        await self._start()
+        subscriber = Subscriber(self.max_queue_bytes)
+        self._connections.add(subscriber)
+        return subscriber
+
+    def subscribe(self, subscriber: Subscriber, event_ids) -> None:
+        new = set(event_ids) - subscriber.event_ids
+        if len(subscriber.event_ids) + len(new) > self.max_subscriptions:
+            raise TooManySubscriptions(f"At most {self.max_subscriptions} events per connection")
+        for event_id in new:
+            self._subscribers.setdefault(event_id, set()).add(subscriber)
+        subscriber.event_ids |= new
+
+    def unsubscribe(self, subscriber: Subscriber, event_ids) -> None:
+        for event_id in set(event_ids) & subscriber.event_ids:
+            subscribers = self._subscribers[event_id]
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[event_id]
+        subscriber.event_ids -= set(event_ids)
+
+    def disconnect(self, subscriber: Subscriber) -> None:
+        self.unsubscribe(subscriber, list(subscriber.event_ids))
+        self._connections.discard(subscriber)
+
+    async def close(self) -> None:
+        await self.broker.close()
+        self._started = False
+
+    async def _start(self) -> None:
+        if self._started:
+            return
+        async with self._start_lock:
+            if not self._started:
+                try:
+                    await self.broker.start(self._deliver)
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncpg.PostgresError,
+                        asyncpg.InterfaceError, CacheUnavailable) as e:
+                    raise BrokerUnavailable(str(e)) from e
+                self._started = True
+
+    def _deliver(self, payload: str) -> None:
+        # called by the broker for every message, on every worker; a bad one must not stop the reader
+        try:
+            event_id = json.loads(payload)["event_id"]
+            targets = self._connections if event_id is None else self._subscribers.get(event_id, ())
+        except (ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            logger.warning("Dropping malformed realtime message %.200r: %s", payload, e)
+            return
+        for subscriber in targets:
+            subscriber.push(payload)
+        self.delivered += len(targets)
+
+    async def serve_websocket(self, websocket: WebSocket) -> None:
+        """
+        Runs an authenticated /ws connection until either side closes it.
+        Clients send {"action": "subscribe" | "unsubscribe", "event_ids": [...]};
+        replies and updates share the connection's queue, so they arrive in order.
+        """
+        try:
+            subscriber = await self.connect()
+        except RealtimeFull:
+            await websocket.close(code=1013)
+            return
+        except BrokerUnavailable as e:
+            logger.warning("Realtime broker unavailable: %s", e)
+            await websocket.close(code=1011)
+            return
+        await websocket.accept()
+        tasks = [
+            asyncio.create_task(self._receive(websocket, subscriber)),
+            asyncio.create_task(self._send(websocket, subscriber)),
+        ]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.disconnect(subscriber)
+
+    async def _receive(self, websocket: WebSocket, subscriber: Subscriber) -> None:
+        try:
+            while True:
+                text = await websocket.receive_text()
+                if len(text) > MAX_COMMAND_SIZE:
+                    await websocket.close(code=1009)
+                    return
+                subscriber.push(json.dumps(self._command(subscriber, text)))
+        except WebSocketDisconnect:
+            pass
+
+    async def _send(self, websocket: WebSocket, subscriber: Subscriber) -> None:
+        while True:
+            message = await subscriber.next()
+            try:
+                await asyncio.wait_for(websocket.send_text(message), self.send_timeout)
+            except asyncio.TimeoutError:
+                # the client stopped reading altogether
+                logger.info("Dropping realtime connection that stopped reading")
+                return
+
+    def _command(self, subscriber: Subscriber, text: str) -> dict:
+        try:
+            command = json.loads(text)
+            action = command["action"]
+            event_ids = [int(event_id) for event_id in command["event_ids"]]
+            if action not in ("subscribe", "unsubscribe"):
+                raise ValueError(action)
+        except (ValueError, KeyError, TypeError):
+            return {"type": "error", "detail": 'Expected {"action": "subscribe" | "unsubscribe", "event_ids": [...]}'}
+        try:
+            if action == "subscribe":
+                self.subscribe(subscriber, event_ids)
+            else:
+                self.unsubscribe(subscriber, event_ids)
+        except TooManySubscriptions as e:
+            return {"type": "error", "detail": str(e)}
+        return {"type": "subscribed", "event_ids": sorted(subscriber.event_ids)}
+
+    async def stream(self, subscriber: Subscriber) -> AsyncIterator[str]:
+        """text/event-stream body for /sse; a comment every SSE_HEARTBEAT seconds keeps proxies from closing it."""
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.next(), SSE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            self.disconnect(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "broker": type(self.broker).__name__,
+            "connections": len(self._connections),
+            "subscribed_events": len(self._subscribers),
+            "queued": sum(len(s) for s in self._connections),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": sum(s.dropped for s in self._connections),
+            "errors": self.errors,
+        }
+
+
+def build_broker(kind: Optional[str] = None):
+    kind = (kind or os.getenv("REALTIME_BROKER", "memory")).lower()
+    if kind == "memory":
+        return MemoryBroker()
+    if kind == "postgres":
+        from db.database import connect_raw
+
+        return PostgresBroker(connect_raw)
+    if kind == "redis":
+        return RedisBroker(os.getenv("REALTIME_REDIS_URL", os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")))
+    raise ValueError(f"Unknown REALTIME_BROKER {kind!r}, expected memory, postgres or redis")
+
+
+realtime = RealtimeHub(
+    build_broker(),
+    max_connections=int(os.getenv("REALTIME_MAX_CONNECTIONS", "10000")),
+    max_subscriptions=int(os.getenv("REALTIME_MAX_SUBSCRIPTIONS", "100")),
+    max_queue_bytes=int(os.getenv("REALTIME_MAX_QUEUE_BYTES", str(64 * 1024))),
+    send_timeout=float(os.getenv("REALTIME_SEND_TIMEOUT", "10")),
+)
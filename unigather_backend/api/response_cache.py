@@ -0,0 +1,291 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Optional
+from urllib.parse import urlparse
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+
+from api.etags import etag_matches, not_modified
+from api.serialization import json_response
+from api.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheUnavailable(Exception):
+    pass
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU backend, the default. Every worker process has its own copy,
+    so invalidations only reach the process that made the write.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self._cache = TTLCache(max_size=max_size)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._cache.set(key, value, ttl)
+
+    async def close(self) -> None:
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class NullCacheBackend:
+    async def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisCacheBackend:
+    """
+    Minimal RESP client (GET / SET PX) for a Redis compatible server, shared by
+    all worker processes so invalidations are seen everywhere. Uses a single
+    connection; commands are tiny, so they are sent one at a time under a lock.
+    command() sends any other command (api/realtime.py publishes through it).
+    """
+
+    def __init__(self, url: str, timeout: float = 0.25):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.command("GET", key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.command("SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._disconnect()
+
+    async def command(self, *args: Any) -> Any:
+        async with self._lock:
+            try:
+                if self._writer is None:
+                    await self._connect()
+                return await asyncio.wait_for(self._roundtrip(args), self.timeout)
+            # ValueError: a malformed reply, the stream cannot be trusted any more
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as e:
+                await self._disconnect()
+                raise CacheUnavailable(str(e)) from e
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout
+        )
+        try:
+            if self.password:
+                await asyncio.wait_for(self._roundtrip(("AUTH", self.password)), self.timeout)
+            if self.db:
+                await asyncio.wait_for(self._roundtrip(("SELECT", self.db)), self.timeout)
+        except BaseException:
+            # never leave a connection that is not authenticated or on the wrong database
+            await self._disconnect()
+            raise
+
+    async def _disconnect(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+    async def _roundtrip(self, args: tuple) -> Any:
+        self._writer.write(encode_command(args))
+        await self._writer.drain()
+        return await read_reply(self._reader)
+
+
+def _validator(etag: Optional[str]) -> dict:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"} if etag else {}
+
+
+def encode_command(args: tuple) -> bytes:
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(out)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readuntil(b"\r\n")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise CacheUnavailable(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        size = int(payload)
+        if size < 0:
+            return None
+        return (await reader.readexactly(size + 2))[:-2]
+    if kind == b"*":
+        return [await read_reply(reader) for _ in range(int(payload))]
+    raise CacheUnavailable("Unexpected reply from cache server")
+
+
+class ResponseCache:
+    """
+    Caches rendered JSON responses of read routes.
+
+    Entries live under a scope ("events", "comments:12", ...). Each scope has a
+    version token that is part of every key, so invalidating a scope drops all
+    of its variants (e.g. every page/filter of GET /events) with one write.
+    Backend failures are treated as misses, the database stays the fallback.
+    """
+
+    VERSION_TTL = 24 * 3600
+
+    def __init__(self, backend, ttls: dict[str, float], prefix: str = "ug:"):
+        self.backend = backend
+        self.ttls = ttls
+        self.prefix = prefix
+        self._tokens = itertools.count()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def serve(
+        self,
+        route: str,
+        scope: str,
+        variant: str,
+        load: Callable[[dict], Awaitable[Any]],
+        etag: Optional[Callable[[], Awaitable[str]]] = None,
+        model: Optional[type] = None,
+        fields: Optional[tuple] = None,
+        request: Optional[Request] = None,
+    ) -> Response:
+        """
+        Returns the cached response for (scope, variant) or calls `load(headers)`
+        and caches its result for the route's TTL. `load` may add response headers.
+        With a response `model` the result is written as that model (or its
+        `fields`) by api.serialization, else through jsonable_encoder. A sparse
+        fieldset must be part of `variant`.
+
+        `etag()` gives the ETag of the current data (a row-version query). It is
+        only called on a miss and cached with the body, so a hit, or a 304 for a
+        `request` whose If-None-Match matches the cached ETag, needs no database.
+        """
+        ttl = self.ttls.get(route, 0)
+        key = None
+        if ttl > 0:
+            try:
+                key = f"{self.prefix}{scope}:{await self._version(scope)}:{variant}"
+                cached = await self.backend.get(key)
+            except CacheUnavailable as e:
+                self._failed("read", e)
+                key = cached = None
+            if cached is not None:
+                self.hits += 1
+                head, body = cached.split(b"\n", 1)
+                headers = json.loads(head)
+                tag = headers.get("ETag")
+                if tag and request is not None and etag_matches(request, tag):
+                    return not_modified(tag)
+                return Response(body, media_type="application/json", headers={**headers, **_validator(tag), "X-Cache": "HIT"})
+            self.misses += 1
+
+        tag = await etag() if etag is not None else None
+        if tag and request is not None and etag_matches(request, tag):
+            return not_modified(tag)
+        headers: dict = {"ETag": tag} if tag else {}
+        result = await load(headers)
+        if model is not None:
+            response = json_response(model, result, headers, fields)
+        else:
+            response = JSONResponse(jsonable_encoder(result), headers=headers)
+        if key is not None:
+            try:
+                await self.backend.set(key, json.dumps(headers).encode() + b"\n" + response.body, ttl)
+            except CacheUnavailable as e:
+                self._failed("write", e)
+        response.headers.update({**_validator(tag), "X-Cache": "MISS"})
+        return response
+
+    async def invalidate(self, *scopes: str) -> None:
+        for scope in scopes:
+            try:
+                await self.backend.set(self._version_key(scope), self._new_token(), self.VERSION_TTL)
+            except CacheUnavailable as e:
+                # entries of this scope stay visible until their TTL runs out
+                self._failed("invalidate", e)
+
+    async def _version(self, scope: str) -> str:
+        token = await self.backend.get(self._version_key(scope))
+        if token is None:
+            # a lost version key must never resurrect entries cached under an older one
+            token = self._new_token()
+            await self.backend.set(self._version_key(scope), token, self.VERSION_TTL)
+        return token.decode()
+
+    def _version_key(self, scope: str) -> str:
+        return f"{self.prefix}v:{scope}"
+
+    def _new_token(self) -> bytes:
+        return f"{time.time_ns():x}.{os.getpid():x}.{next(self._tokens):x}".encode()
+
+    def _failed(self, action: str, error: Exception) -> None:
+        self.errors += 1
+        logger.warning("Response cache %s failed: %s", action, error)
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "ttls": self.ttls,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+# seconds per cached route; 0 disables caching for that route
+CACHE_TTLS = {
+    "events": float(os.getenv("CACHE_TTL_EVENTS", "15")),
+    "event": float(os.getenv("CACHE_TTL_EVENT", "60")),
+    "comments": float(os.getenv("CACHE_TTL_COMMENTS", "30")),
+    "media": float(os.getenv("CACHE_TTL_MEDIA", "60")),
+    "attendance": float(os.getenv("CACHE_TTL_ATTENDANCE", "30")),
+}
+
+
+def build_backend(kind: Optional[str] = None):
+    kind = (kind or os.getenv("CACHE_BACKEND", "memory")).lower()
+    if kind == "memory":
+        return MemoryCacheBackend(max_size=int(os.getenv("CACHE_MAX_ENTRIES", "2048")))
+    if kind == "redis":
+        return RedisCacheBackend(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    if kind == "off":
+        return NullCacheBackend()
+    raise ValueError(f"Unknown CACHE_BACKEND {kind!r}, expected memory, redis or off")
+
+
+response_cache = ResponseCache(build_backend(), CACHE_TTLS)
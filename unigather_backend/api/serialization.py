@@ -0,0 +1,111 @@
+"""
+JSON bodies for ORM rows, written straight from their attributes.
+
+jsonable_encoder walks every attribute of every row, copies it into plain
+dicts and json.dumps encodes the copy, which is most of the CPU time of a
+list response. serializer(Model) reads only the fields of a response model,
+through one attrgetter built once per model, and orjson encodes the rows
+(benchmarks/bench_serialization.py: 1000 events in ~9 ms instead of ~85).
+Fields that are response models themselves are written the same way; dicts
+(error bodies) are encoded as they are.
+
+The objects only need the attributes, so Row tuples of a column projection
+(db.projection) work as well as ORM instances. A `fields=a,b` query
+parameter (sparse_fields) narrows a model to some of its fields.
+"""
+import types
+import typing
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Optional
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+def _nested_model(annotation) -> Optional[tuple[type[BaseModel], bool]]:
+    """The response model behind `annotation` (Model, Model | None, list[Model]) and whether it is a list."""
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        models = [found for found in map(_nested_model, typing.get_args(annotation)) if found]
+        return models[0] if models else None
+    if origin in (list, tuple, set, frozenset):
+        args = typing.get_args(annotation)
+        found = _nested_model(args[0]) if args else None
+        return (found[0], True) if found and not found[1] else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None
+
+
+def sparse_fields(model: type[BaseModel], value: Optional[str]) -> tuple[str, ...]:
+    """
+    The fields of `model` named in a comma separated `value`, in the model's
+    order; all of them when `value` is None. Raises ValueError for unknown names.
+    """
+    if value is None:
+        return tuple(model.model_fields)
+    wanted = {name.strip() for name in value.split(",") if name.strip()}
+    if not wanted:
+        raise ValueError("fields must name at least one field")
+    unknown = wanted - model.model_fields.keys()
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}; expected some of {', '.join(model.model_fields)}")
+    return tuple(name for name in model.model_fields if name in wanted)
+
+
+class ModelSerializer:
+    """
+    Writes objects with the attributes of `model`'s fields (ORM rows, Row
+    tuples, other models) as that model's JSON, or only `fields` of it.
+    """
+
+    def __init__(self, model: type[BaseModel], fields: Optional[tuple[str, ...]] = None):
+        fields = {name: field for name, field in model.model_fields.items() if fields is None or name in fields}
+        self.names = tuple(fields)
+        # a field read from another attribute (author <- user) is named by its validation alias
+        sources = [field.validation_alias if isinstance(field.validation_alias, str) else name for name, field in fields.items()]
+        getter = attrgetter(*sources)
+        self._get = getter if len(sources) > 1 else lambda obj: (getter(obj),)
+        self._nested = [
+            (i, serializer(found[0]), found[1])
+            for i, found in enumerate(_nested_model(field.annotation) for field in fields.values())
+            if found
+        ]
+
+    def to_dict(self, obj: Any) -> dict:
+        values = self._get(obj)
+        if self._nested:
+            values = list(values)
+            for i, nested, many in self._nested:
+                value = values[i]
+                if value is not None:
+                    values[i] = [nested.to_dict(item) for item in value] if many else nested.to_dict(value)
+        return dict(zip(self.names, values))
+
+    def to_python(self, value: Any) -> Any:
+        """`value` (one object, a list of them, a dict or None) as what orjson can encode."""
+        if value is None or isinstance(value, dict):
+            return value
+        if isinstance(value, (list, tuple)):
+            to_dict = self.to_dict
+            return [to_dict(item) for item in value]
+        return self.to_dict(value)
+
+    def dumps(self, value: Any) -> bytes:
+        # anything orjson has no type for (Decimal, ...) goes through jsonable_encoder
+        return orjson.dumps(self.to_python(value), default=jsonable_encoder)
+
+
+@lru_cache(maxsize=512)
+def serializer(model: type[BaseModel], fields: Optional[tuple[str, ...]] = None) -> ModelSerializer:
+    return ModelSerializer(model, fields)
+
+
+def json_response(
+    model: type[BaseModel], value: Any, headers: Optional[dict] = None, fields: Optional[tuple[str, ...]] = None
+) -> Response:
+    """A JSON response of `value` written as `model`, without the validation and copies of a response_model."""
+    return Response(serializer(model, fields).dumps(value), media_type="application/json", headers=headers)
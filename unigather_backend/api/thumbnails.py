@@ -0,0 +1,187 @@
+"""
+Resized variants of uploaded images, generated in the background.
+
+An upload returns as soon as the original is stored; its media rows say
+status 'processing' until ThumbnailPool has rendered VARIANTS (longest side
+in pixels; JPEG, or WebP for images with transparency), stored them next to the original and recorded their urls,
+width and height on every media row with the same content hash. Images
+already processed for another upload are not rendered again.
+
+Jobs do not survive a restart; reprocess rows left 'processing' (or
+'failed') with:
+    python -m api.thumbnails
+"""
+import argparse
+import asyncio
+import logging
+import mimetypes
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+from PIL import ExifTags, Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {"medium": 1024, "thumb": 256}
+QUALITY = 80
+
+
+def render_variants(source: Path, target: Path, sizes: dict[str, int] = VARIANTS) -> tuple[int, int, dict[str, Path]]:
+    """
+    Writes one file per size into `target` and returns the image's width and
+    height (as displayed, after EXIF rotation) and the written files. Runs on
+    the pool's threads; Pillow releases the GIL while decoding and resizing.
+    """
+    with Image.open(source) as image:
+        width, height = image.size
+        if image.getexif().get(ExifTags.Base.Orientation, 1) in (5, 6, 7, 8):
+            width, height = height, width
+        # JPEGs decode straight at 1/2 .. 1/8 scale when that is still big enough
+        largest = max(sizes.values())
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if alpha else "RGB")
+
+        files = {}
+        # encoding dominates: JPEG takes a few ms where WebP takes 100+
+        extension, encoder = (".webp", "WEBP") if alpha else (".jpg", "JPEG")
+        # largest first, each smaller one from the previous result
+        for name, size in sorted(sizes.items(), key=lambda item: -item[1]):
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            files[name] = target / f"{name}{extension}"
+            image.save(files[name], encoder, quality=QUALITY)
+    return width, height, files
+
+
+def variant_key(content_hash: str, name: str, extension: str) -> str:
+    return f"variants/{content_hash[:2]}/{content_hash}_{name}{extension}"
+
+
+class ThumbnailPool:
+    """
+    Renders variants on a bounded thread pool so decoding never blocks the
+    event loop. At most `max_workers` images are processed at once; more jobs
+    wait in line, and a hash already queued is not queued again (its result
+    is recorded once more instead, for the rows added meanwhile).
+    """
+
+    def __init__(self, max_workers: int = 2, sessions: Optional[Callable] = None):
+        self.max_workers = max_workers
+        # session factory for recording results, db.database.AsyncSessionLocal by default
+        self.sessions = sessions
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="thumbnail")
+        # created on the running loop by _slots(), not at import
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._resubmitted: set[str] = set()
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, store, content_hash: str, key: str) -> None:
+        if content_hash in self._tasks:
+            self._resubmitted.add(content_hash)
+            return
+        task = asyncio.create_task(self._process(store, content_hash, key))
+        self._tasks[content_hash] = task
+        task.add_done_callback(lambda _: self._tasks.pop(content_hash, None))
+
+    def _slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        return self._semaphore
+
+    async def _process(self, store, content_hash: str, key: str) -> None:
+        semaphore = self._slots()
+        await semaphore.acquire()
+        self.in_flight += 1
+        render = asyncio.ensure_future(self._render(store, content_hash, key))
+        # cancelling this task does not stop a decoding thread, the slot is freed when the render is done
+        render.add_done_callback(lambda _: self._finished(semaphore))
+        try:
+            width, height, variants = await asyncio.shield(render)
+            status = "ready"
+            self.completed += 1
+        except Exception:
+            logger.exception("Rendering variants of %s failed", key)
+            width = height = variants = None
+            status = "failed"
+            self.failed += 1
+        try:
+            await self._record(content_hash, status, width, height, variants)
+            while content_hash in self._resubmitted:
+                self._resubmitted.discard(content_hash)
+                await self._record(content_hash, status, width, height, variants)
+        except Exception:
+            logger.exception("Recording variants of %s failed", key)
+
+    def _finished(self, semaphore: asyncio.Semaphore) -> None:
+        self.in_flight -= 1
+        semaphore.release()
+
+    async def _render(self, store, content_hash: str, key: str) -> tuple[int, int, dict[str, str]]:
+        loop = asyncio.get_running_loop()
+        with tempfile.TemporaryDirectory(dir=store.staging_dir()) as target:
+            async with store.local_file(key) as source:
+                width, height, files = await loop.run_in_executor(self._executor, render_variants, source, Path(target))
+            variants = {}
+            for name, path in files.items():
+                stored = variant_key(content_hash, name, path.suffix)
+                await store.put(stored, path, mimetypes.guess_type(path.name)[0])
+                variants[name] = store.url(stored)
+        return width, height, variants
+
+    async def _record(self, content_hash: str, status: str, width: Optional[int], height: Optional[int], variants: Optional[dict]) -> None:
+        from db.database import AsyncSessionLocal
+        from db.db_controller_media import MediaController
+
+        async with (self.sessions or AsyncSessionLocal)() as db:
+            await MediaController(db).set_variants(content_hash, status, width, height, variants)
+
+    async def drain(self) -> None:
+        while self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def close(self) -> None:
+        await self.drain()
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "queued": len(self._tasks),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+thumbnail_pool = ThumbnailPool(max_workers=int(os.getenv("THUMBNAIL_WORKERS", "2")))
+
+
+async def _main() -> None:
+    from db.database import engine, AsyncSessionLocal
+    from db.db_controller_media import MediaController
+    from api.media_storage import media_uploads, original_key
+
+    try:
+        async with AsyncSessionLocal() as db:
+            pending = await MediaController(db).get_unprocessed_uploads()
+        for content_hash, content_type in pending:
+            thumbnail_pool.submit(media_uploads.store, content_hash, original_key(content_hash, content_type))
+        await thumbnail_pool.close()
+        print(f"Processed {len(pending)} upload(s): {thumbnail_pool.completed} ready, {thumbnail_pool.failed} failed")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Render variants of uploads left 'processing' or 'failed'").parse_args()
+    asyncio.run(_main())
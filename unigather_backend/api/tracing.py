@@ -0,0 +1,203 @@
+"""
+Opt-in OpenTelemetry tracing.
+
+Off unless TRACING names an exporter. A request then gets a span named after
+its route (continuing the trace of a W3C `traceparent` header), with child
+spans for get_current_user and its token decoding, bcrypt work on the
+password pool, every db_controller_* method and every SQL statement (its
+text with placeholders, never the parameters).
+
+Sampling is parent-based: a request carrying a sampled `traceparent` is
+always recorded, one carrying an unsampled one never, and TRACING_SAMPLE_RATIO
+(default 0.1) of the traces that start here are. Unsampled requests create no
+spans, and finished spans are exported in batches off the request path, so a
+low ratio can stay on in production.
+
+    TRACING=console   one JSON object per span on stdout
+    TRACING=file      JSON lines appended to TRACING_FILE (traces.jsonl)
+    TRACING=otlp      OTLP over HTTP to TRACING_OTLP_ENDPOINT
+                      (http://localhost:4318/v1/traces), needs the
+                      opentelemetry-exporter-otlp-proto-http package
+"""
+import functools
+import inspect
+import os
+import sys
+from contextlib import nullcontext
+from typing import Optional
+
+from opentelemetry.propagate import extract
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor, SpanExporter
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+from opentelemetry.trace import SpanKind, Status, StatusCode, get_current_span
+from sqlalchemy import event
+
+from api.metrics import route_template
+from db.query_stats import normalize
+
+
+def build_exporter(kind: Optional[str] = None) -> Optional[SpanExporter]:
+    kind = (kind if kind is not None else os.getenv("TRACING", "")).lower()
+    if kind in ("", "off", "none", "false"):
+        return None
+    if kind == "console":
+        return ConsoleSpanExporter(out=sys.stdout, formatter=lambda span: span.to_json(indent=None) + "\n")
+    if kind == "file":
+        out = open(os.getenv("TRACING_FILE", "traces.jsonl"), "a", buffering=1)
+        return ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + "\n")
+    if kind == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            raise ValueError("TRACING=otlp needs the opentelemetry-exporter-otlp-proto-http package")
+        return OTLPSpanExporter(endpoint=os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces"))
+    raise ValueError(f"Unknown TRACING {kind!r}, expected console, file or otlp")
+
+
+class Tracing:
+    """
+    The process' tracer; a TracerProvider of its own rather than the global
+    one, so configure() can replace it (tests do).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._provider: Optional[TracerProvider] = None
+        self._tracer = None
+
+    def configure(self, exporter: Optional[SpanExporter], ratio: float = 0.1, batch: bool = True) -> None:
+        self.shutdown()
+        if exporter is None:
+            return
+        self._provider = TracerProvider(
+            sampler=ParentBased(TraceIdRatioBased(ratio)),
+            resource=Resource.create({"service.name": os.getenv("TRACING_SERVICE_NAME", "unigather-backend")}),
+        )
+        self._provider.add_span_processor(BatchSpanProcessor(exporter) if batch else SimpleSpanProcessor(exporter))
+        self._tracer = self._provider.get_tracer("unigather")
+        self.enabled = True
+
+    def shutdown(self) -> None:
+        """Exports what is still queued and turns tracing off."""
+        self.enabled = False
+        if self._provider is not None:
+            self._provider.shutdown()
+            self._provider = self._tracer = None
+
+    def span(self, name: str, **attributes):
+        """Context manager for a child span of the current one, doing nothing when tracing is off."""
+        if not self.enabled:
+            return nullcontext()
+        return self._tracer.start_as_current_span(name, attributes=attributes)
+
+    def start_span(self, name: str, **kwargs):
+        return self._tracer.start_span(name, **kwargs)
+
+    def start_request_span(self, name: str, headers: dict):
+        return self._tracer.start_as_current_span(name, context=extract(headers), kind=SpanKind.SERVER)
+
+
+tracing = Tracing()
+tracing.configure(build_exporter(), ratio=float(os.getenv("TRACING_SAMPLE_RATIO", "0.1")))
+
+
+def traced(name: str):
+    """Decorator running an async function in a span called `name`."""
+
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            if not tracing.enabled:
+                return await fn(*args, **kwargs)
+            with tracing.span(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def traced_methods(cls):
+    """Class decorator putting every public async method of `cls` in a span named Class.method."""
+    for name, member in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(member):
+            setattr(cls, name, traced(f"{cls.__name__}.{name}")(member))
+    return cls
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the server span of every HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracing.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with tracing.start_request_span(scope["method"], headers) as span:
+            try:
+                await self.app(scope, receive, send_status)
+            finally:
+                route = route_template(scope)
+                span.update_name(f"{scope['method']} {route}")
+                span.set_attribute("http.request.method", scope["method"])
+                span.set_attribute("http.route", route)
+                span.set_attribute("url.path", scope["path"])
+                span.set_attribute("http.response.status_code", status)
+                if status >= 500:
+                    span.set_status(Status(StatusCode.ERROR))
+
+
+def _statement_started(conn, cursor, statement, parameters, context, executemany):
+    # only within a sampled trace: background work and unsampled requests get no spans
+    if not tracing.enabled or not get_current_span().is_recording():
+        return
+    normalized = normalize(statement)
+    span = tracing.start_span(
+        normalized.split(" ", 1)[0] or "SQL",
+        kind=SpanKind.CLIENT,
+        attributes={"db.system": "postgresql", "db.statement": normalized[:2000]},
+    )
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+def _statement_finished(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        spans.pop().end()
+
+
+def _statement_failed(exception_context):
+    conn = exception_context.connection
+    spans = conn.info.get("trace_spans") if conn is not None else None
+    if spans:
+        span = spans.pop()
+        span.record_exception(exception_context.original_exception)
+        span.set_status(Status(StatusCode.ERROR))
+        span.end()
+
+
+def install(engine) -> None:
+    """Traces the statements of `engine` (async or sync); installing twice is harmless."""
+    target = getattr(engine, "sync_engine", engine)
+    hooks = (
+        ("before_cursor_execute", _statement_started),
+        ("after_cursor_execute", _statement_finished),
+        ("handle_error", _statement_failed),
+    )
+    for name, listener in hooks:
+        if not event.contains(target, name, listener):
+            event.listen(target, name, listener)
@@ -8,6 +8,9 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from db.database import get_db
 from db.db_models import Users as User
+from api.principal_cache import Principal, PrincipalCache
+from api.password_pool import PasswordWorkerPool, PasswordPoolBusy
+from api.tracing import traced, tracing
 import os
 from dotenv import load_dotenv
 
@@ -17,8 +20,18 @@ SECRET_KEY = os.environ["SECRET_KEY"]
 ALGORITHM = os.environ["ALGORITHM"]
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+principal_cache = PrincipalCache(
+    max_size=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+)
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+password_pool = PasswordWorkerPool(
+    max_workers=int(os.getenv("PASSWORD_WORKERS", "4")),
+    max_queue=int(os.getenv("PASSWORD_MAX_QUEUE", "64")),
+)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def hash_password(password: str) -> str:
@@ -27,6 +40,23 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+async def _run_password_job(func, *args):
+    try:
+        with tracing.span(f"password_pool.{func.__name__}"):
+            return await password_pool.run(func, *args)
+    except PasswordPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent login attempts, try again later",
+        )
+
+# async variants for request handlers, bcrypt runs on password_pool instead of the event loop
+async def hash_password_async(password: str) -> str:
+    return await _run_password_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) :
     to_encode = data.copy()
     if expires_delta:
@@ -40,17 +70,45 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) :
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_claims(user: User) -> dict:
+    # the role is looked up per request (principal_cache), so a role change applies to existing tokens
+    return {"sub": user.id, "ver": user.token_version or 0}
 
+async def load_principal(db: AsyncSession, user_id: int) -> Principal | None:
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    result = await db.execute(
+        select(User.id, User.role, User.token_version).where(User.id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    principal = Principal(id=row.id, role=row.role, token_version=row.token_version or 0)
+    principal_cache.set(principal)
+    return principal
 
+
+
+@traced("get_current_user")
 async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    return await authenticate(token, db)
+
+
+async def authenticate(token: str | None, db: AsyncSession) -> Principal:
+    # get_current_user without the dependency wiring, e.g. for WebSocket routes
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    if not token:
+        raise credentials_exception
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        with tracing.span("decode_token"):
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if user_id is None:
             raise credentials_exception
@@ -60,11 +118,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    
-
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
 
-    if user is None:
+    principal = await load_principal(db, user_id)
+    if principal is None:
+        raise credentials_exception
+    # tokens issued before a password change carry an outdated version, tokens without one cannot be revoked
+    if payload.get("ver") != principal.token_version:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return principal
\ No newline at end of file
@@ -0,0 +1,487 @@
+"""
+Throughput and latency of the hot endpoints under concurrent load.
+
+Seeds a scratch schema (bench_load) of the configured database with --users
+users, their friends, events, attendance, likes and comments (a few popular
+events get most of the activity, like real ones), starts uvicorn on it and
+drives a mix of login, GET /events, GET /events/{id}/detail,
+GET /comments/{id}, POST /likes and DELETE /likes from --concurrency clients,
+each sending its next request as soon as the last one returned, for
+--duration seconds after --warmup. Reports per endpoint the requests per
+second, p50/p95/p99 latency, errors and the SQL statements one request runs
+(counted in-process on --sample requests before the run, as the server is
+another process).
+
+Data and requests come from seeded random generators (--seed), so runs at the
+same settings seed the same rows and send the same request sequence; the
+seeded schema is kept with --keep and reused by the next run at the same
+scale.
+
+Run from unigather_backend/ with the usual db settings in the environment:
+    python benchmarks/bench_load.py --concurrency 32 --duration 30
+    python benchmarks/bench_load.py --save-baseline      record this machine's numbers
+    python benchmarks/bench_load.py --compare            exit 1 if any endpoint regressed
+
+--compare fails when p50/p95/p99 grew or requests per second dropped by more
+than --tolerance (for endpoints with MIN_REQUESTS requests in the baseline),
+or when an endpoint runs more statements than it used to.
+Latency depends on the machine, so record the baseline where comparisons run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import httpx
+
+SCHEMA = "bench_load"
+PASSWORD = "bench-password"
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "load.json")
+MIX = {"login": 2, "list_events": 25, "event_detail": 30, "comments": 23, "like": 10, "unlike": 10}
+# fewer requests than this in the baseline make its percentiles too noisy to compare
+MIN_REQUESTS = 50
+# settings a baseline is only comparable under
+COMPARABLE = ("users", "events", "friends", "likes", "attendance", "comments", "seed", "concurrency", "workers", "mix")
+
+SEED = [
+    "SELECT setseed($1::float8)",
+    """
+    INSERT INTO users (name, email, password_hash)
+    SELECT 'Bench User ' || g, 'user' || g || '@bench.example', $1::text FROM generate_series(1, $2::int) g
+    """,
+    """
+    INSERT INTO events (title, description, location, datetime, visibility, created_by, created_at)
+    SELECT 'Event ' || g, repeat('Something happening on campus. ', 1 + g % 8), 'Room ' || g % 200,
+           localtimestamp + (random() * 90 - 30) * interval '1 day',
+           CASE WHEN random() < 0.9 THEN 'public' ELSE 'private' END,
+           1 + floor(random() * $1::int)::int,
+           localtimestamp - random() * interval '60 days'
+    FROM generate_series(1, $2::int) g
+    """,
+    # each user asks about half of their friends
+    """
+    INSERT INTO friends (user_id, friend_id, status)
+    SELECT u, f, 'accepted'
+    FROM (SELECT u, 1 + floor(random() * $1::int)::int AS f FROM generate_series(1, $1::int) u, generate_series(1, $2::int)) pairs
+    WHERE u <> f
+    ON CONFLICT DO NOTHING
+    """,
+    # event 1 + floor(n * random()^3): the first 1% of the events get a fifth of the activity
+    """
+    INSERT INTO attendance (user_id, event_id, status)
+    SELECT u, 1 + floor($2::int * random() ^ 3)::int, CASE WHEN random() < 0.6 THEN 'going' ELSE 'interested' END
+    FROM generate_series(1, $1::int) u, generate_series(1, $3::int)
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO likes (user_id, event_id)
+    SELECT u, 1 + floor($2::int * random() ^ 3)::int FROM generate_series(1, $1::int) u, generate_series(1, $3::int)
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO comments (content, event_id, user_id)
+    SELECT 'Comment ' || g, 1 + floor($2::int * random() ^ 3)::int, 1 + floor($1::int * random())::int
+    FROM generate_series(1, $2::int * $3::int) g
+    """,
+]
+
+
+def _seed_args(args) -> list[tuple]:
+    return [
+        (args.seed / 2 ** 31,),
+        (None, args.users),  # the password hash, filled in by seed()
+        (args.users, args.events),
+        (args.users, args.friends // 2),
+        (args.users, args.events, args.attendance),
+        (args.users, args.events, args.likes),
+        (args.users, args.events, args.comments),
+    ]
+
+
+def _scale(args) -> dict:
+    return {name: getattr(args, name) for name in ("users", "events", "friends", "likes", "attendance", "comments", "seed")}
+
+
+async def seed(args) -> None:
+    """Creates and fills the scratch schema, unless one seeded at the same scale is there already."""
+    from db.database import engine, AsyncSessionLocal
+    from db.db_models import Base
+    from db.counters import reconcile_event_counters
+    from db.feed import rebuild
+    from api.user_auth import hash_password
+
+    async with engine.connect() as sa_conn:
+        conn = (await sa_conn.get_raw_connection()).driver_connection
+        comment = await conn.fetchval("SELECT obj_description(oid, 'pg_namespace') FROM pg_namespace WHERE nspname = $1", SCHEMA)
+        if comment and json.loads(comment) == _scale(args):
+            print(f"reusing the data seeded in schema {SCHEMA}")
+            return
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}")
+
+    started = time.perf_counter()
+    async with engine.begin() as sa_conn:
+        await sa_conn.run_sync(Base.metadata.create_all)
+        conn = (await sa_conn.get_raw_connection()).driver_connection
+        seed_args = _seed_args(args)
+        seed_args[1] = (hash_password(PASSWORD), args.users)
+        for sql, sql_args in zip(SEED, seed_args):
+            await conn.execute(sql, *sql_args)
+    async with AsyncSessionLocal() as db:
+        await reconcile_event_counters(db)
+        feed_rows = await rebuild(db)
+        await db.commit()
+    async with engine.connect() as sa_conn:
+        conn = (await sa_conn.get_raw_connection()).driver_connection
+        await conn.execute("ANALYZE")
+        counts = {t: await conn.fetchval(f"SELECT count(*) FROM {t}") for t in ("users", "events", "friends", "attendance", "likes", "comments")}
+        await conn.execute(f"COMMENT ON SCHEMA {SCHEMA} IS '{json.dumps(_scale(args))}'")
+    print(f"seeded {', '.join(f'{n} {t}' for t, n in counts.items())} and {feed_rows} feed rows "
+          f"in {time.perf_counter() - started:.1f} s")
+
+
+class Client:
+    """One signed-in user sending requests one after another."""
+
+    def __init__(self, user_id: int, token: str, liked: list[int], events: int, seed: int):
+        self.user_id = user_id
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.liked = set(liked)
+        self.events = events
+        self.rng = random.Random(seed)
+
+    def event(self) -> int:
+        return 1 + int(self.events * self.rng.random() ** 3)
+
+
+async def login(http: httpx.AsyncClient, c: Client) -> bool:
+    r = await http.post("/login", json={"email": f"user{c.user_id}@bench.example", "password": PASSWORD})
+    return r.status_code == 200 and "access_token" in r.json()
+
+
+async def list_events(http: httpx.AsyncClient, c: Client) -> bool:
+    r = await http.get("/events", params={"upcoming": "true", "limit": 20}, headers=c.headers)
+    return r.status_code == 200
+
+
+async def event_detail(http: httpx.AsyncClient, c: Client) -> bool:
+    r = await http.get(f"/events/{c.event()}/detail", headers=c.headers)
+    return r.status_code == 200
+
+
+async def comments(http: httpx.AsyncClient, c: Client) -> bool:
+    r = await http.get(f"/comments/{c.event()}", headers=c.headers)
+    return r.status_code == 200
+
+
+async def like(http: httpx.AsyncClient, c: Client) -> bool:
+    event_id = c.event()
+    for _ in range(10):
+        if event_id not in c.liked:
+            break
+        event_id = c.event()
+    r = await http.post("/likes", json={"user_id": c.user_id, "event_id": event_id}, headers=c.headers)
+    ok = r.status_code == 200 and "error" not in r.json()
+    if ok:
+        c.liked.add(event_id)
+    return ok
+
+
+async def unlike(http: httpx.AsyncClient, c: Client) -> bool:
+    event_id = c.rng.choice(sorted(c.liked))
+    r = await http.request("DELETE", "/likes", json={"user_id": c.user_id, "event_id": event_id}, headers=c.headers)
+    c.liked.discard(event_id)
+    return r.status_code == 200 and "error" not in r.json()
+
+
+SCENARIOS = {f.__name__: f for f in (login, list_events, event_detail, comments, like, unlike)}
+
+
+def _next(c: Client, names: list[str], weights: list[int]) -> str:
+    name = c.rng.choices(names, weights)[0]
+    # nothing left to unlike: like something instead
+    return "like" if name == "unlike" and not c.liked else name
+
+
+async def _drive(url: str, clients: list[Client], mix: dict, start_at: float, warmup: float, duration: float) -> dict:
+    names, weights = list(mix), list(mix.values())
+    measure_from, stop_at = start_at + warmup, start_at + warmup + duration
+    results = {name: ([], 0) for name in names}
+    limits = httpx.Limits(max_connections=len(clients), max_keepalive_connections=len(clients))
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as http:
+        async def run(c: Client):
+            while time.time() < stop_at:
+                name = _next(c, names, weights)
+                sent = time.time()
+                started = time.perf_counter()
+                try:
+                    ok = await SCENARIOS[name](http, c)
+                except httpx.HTTPError:
+                    ok = False
+                latency = time.perf_counter() - started
+                if sent >= measure_from and sent < stop_at:
+                    latencies, errors = results[name]
+                    latencies.append(latency)
+                    results[name] = (latencies, errors + (not ok))
+
+        await asyncio.sleep(max(0.0, start_at - time.time()))
+        await asyncio.gather(*(run(c) for c in clients))
+    return results
+
+
+def _drive_process(url: str, clients: list[tuple], mix: dict, start_at: float, warmup: float, duration: float) -> dict:
+    return asyncio.run(_drive(url, [Client(*c) for c in clients], mix, start_at, warmup, duration))
+
+
+async def count_statements(args, clients: list[Client], mix: dict) -> dict[str, float]:
+    """Average SQL statements per request of each scenario, run in-process against main.app."""
+    from sqlalchemy import event
+    from db.database import engine
+    import main
+
+    count = [0]
+
+    def on_execute(*_):
+        count[0] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", on_execute)
+    statements = {}
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as http:
+            for name in mix:
+                total = 0
+                for i in range(args.sample):
+                    c = clients[i % len(clients)]
+                    if name == "unlike" and not c.liked:
+                        await like(http, c)
+                    count[0] = 0
+                    if not await SCENARIOS[name](http, c):
+                        raise RuntimeError(f"{name} failed while counting statements")
+                    total += count[0]
+                statements[name] = total / args.sample
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", on_execute)
+    return statements
+
+
+async def load_clients(args, first_user: int, count: int) -> list[tuple]:
+    from db.database import engine
+    from api.user_auth import create_access_token
+
+    async with engine.connect() as sa_conn:
+        conn = (await sa_conn.get_raw_connection()).driver_connection
+        rows = await conn.fetch(
+            "SELECT u.id, u.token_version, coalesce(array_agg(l.event_id) FILTER (WHERE l.event_id IS NOT NULL), '{}') AS liked"
+            " FROM users u LEFT JOIN likes l ON l.user_id = u.id WHERE u.id >= $1 AND u.id < $2 GROUP BY u.id ORDER BY u.id",
+            first_user, first_user + count,
+        )
+    return [
+        (r["id"], create_access_token({"sub": r["id"], "ver": r["token_version"]}), list(r["liked"]), args.events, args.seed * 100003 + r["id"])
+        for r in rows
+    ]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentile(values: list[float], q: float) -> float:
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000 if values else 0.0
+
+
+def summarize(results: dict, statements: dict, duration: float) -> dict:
+    summary = {}
+    everything = []
+    for name, (latencies, errors) in results.items():
+        latencies = sorted(latencies)
+        everything += latencies
+        summary[name] = {
+            "requests": len(latencies),
+            "rps": len(latencies) / duration,
+            "p50": _percentile(latencies, 0.5),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "errors": errors,
+            "statements": statements[name],
+        }
+    everything.sort()
+    requests = sum(s["requests"] for s in summary.values())
+    summary["total"] = {
+        "requests": requests,
+        "rps": requests / duration,
+        "p50": _percentile(everything, 0.5),
+        "p95": _percentile(everything, 0.95),
+        "p99": _percentile(everything, 0.99),
+        "errors": sum(s["errors"] for s in summary.values()),
+        "statements": sum(s["requests"] * s["statements"] for s in summary.values()) / max(requests, 1),
+    }
+    return summary
+
+
+def report(summary: dict) -> None:
+    print(f"{'endpoint':<14}{'requests':>10}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'statements':>12}")
+    for name, s in summary.items():
+        print(f"{name:<14}{s['requests']:>10}{s['rps']:>9.1f}{s['p50']:>9.1f}{s['p95']:>9.1f}{s['p99']:>9.1f}"
+              f"{s['errors']:>8}{s['statements']:>12.1f}")
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    """The regressions of `summary` against a saved baseline's results."""
+    regressions = []
+    for name, base in baseline.items():
+        now = summary.get(name)
+        if now is None:
+            continue
+        if base["requests"] >= MIN_REQUESTS:
+            for metric in ("p50", "p95", "p99"):
+                if now[metric] > base[metric] * (1 + tolerance):
+                    regressions.append(f"{name} {metric} {base[metric]:.1f} -> {now[metric]:.1f} ms")
+            if now["rps"] < base["rps"] * (1 - tolerance):
+                regressions.append(f"{name} rps {base['rps']:.1f} -> {now['rps']:.1f}")
+        # statement counts do not depend on the machine, any increase is a regression
+        if now["statements"] > base["statements"] + 0.05:
+            regressions.append(f"{name} statements {base['statements']:.1f} -> {now['statements']:.1f}")
+    return regressions
+
+
+async def run(args) -> dict:
+    from db.database import engine
+
+    mix = dict(args.mix)
+    try:
+        await seed(args)
+        # the last users are the in-process sample's, so the load clients' likes stay as loaded
+        sample_clients = [Client(*c) for c in await load_clients(args, args.users - 9, 10)]
+        statements = await count_statements(args, sample_clients, mix)
+        clients = await load_clients(args, 1, args.concurrency)
+    finally:
+        await engine.dispose()
+
+    port = _free_port()
+    env = {**os.environ, "schema": SCHEMA}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        env=env,
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient() as http:
+            for _ in range(200):
+                try:
+                    await http.get(f"{url}/health")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+
+        # clients split over --processes generator processes, one event loop each
+        start_at = time.time() + 2
+        shares = [clients[i::args.processes] for i in range(args.processes)]
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(args.processes, mp_context=get_context("spawn")) as pool:
+            parts = await asyncio.gather(*(
+                loop.run_in_executor(pool, _drive_process, url, share, mix, start_at, args.warmup, args.duration)
+                for share in shares if share
+            ))
+    finally:
+        server.terminate()
+        server.wait(10)
+
+    results = {name: ([], 0) for name in mix}
+    for part in parts:
+        for name, (latencies, errors) in part.items():
+            results[name] = (results[name][0] + latencies, results[name][1] + errors)
+    return summarize(results, statements, args.duration)
+
+
+async def drop() -> None:
+    from db.database import engine
+
+    async with engine.connect() as sa_conn:
+        conn = (await sa_conn.get_raw_connection()).driver_connection
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await engine.dispose()
+
+
+def _mix(value: str) -> list[tuple[str, int]]:
+    mix = []
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"expected name=weight with names from {', '.join(SCENARIOS)}")
+        mix.append((name, int(weight)))
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--friends", type=int, default=20, help="accepted friends per user, on average")
+    parser.add_argument("--likes", type=int, default=10, help="likes per user")
+    parser.add_argument("--attendance", type=int, default=5, help="events each user is going to or interested in")
+    parser.add_argument("--comments", type=int, default=10, help="comments per event, on average")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=32, help="clients sending requests at once")
+    parser.add_argument("--duration", type=float, default=30, help="seconds measured")
+    parser.add_argument("--warmup", type=float, default=5, help="seconds sent before measuring")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--processes", type=int, default=1, help="processes generating the load")
+    parser.add_argument("--sample", type=int, default=20, help="requests per endpoint for counting statements")
+    parser.add_argument("--mix", type=_mix, default=list(MIX.items()), help="weights, e.g. " + ",".join(f"{k}={v}" for k, v in MIX.items()))
+    parser.add_argument("--keep", action="store_true", help=f"keep schema {SCHEMA} for the next run")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative change of latency and rps")
+    args = parser.parse_args()
+    if args.concurrency > args.users - 10:
+        parser.error("--users has to exceed --concurrency by 10 (the statement sample's users)")
+    if args.compare and not args.save_baseline and not os.path.exists(args.baseline):
+        # baselines are machine specific and not committed, record one before the first comparison
+        parser.error(f"no baseline at {args.baseline}, run with --save-baseline first")
+
+    # the app and this script both use the scratch schema
+    os.environ["schema"] = SCHEMA
+    config = {**_scale(args), "concurrency": args.concurrency, "workers": args.workers, "mix": dict(args.mix)}
+    try:
+        summary = asyncio.run(run(args))
+    finally:
+        if not args.keep:
+            asyncio.run(drop())
+
+    print(f"\n{args.concurrency} clients, {args.workers} worker(s), {args.duration:.0f} s measured")
+    report(summary)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"config": config, "results": summary}, f, indent=2)
+        print(f"\nbaseline saved to {args.baseline}")
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        different = [k for k in COMPARABLE if baseline["config"].get(k) != config[k]]
+        if different:
+            sys.exit(f"\nthe baseline was recorded with different {', '.join(different)}: {baseline['config']}")
+        regressions = compare(summary, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            print("\n".join(f"  {r}" for r in regressions))
+            sys.exit(1)
+        print(f"\nno regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Event loop latency while many logins verify bcrypt passwords at once.
+
+Compares verifying inline (blocking the event loop, the old behaviour) with
+running the work on api.user_auth.password_pool. A heartbeat task sleeps for
+TICK seconds in a loop and records how late it wakes up; that lateness is what
+every other request on the same worker would have waited.
+
+Run from unigather_backend/:
+    python benchmarks/bench_password_hashing.py --logins 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("port", "5432")  # db settings are unused, but the module builds an engine on import
+
+from api.password_pool import PasswordWorkerPool
+from api.user_auth import hash_password, verify_password
+
+TICK = 0.005
+
+
+async def heartbeat(delays: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        delays.append(time.perf_counter() - start - TICK)
+
+
+async def inline_login(password: str, hashed: str):
+    await asyncio.sleep(0)
+    return verify_password(password, hashed)
+
+
+async def run(mode: str, logins: int, hashed: str, workers: int) -> dict:
+    pool = PasswordWorkerPool(max_workers=workers)
+    delays: list = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(delays, stop))
+    await asyncio.sleep(TICK * 2)
+
+    started = time.perf_counter()
+    if mode == "inline":
+        jobs = [inline_login("secret", hashed) for _ in range(logins)]
+    else:
+        jobs = [pool.run(verify_password, "secret", hashed) for _ in range(logins)]
+    results = await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await beat
+    assert all(results)
+    delays_ms = sorted(d * 1000 for d in delays)
+    return {
+        "mode": mode,
+        "logins": logins,
+        "total_s": elapsed,
+        "loop_p50_ms": statistics.median(delays_ms),
+        "loop_p99_ms": delays_ms[int(len(delays_ms) * 0.99) - 1] if len(delays_ms) > 1 else delays_ms[0],
+        "loop_max_ms": delays_ms[-1],
+        "max_waiting": pool.max_waiting,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    hashed = hash_password("secret")
+    print(f"{'mode':<8}{'logins':>8}{'total s':>10}{'loop p50 ms':>14}{'loop p99 ms':>14}{'loop max ms':>14}{'max queue':>11}")
+    for mode in ("inline", "pool"):
+        r = asyncio.run(run(mode, args.logins, hashed, args.workers))
+        print(f"{r['mode']:<8}{r['logins']:>8}{r['total_s']:>10.2f}{r['loop_p50_ms']:>14.1f}"
+              f"{r['loop_p99_ms']:>14.1f}{r['loop_max_ms']:>14.1f}{r['max_waiting']:>11}")
+
+
+if __name__ == "__main__":
+    main()
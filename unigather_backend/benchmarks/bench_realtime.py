@@ -0,0 +1,199 @@
+"""
+Thousands of idle /ws subscribers against a real server.
+
+Starts uvicorn (--workers processes) with REALTIME_BROKER=postgres, opens
+--connections WebSocket connections that each subscribe to a hot event and
+one of --events others, and reports:
+  - server memory (RSS of all its processes) per idle connection, without
+    permessage-deflate unless --deflate is given (its zlib state per
+    connection is most of the cost);
+  - delivery latency of messages published with NOTIFY, the way another
+    worker publishes, to one event and to the hot event everyone follows;
+  - what --slow clients that never read cost: their queues are capped and
+    they get a resync message instead of growing the server's memory.
+
+Run from unigather_backend/ with the usual db settings in the environment:
+    python benchmarks/bench_realtime.py --connections 5000 --workers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import httpx
+from websockets.asyncio.client import connect
+
+HOT_EVENT = 0
+CHANNEL = "ug_realtime"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_kb(pid: int) -> int:
+    # the server and its worker processes
+    total = 0
+    children = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout.split()
+    for p in [pid, *map(int, children)]:
+        with open(f"/proc/{p}/status") as f:
+            total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    return total
+
+
+class Client:
+    def __init__(self, ws, read: bool):
+        self.ws = ws
+        self.read = read
+        self.latencies: list[float] = []
+        self.resyncs = 0
+        self.received = 0
+        self.task = None
+
+    async def run(self):
+        async for raw in self.ws:
+            message = json.loads(raw)
+            if message["type"] == "resync":
+                self.resyncs += 1
+            elif message["type"] == "bench":
+                self.received += 1
+                self.latencies.append(time.time() - message["data"]["t"])
+
+
+async def _open(url: str, event_id: int, read: bool) -> Client:
+    ws = await connect(url, max_queue=None if read else 1, open_timeout=60)
+    await ws.send(json.dumps({"action": "subscribe", "event_ids": [HOT_EVENT, event_id]}))
+    await ws.recv()
+    client = Client(ws, read)
+    if read:
+        client.task = asyncio.create_task(client.run())
+    return client
+
+
+async def _publish(conn, event_id: int, count: int, pad: int = 0) -> None:
+    for _ in range(count):
+        payload = {"type": "bench", "event_id": event_id, "data": {"t": time.time(), "pad": "x" * pad}}
+        await conn.execute("SELECT pg_notify($1, $2)", CHANNEL, json.dumps(payload))
+
+
+def _percentiles(values: list[float]) -> str:
+    if not values:
+        return "no messages"
+    values = sorted(values)
+    pick = lambda q: values[min(len(values) - 1, int(q * len(values)))] * 1000
+    return f"p50 {pick(0.5):.1f} ms, p99 {pick(0.99):.1f} ms, max {values[-1] * 1000:.1f} ms"
+
+
+async def run(args) -> None:
+    from api.user_auth import create_access_token
+    from db.database import connect_raw
+
+    conn = await connect_raw()
+    try:
+        # every connection authenticates as this user
+        user = await conn.fetchrow(
+            "INSERT INTO users (name, email, password_hash) VALUES ('Bench Realtime', 'realtime@bench.example', 'x') "
+            "ON CONFLICT (email) DO UPDATE SET name = excluded.name RETURNING id, token_version"
+        )
+    finally:
+        await conn.close()
+
+    port = _free_port()
+    env = {**os.environ, "REALTIME_BROKER": "postgres"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning",
+         "--ws-per-message-deflate", "true" if args.deflate else "false"],
+        env=env,
+    )
+    token = create_access_token({"sub": user["id"], "ver": user["token_version"]})
+    url = f"ws://127.0.0.1:{port}/ws?token={token}"
+    clients: list[Client] = []
+    try:
+        async with httpx.AsyncClient() as http:
+            for _ in range(200):
+                try:
+                    await http.get(f"http://127.0.0.1:{port}/health")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+        await asyncio.sleep(1)
+        baseline = _rss_kb(server.pid)
+
+        started = time.perf_counter()
+        opening = asyncio.Semaphore(200)
+
+        async def open_one(i: int, read: bool) -> Client:
+            async with opening:
+                return await _open(url, 1 + i % args.events, read)
+
+        clients = list(await asyncio.gather(*(open_one(i, True) for i in range(args.connections))))
+        opened = time.perf_counter() - started
+        await asyncio.sleep(2)
+        idle = _rss_kb(server.pid)
+        print(f"{args.connections} connections opened in {opened:.1f} s, {args.workers} worker(s), "
+              f"permessage-deflate {'on' if args.deflate else 'off'}")
+        print(f"server RSS {baseline / 1024:.0f} MiB -> {idle / 1024:.0f} MiB, "
+              f"{(idle - baseline) * 1024 / args.connections / 1024:.1f} KiB per idle connection")
+
+        conn = await connect_raw()
+        try:
+            followers = sum(1 for i in range(args.connections) if i % args.events == 0)
+            for label, event_id, subscribers in (("one event", 1, followers), ("the hot event", HOT_EVENT, args.connections)):
+                for c in clients:
+                    c.latencies.clear()
+                started = time.perf_counter()
+                await _publish(conn, event_id, args.messages)
+                expected = args.messages * subscribers
+                while sum(len(c.latencies) for c in clients) < expected and time.perf_counter() - started < 60:
+                    await asyncio.sleep(0.05)
+                latencies = [l for c in clients for l in c.latencies]
+                print(f"{args.messages} messages to {label} ({subscribers} subscribers): {_percentiles(latencies)}, "
+                      f"{len(latencies)}/{expected} delivered in {time.perf_counter() - started:.2f} s")
+
+            if args.slow:
+                slow = list(await asyncio.gather(*(open_one(i, False) for i in range(args.slow))))
+                before = _rss_kb(server.pid)
+                # ~1 MiB per slow client if nothing were capped
+                await _publish(conn, HOT_EVENT, 256, pad=4096)
+                await asyncio.sleep(3)
+                after = _rss_kb(server.pid)
+                async with httpx.AsyncClient() as http:
+                    stats = (await http.get(f"http://127.0.0.1:{port}/health/realtime")).json()
+                print(f"{args.slow} clients not reading, 256 x 4 KiB published: server RSS "
+                      f"{before / 1024:.0f} -> {after / 1024:.0f} MiB, {stats['dropped']} messages dropped for resync "
+                      f"(one worker's stats)")
+                for c in slow:
+                    await c.ws.close()
+        finally:
+            await conn.close()
+    finally:
+        for c in clients:
+            if c.task:
+                c.task.cancel()
+        await asyncio.gather(*(c.ws.close() for c in clients), return_exceptions=True)
+        server.terminate()
+        server.wait(10)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=100, help="events the connections are spread over")
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=20, help="extra connections that never read")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--deflate", action="store_true", help="keep uvicorn's permessage-deflate on")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
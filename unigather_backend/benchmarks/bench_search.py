@@ -0,0 +1,141 @@
+"""
+Event full text search and user name search at scale.
+
+Builds events and users tables with --rows rows each in a scratch schema
+(bench_search, dropped afterwards) of the configured database and times:
+  - events: ILIKE '%word%' over title/description/location (what a naive
+    search would do) against the ranked tsvector query of GET /events/search,
+    for a frequent and a rare word;
+  - users: ILIKE '%x%' on name (GET /users?name=) with and without the pg_trgm
+    GIN index of migration 0008, when the extension is available.
+Word frequencies are skewed (a few very common words, a long tail of rare
+ones), like real titles and descriptions.
+
+Run from unigather_backend/ with the usual db settings in the environment:
+    python benchmarks/bench_search.py --rows 1000000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from db.db_models import SEARCH_VECTOR
+
+SCHEMA = "bench_search"
+REPEATS = 5
+
+SETUP = f"""
+DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+CREATE SCHEMA {SCHEMA};
+SET search_path = {SCHEMA};
+CREATE TABLE words (n int PRIMARY KEY, w text);
+INSERT INTO words SELECT g, substr(md5(g::text), 1, 7) FROM generate_series(0, 4999) g;
+-- word n is drawn with probability ~ n^(-2/3): a few very common words, a long tail of rare ones
+CREATE FUNCTION word() RETURNS text LANGUAGE sql VOLATILE AS
+    $$ SELECT w FROM {SCHEMA}.words WHERE n = (SELECT floor(5000 * random() ^ 3)::int) $$;
+CREATE TABLE events (
+    id serial PRIMARY KEY,
+    title varchar(255) NOT NULL,
+    description text,
+    location varchar(255),
+    datetime timestamp NOT NULL,
+    search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED
+);
+CREATE TABLE users (id serial PRIMARY KEY, name varchar(100) NOT NULL, email varchar(100) NOT NULL);
+"""
+
+SEED = """
+INSERT INTO events (title, description, location, datetime)
+SELECT word() || ' ' || word() || ' ' || word(),
+       (SELECT string_agg(word(), ' ') FROM generate_series(1, 12) WHERE g > 0),  -- correlated, so per row
+       word() || ' ' || g % 50,
+       now() + g * interval '1 minute'
+FROM generate_series(1, $1) g;
+INSERT INTO users (name, email)
+SELECT initcap(word()) || ' ' || initcap(word()), word() || g || '@example.com'
+FROM generate_series(1, $1) g;
+"""
+
+NAIVE = """
+SELECT id FROM events
+WHERE title ILIKE '%' || $1 || '%' OR description ILIKE '%' || $1 || '%' OR location ILIKE '%' || $1 || '%'
+ORDER BY datetime, id LIMIT 50
+"""
+
+RANKED = """
+SELECT id, ts_rank_cd(search_vector, q) AS rank
+FROM events, to_tsquery('simple'::regconfig, $1 || ':*') q
+WHERE search_vector @@ q
+ORDER BY rank DESC, id LIMIT 50
+"""
+
+USERS = "SELECT id FROM users WHERE name ILIKE '%' || $1 || '%' LIMIT 50"
+
+
+async def timed(conn, sql: str, *args) -> tuple[float, int]:
+    times, rows = [], 0
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        rows = len(await conn.fetch(sql, *args))
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), rows
+
+
+async def run(rows: int) -> None:
+    from db.database import engine
+
+    async with engine.connect() as sa_conn:
+        conn = (await sa_conn.get_raw_connection()).driver_connection
+        try:
+            started = time.perf_counter()
+            await conn.execute(SETUP)
+            await conn.execute(SEED.replace("$1", str(rows)))
+            seeded = time.perf_counter() - started
+            await conn.execute("CREATE INDEX ix_events_search ON events USING gin (search_vector)")
+            await conn.execute("ANALYZE")
+            print(f"seeded {rows} events and users in {seeded:.1f} s\n")
+
+            common = await conn.fetchval("SELECT w FROM words WHERE n = 0")
+            rare = await conn.fetchval("SELECT w FROM words WHERE n = 4000")
+            matches = "SELECT count(*) FROM events WHERE search_vector @@ to_tsquery('simple'::regconfig, $1)"
+
+            print(f"{'query':<34}{'word':<18}{'matches':>10}{'median ms':>12}")
+            for label, word in (("frequent", common), ("rare", rare)):
+                total = await conn.fetchval(matches, word)
+                naive_ms, _ = await timed(conn, NAIVE, word)
+                ranked_ms, _ = await timed(conn, RANKED, word)
+                print(f"{'events ILIKE (seq scan)':<34}{label:<18}{total:>10}{naive_ms:>12.1f}")
+                print(f"{'events tsvector + GIN, ranked':<34}{label:<18}{total:>10}{ranked_ms:>12.1f}")
+
+            # LIMIT 50 ends a scan early for common names, so time a rare one and one with no match
+            needles = (("rare", rare[1:6]), ("no match", "zzzz"))
+            for label, needle in needles:
+                seq_ms, _ = await timed(conn, USERS, needle)
+                print(f"{'users ILIKE (seq scan)':<34}{label:<18}{'':>10}{seq_ms:>12.1f}")
+            if await conn.fetchval("SELECT count(*) FROM pg_available_extensions WHERE name = 'pg_trgm'"):
+                await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                await conn.execute("CREATE INDEX ix_users_name_trgm ON users USING gin (name gin_trgm_ops)")
+                await conn.execute("ANALYZE users")
+                for label, needle in needles:
+                    trgm_ms, _ = await timed(conn, USERS, needle)
+                    print(f"{'users ILIKE + trigram GIN':<34}{label:<18}{'':>10}{trgm_ms:>12.1f}")
+            else:
+                print("users ILIKE + trigram GIN: skipped, pg_trgm is not available on this server")
+        finally:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows))
+
+
+if __name__ == "__main__":
+    main()
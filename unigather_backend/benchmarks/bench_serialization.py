@@ -0,0 +1,78 @@
+"""
+CPU time to write a page of events as JSON.
+
+Compares jsonable_encoder + JSONResponse (how list routes wrote ORM rows
+before), validating into pydantic response models and dumping them, and
+api.serialization. Rows are built in memory, no database is needed.
+
+Run from unigather_backend/:
+    python benchmarks/bench_serialization.py --rows 1000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("port", "5432")  # db settings are unused, but the module builds an engine on import
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from api.api_objects import EventResponse
+from api.serialization import serializer
+from db.db_models import Events
+
+
+def make_events(rows: int) -> list[Events]:
+    start = datetime(2026, 1, 1, 10, 0, 0, 123456)
+    return [
+        Events(
+            id=i, title=f"Event {i}", description="Something happening on campus. " * 3, location=f"Room {i % 200}",
+            datetime=start + timedelta(hours=i), visibility="public", created_by=i % 50, created_at=start,
+            like_count=i % 7, going_count=i % 11, interested_count=3, comment_count=2, updated_at=start,
+            latitude=51.1 + i / 1e4, longitude=17.03, geohash="u3h4",
+        )
+        for i in range(rows)
+    ]
+
+
+def best_ms(write, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(5):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            write()
+        best = min(best, (time.perf_counter() - started) / repeat)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    events = make_events(args.rows)
+    adapter = TypeAdapter(list[EventResponse])
+    writers = {
+        "jsonable_encoder": lambda: JSONResponse(jsonable_encoder(events)).body,
+        "pydantic": lambda: adapter.dump_json([EventResponse.model_validate(e) for e in events]),
+        "serializer": lambda: serializer(EventResponse).dumps(events),
+    }
+    ours = json.loads(writers["serializer"]())
+    assert ours == json.loads(writers["pydantic"]()), "serializer output differs from the response model"
+
+    print(f"{'writer':<18}{'rows':>7}{'ms':>9}{'ms per 1k':>11}{'bytes':>10}")
+    for name, write in writers.items():
+        ms = best_ms(write, args.repeat)
+        print(f"{name:<18}{args.rows:>7}{ms:>9.2f}{ms * 1000 / args.rows:>11.2f}{len(write()):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Writing and pruning of the change log read by GET /sync.
+
+Entities and their keys in change_log:
+    event        event_id = row_id = events.id
+    comment      event_id = comments.event_id, row_id = comments.id
+    like         event_id = likes.event_id, row_id = likes.user_id
+    attendance   event_id = attendance.event_id, row_id = attendance.user_id
+
+Only keys are logged; GET /sync loads the current rows and reports keys that
+no longer exist as deleted.
+
+Usage (from unigather_backend/), e.g. nightly from cron:
+    python -m db.change_log --days 30     delete entries older than 30 days
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.db_models import ChangeLog
+
+
+def log_rows(entity: str, event_id, row_id, name: str):
+    """
+    CTE logging every row of a RETURNING CTE, e.g. log_rows("like", inserted.c.event_id,
+    inserted.c.user_id, "log_like"). Attach it to the outer statement with add_cte().
+    """
+    return (
+        insert(ChangeLog)
+        .from_select(["entity", "event_id", "row_id"], select(literal(entity), event_id, row_id))
+        .cte(name)
+    )
+
+
+def log_row(entity: str, event_id, row_id):
+    return insert(ChangeLog).values(entity=entity, event_id=event_id, row_id=row_id)
+
+
+def log_select(entity: str, event_id, row_id, *where):
+    # log every row of a table matching `where`, e.g. before a cascading delete
+    return insert(ChangeLog).from_select(
+        ["entity", "event_id", "row_id"], select(literal(entity), event_id, row_id).where(*where)
+    )
+
+
+async def prune(db: AsyncSession, days: int) -> int:
+    cutoff = datetime.now() - timedelta(days=days)
+    result = await db.execute(delete(ChangeLog).where(ChangeLog.changed_at < cutoff))
+    await db.commit()
+    return result.rowcount
+
+
+async def _main(days: int) -> None:
+    from db.database import engine, AsyncSessionLocal
+
+    try:
+        async with AsyncSessionLocal() as session:
+            removed = await prune(session, days)
+        print(f"Removed {removed} change log entries older than {days} days")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune the GET /sync change log")
+    parser.add_argument("--days", type=int, default=30, help="keep entries of the last N days")
+    args = parser.parse_args()
+    asyncio.run(_main(args.days))
@@ -0,0 +1,73 @@
+"""
+Reconciliation of the denormalized counters on events.
+
+The controllers keep like_count, going_count, interested_count and
+comment_count in step with every write they make, but rows removed behind
+their back (ON DELETE CASCADE from users, manual SQL, restored dumps) leave
+the counters drifting. This job recomputes them from the source tables and
+rewrites only the events whose stored value is wrong.
+
+Usage (from unigather_backend/), e.g. nightly from cron:
+    python -m db.counters
+"""
+import asyncio
+from typing import Iterable, Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.change_log import log_rows
+from db.db_models import Attendance, Comments, Events, Likes
+
+
+def _actual_counts() -> dict:
+    def count(model, *conditions):
+        return (
+            select(func.count())
+            .select_from(model)
+            .where(model.event_id == Events.id, *conditions)
+            .scalar_subquery()
+        )
+
+    return {
+        "like_count": count(Likes),
+        "going_count": count(Attendance, Attendance.status == "going"),
+        "interested_count": count(Attendance, Attendance.status == "interested"),
+        "comment_count": count(Comments),
+    }
+
+
+async def reconcile_event_counters(db: AsyncSession, event_ids: Optional[Iterable[int]] = None) -> list[int]:
+    """Repairs drifted counters and returns the ids of the events that were fixed."""
+    actual = _actual_counts()
+    repair = (
+        update(Events)
+        .where(or_(*(getattr(Events, column) != value for column, value in actual.items())))
+        .values({**actual, "updated_at": func.now()})
+        .returning(Events.id)
+    )
+    if event_ids is not None:
+        repair = repair.where(Events.id.in_(list(event_ids)))
+    repair = repair.cte("repair")
+
+    # repaired events are changes for GET /sync as well
+    logged = log_rows("event", repair.c.id, repair.c.id, "log_event")
+    result = await db.execute(select(repair.c.id).add_cte(logged))
+    repaired = sorted(result.scalars().all())
+    await db.commit()
+    return repaired
+
+
+async def _main() -> None:
+    from db.database import engine, AsyncSessionLocal
+
+    try:
+        async with AsyncSessionLocal() as session:
+            repaired = await reconcile_event_counters(session)
+        print(f"Repaired counters for {len(repaired)} event(s)" + (": " + ", ".join(map(str, repaired)) if repaired else ""))
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
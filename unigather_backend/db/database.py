@@ -1,9 +1,14 @@
-from sqlalchemy import NullPool, text
+import asyncpg
+from sqlalchemy import NullPool, AsyncAdaptedQueuePool, event, exc
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from typing import AsyncGenerator
 import os
+import time
 from dotenv import load_dotenv
 
+from db import query_stats
+from api import tracing
+
 load_dotenv()
 
 
@@ -14,10 +19,73 @@ HOST = os.getenv("host")
 PORT = os.getenv("port")
 DBNAME = os.getenv("dbname")
 SCHEMA = os.getenv("schema")
+SSL = os.getenv("db_ssl", "require")
+
+# Connection pool profile:
+#   "pooled"     - long-lived process (uvicorn/fastapi dev), connections are kept warm
+#   "serverless" - one connection per request (NullPool), used by the Vercel deployment
+POOL_MODE = os.getenv("pool_mode", "pooled")
+POOL_SIZE = int(os.getenv("pool_size", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("pool_max_overflow", "10"))
+POOL_TIMEOUT = float(os.getenv("pool_timeout", "30"))
+POOL_PRE_PING = os.getenv("pool_pre_ping", "false").lower() in ("1", "true", "yes")
+POOL_RECYCLE = int(os.getenv("pool_recycle", "1800"))  # seconds, -1 disables
+POOL_MAX_IDLE = float(os.getenv("pool_max_idle", "300"))  # seconds, 0 disables
+
+if POOL_MODE not in ("pooled", "serverless"):
+    raise ValueError(f"Unknown pool_mode '{POOL_MODE}', expected 'pooled' or 'serverless'")
 
 
 DATABASE_URL = f"postgresql+asyncpg://{USER}:{PASSWORD}@{HOST}:{PORT}/{DBNAME}"
-engine = create_async_engine(DATABASE_URL, connect_args={"ssl": "require"}, poolclass=NullPool)
+
+
+def _connect_args() -> dict:
+    connect_args = {"ssl": SSL} if SSL != "disable" else {}
+    if SCHEMA:
+        # search_path is sent in the connection startup packet, so every physical
+        # connection is bound to the schema once instead of per request.
+        connect_args["server_settings"] = {"search_path": SCHEMA}
+    return connect_args
+
+
+def build_engine(url: str = DATABASE_URL, mode: str = POOL_MODE):
+    connect_args = _connect_args()
+    if mode == "serverless":
+        return create_async_engine(url, connect_args=connect_args, poolclass=NullPool)
+
+    new_engine = create_async_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_pre_ping=POOL_PRE_PING,
+        pool_recycle=POOL_RECYCLE,
+    )
+    if POOL_MAX_IDLE > 0:
+        _install_idle_timeout(new_engine, POOL_MAX_IDLE)
+    return new_engine
+
+
+def _install_idle_timeout(target_engine, max_idle: float) -> None:
+    # Drop connections that sat unused in the pool for too long instead of
+    # handing them out (the server or a proxy may already have closed them).
+    @event.listens_for(target_engine.sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(target_engine.sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        last_checkin = connection_record.info.get("last_checkin")
+        if last_checkin is not None and time.monotonic() - last_checkin > max_idle:
+            raise exc.DisconnectionError("Connection idle for too long")
+
+
+engine = build_engine()
+# statements per request and slow statements, for /metrics (api/metrics.py)
+query_stats.install(engine)
+tracing.install(engine)
 #print(f"Connecting to database at {DATABASE_URL}")
 
 
@@ -25,9 +93,29 @@ engine = create_async_engine(DATABASE_URL, connect_args={"ssl": "require"}, pool
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 
+async def connect_raw() -> asyncpg.Connection:
+    # a dedicated asyncpg connection outside the pool, e.g. for LISTEN (api/realtime.py)
+    return await asyncpg.connect(DATABASE_URL.replace("+asyncpg", ""), **_connect_args())
+
+
+def get_pool_status() -> dict:
+    pool = engine.pool
+    status = {"mode": POOL_MODE, "pool_class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "max_overflow": POOL_MAX_OVERFLOW,
+            "pre_ping": POOL_PRE_PING,
+            "recycle": POOL_RECYCLE,
+            "max_idle": POOL_MAX_IDLE,
+        })
+    return status
+
+
 # Dependency for FastAPI
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
-        text_schema = f"SET search_path TO {SCHEMA}"
-        await session.execute(text(text_schema))
-        yield session
\ No newline at end of file
+        yield session
@@ -1,44 +1,105 @@
-from typing import List, Optional, Sequence
-from sqlalchemy import select
+from typing import List, Mapping, Optional, Sequence
+from sqlalchemy import DateTime, Integer, String, case, column, delete, func, literal, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from db.db_models import Attendance
+from db.db_models import Attendance, Events
+from db.change_log import log_rows
+from db import feed
+from db.row_versions import versions_digest
+from db.projection import select_rows
 from api.api_objects import AttendanceBase
+from api.response_cache import response_cache
+from api.realtime import realtime, counters
+from api.tracing import traced_methods
 from datetime import datetime
 
 
 
+def _counter_delta(rows, sign: int) -> dict:
+    # going/interested liczone osobno, "not going" nie ma licznika
+    return {
+        "going_count": Events.going_count + sign * case((rows.c.status == "going", 1), else_=0),
+        "interested_count": Events.interested_count + sign * case((rows.c.status == "interested", 1), else_=0),
+        "updated_at": func.now(),
+    }
+
+
+def _feed_delta(event, rows, user_id: int):
+    # going / interested of user_id (the user of all `rows`), as feed rows of their friends
+    return feed.fan_out(
+        event, user_id, event.c.id == rows.c.event_id,
+        friends_going=case((rows.c.status == "going", 1), else_=0),
+        friends_interested=case((rows.c.status == "interested", 1), else_=0),
+    ).where(rows.c.status.in_(("going", "interested")))
+
+
+@traced_methods
 class AttendanceController:
     def __init__(self, db: AsyncSession):
         self.db = db
 
 
     async def add_attendance(self, attendance: AttendanceBase) -> bool:
-        # Sprawdź, czy rekord już istnieje
-        stmt = select(Attendance).where(
-            Attendance.user_id == attendance.user_id,
-            Attendance.event_id == attendance.event_id
-        )
-        result = await self.db.execute(stmt)
-        existing = result.scalars().first()
+        return attendance.event_id in await self.add_attendances(attendance.user_id, {attendance.event_id: attendance.status})
 
-        if existing:
-            return False  # Użytkownik już zapisany
-
-        # Jeśli nie istnieje, dodaj nowy rekord
-        new_attendance = Attendance(
-            user_id=attendance.user_id,
-            event_id=attendance.event_id,
-            status=attendance.status,
-            timestamp=datetime.now()
+    async def add_attendances(self, user_id: int, statuses: Mapping[int, str]) -> set[int]:
+        """
+        Signs `user_id` up for every event of `statuses` ({event_id: status})
+        in one statement; returns the events signed up for now (existing, and
+        not signed up for before).
+        """
+        if not statuses:
+            return set()
+        batch = values(column("event_id", Integer), column("status", String), name="batch").data(list(statuses.items()))
+        rows = (
+            select(literal(user_id, Integer), batch.c.event_id, batch.c.status, literal(datetime.now(), DateTime))
+            .join_from(batch, Events, Events.id == batch.c.event_id)
         )
-        self.db.add(new_attendance)
-        await self.db.commit()
-        return True
+        # Jeden INSERT; jeśli użytkownik już zapisany, ON CONFLICT nic nie zwraca
+        # i liczniki na events zostają bez zmian
+        inserted = (
+            insert(Attendance)
+            .from_select(["user_id", "event_id", "status", "timestamp"], rows)
+            .on_conflict_do_nothing(index_elements=[Attendance.user_id, Attendance.event_id])
+            .returning(Attendance.event_id, Attendance.user_id, Attendance.status)
+            .cte("inserted")
+        )
+        bump = (
+            update(Events)
+            .where(Events.id == inserted.c.event_id)
+            .values(_counter_delta(inserted, 1))
+            .returning(*feed.EVENT_COLUMNS)
+            .cte("bump")
+        )
+        logged = (
+            log_rows("attendance", inserted.c.event_id, inserted.c.user_id, "log_attendance"),
+            log_rows("event", bump.c.id, bump.c.id, "log_event"),
+        )
+        fed = (
+            feed.add(_feed_delta(bump, inserted, user_id), "feed_add"),
+            feed.rerank(bump, user_id, "feed_rerank"),
+        )
+        try:
+            result = await self.db.execute(select(bump.c.id, *counters(bump)).add_cte(*logged, *fed))
+            counts = result.all()
+            await self.db.commit()
+        except IntegrityError:
+            # an event deleted meanwhile
+            await self.db.rollback()
+            return set()
+        await self._changed(counts)
+        return {row.id for row in counts}
 
-    async def get_attendance_by_event(self, event_id: int) -> Sequence[Attendance]:
-        stmt = select(Attendance).where(Attendance.event_id == event_id)
+    async def get_attendance_by_event(self, event_id: int, fields: Optional[Sequence[str]] = None) -> Sequence[Attendance]:
+        # with `fields` (names of columns) Row tuples of just those
+        stmt = select_rows(Attendance, fields).where(Attendance.event_id == event_id)
         result = await self.db.execute(stmt)
-        return result.scalars().all()
+        return result.all() if fields else result.scalars().all()
+
+    async def get_attendance_version(self, event_id: int) -> str:
+        stmt = select(versions_digest(Attendance.user_id, Attendance.updated_at)).where(Attendance.event_id == event_id)
+        return await self.db.scalar(stmt)
 
     async def get_attendance_by_user(self, user_id: int) -> Sequence[Attendance]:
         stmt = select(Attendance).where(Attendance.user_id == user_id)
@@ -46,14 +107,40 @@ class AttendanceController:
         return result.scalars().all()
 
     async def delete_attendance(self, user_id: int, event_id: int) -> bool:
-        stmt = select(Attendance).where(
-            Attendance.user_id == user_id,
-            Attendance.event_id == event_id
+        deleted = (
+            delete(Attendance)
+            .where(
+                Attendance.user_id == user_id,
+                Attendance.event_id == event_id
+            )
+            .returning(Attendance.event_id, Attendance.user_id, Attendance.status)
+            .cte("deleted")
         )
-        result = await self.db.execute(stmt)
-        attendance_record = result.scalars().first()
-        if attendance_record:
-            await self.db.delete(attendance_record)
-            await self.db.commit()
-            return True
-        return False
+        unbump = (
+            update(Events)
+            .where(Events.id == deleted.c.event_id)
+            .values(_counter_delta(deleted, -1))
+            .returning(*feed.EVENT_COLUMNS)
+            .cte("unbump")
+        )
+        logged = (
+            log_rows("attendance", deleted.c.event_id, deleted.c.user_id, "log_attendance"),
+            log_rows("event", unbump.c.id, unbump.c.id, "log_event"),
+        )
+        fed = (
+            *feed.subtract(_feed_delta(unbump, deleted, user_id), "feed_sub"),
+            feed.rerank(unbump, user_id, "feed_rerank"),
+        )
+        result = await self.db.execute(select(unbump.c.id, *counters(unbump)).add_cte(*logged, *fed))
+        counts = result.all()
+        await self.db.commit()
+        await self._changed(counts)
+        return bool(counts)
+
+    async def _changed(self, rows) -> None:
+        # going/interested counts of GET /events pages catch up within their short TTL
+        for row in rows:
+            counts = row._asdict()
+            event_id = counts.pop("id")
+            await response_cache.invalidate(f"attendance:{event_id}", f"event:{event_id}")
+            await realtime.publish(event_id, "counts", counts)
@@ -1,40 +1,168 @@
-from typing import List, Sequence
-from sqlalchemy import select
+from typing import List, Optional, Sequence
+from sqlalchemy import DateTime, Integer, Text, column, delete, func, literal, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from db.db_models import Comments
+from db.db_models import Comments, Events
+from db.change_log import log_rows
+from db.row_versions import versions_digest
+from db.projection import select_rows
 from api.api_objects import CommentBase
+from api.response_cache import response_cache
+from api.realtime import realtime
+from api.tracing import traced_methods
 from datetime import datetime
 
 
 
+@traced_methods
 class CommentController:
     def __init__(self, db: AsyncSession):
         self.db = db
 
     async def add_comment(self, comment: CommentBase) -> int:
-        new_comment = Comments(
-            event_id=comment.event_id,
-            user_id=comment.user_id,
-            content=comment.content,
-            created_at=datetime.now()
+        # RETURNING zwraca ID w tym samym zapytaniu, bez refresh();
+        # events.comment_count podbijany w tym samym zapytaniu (CTE)
+        inserted = (
+            insert(Comments)
+            .values(
+                event_id=comment.event_id,
+                user_id=comment.user_id,
+                content=comment.content,
+                created_at=datetime.now()
+            )
+            .returning(Comments.id, Comments.event_id, Comments.created_at)
+            .cte("inserted")
         )
-        self.db.add(new_comment)
+        bump = (
+            update(Events)
+            .where(Events.id == inserted.c.event_id)
+            .values(comment_count=Events.comment_count + 1, updated_at=func.now())
+            .returning(Events.id, Events.comment_count)
+            .cte("bump")
+        )
+        logged = (
+            log_rows("comment", inserted.c.event_id, inserted.c.id, "log_comment"),
+            log_rows("event", bump.c.id, bump.c.id, "log_event"),
+        )
+        stmt = (
+            select(inserted.c.id, inserted.c.created_at, bump.c.comment_count)
+            .join_from(inserted, bump, bump.c.id == inserted.c.event_id)
+            .add_cte(*logged)
+        )
+        result = await self.db.execute(stmt)
+        row = result.one()
         await self.db.commit()
-        await self.db.refresh(new_comment)  # Upewniamy się, że ID jest dostępne
-        return new_comment.id
+        await response_cache.invalidate(f"comments:{comment.event_id}", f"event:{comment.event_id}")
+        await realtime.publish(comment.event_id, "comment", {
+            "id": row.id, **comment.model_dump(), "created_at": row.created_at, "comment_count": row.comment_count,
+        })
+        return row.id
 
-    async def get_comments_for_event(self, event_id: int) -> Sequence[Comments]:
-        stmt = select(Comments).where(Comments.event_id == event_id)
+    async def add_comments(self, user_id: int, comments: Sequence[tuple[int, str]]) -> list[Optional[int]]:
+        """
+        Adds (event_id, content) comments by `user_id` in one statement and
+        returns their ids in the same order, None for comments on events that
+        do not exist.
+        """
+        if not comments:
+            return []
+        batch = values(
+            column("position", Integer), column("event_id", Integer), column("content", Text), name="batch"
+        ).data([(i, event_id, content) for i, (event_id, content) in enumerate(comments)])
+        # ids drawn up front (the CTE runs once), so each RETURNING row maps back to its position;
+        # nextval() runs after the ORDER BY, so ids follow the order of the batch
+        source = (
+            select(func.nextval(func.pg_get_serial_sequence("comments", "id")).label("id"), batch.c.position, batch.c.event_id, batch.c.content)
+            .join_from(batch, Events, Events.id == batch.c.event_id)
+            .order_by(batch.c.position)
+            .cte("source")
+        )
+        inserted = (
+            insert(Comments)
+            .from_select(
+                ["id", "event_id", "user_id", "content", "created_at"],
+                select(source.c.id, source.c.event_id, literal(user_id, Integer), source.c.content, literal(datetime.now(), DateTime)),
+            )
+            .returning(Comments.id, Comments.event_id, Comments.content, Comments.created_at)
+            .cte("inserted")
+        )
+        per_event = select(inserted.c.event_id, func.count().label("added")).group_by(inserted.c.event_id).cte("per_event")
+        bump = (
+            update(Events)
+            .where(Events.id == per_event.c.event_id)
+            .values(comment_count=Events.comment_count + per_event.c.added, updated_at=func.now())
+            .returning(Events.id, Events.comment_count)
+            .cte("bump")
+        )
+        logged = (
+            log_rows("comment", inserted.c.event_id, inserted.c.id, "log_comment"),
+            log_rows("event", bump.c.id, bump.c.id, "log_event"),
+        )
+        stmt = (
+            select(source.c.position, inserted.c.id, inserted.c.event_id, inserted.c.content, inserted.c.created_at, bump.c.comment_count)
+            .join_from(inserted, source, source.c.id == inserted.c.id)
+            .join(bump, bump.c.id == inserted.c.event_id)
+            .order_by(source.c.position)
+            .add_cte(*logged)
+        )
+        try:
+            rows = (await self.db.execute(stmt)).all()
+            await self.db.commit()
+        except IntegrityError:
+            # an event deleted meanwhile
+            await self.db.rollback()
+            return [None] * len(comments)
+
+        ids: list[Optional[int]] = [None] * len(comments)
+        for row in rows:
+            ids[row.position] = row.id
+        for event_id in {row.event_id for row in rows}:
+            await response_cache.invalidate(f"comments:{event_id}", f"event:{event_id}")
+        for row in rows:
+            await realtime.publish(row.event_id, "comment", {
+                "id": row.id, "event_id": row.event_id, "user_id": user_id, "content": row.content,
+                "created_at": row.created_at, "comment_count": row.comment_count,
+            })
+        return ids
+
+    async def get_comments_for_event(self, event_id: int, fields: Optional[Sequence[str]] = None) -> Sequence[Comments]:
+        # with `fields` (names of columns) Row tuples of just those
+        stmt = select_rows(Comments, fields).where(Comments.event_id == event_id)
         result = await self.db.execute(stmt)
-        return result.scalars().all()
+        return result.all() if fields else result.scalars().all()
+
+    async def get_comments_version(self, event_id: int) -> str:
+        stmt = select(versions_digest(Comments.id, Comments.updated_at)).where(Comments.event_id == event_id)
+        return await self.db.scalar(stmt)
 
     async def delete_comment(self, comment_id: int) -> bool:
-        comment = await self.db.get(Comments, comment_id)
-        if comment:
-            await self.db.delete(comment)
-            await self.db.commit()
-            return True
-        return False
+        deleted = (
+            delete(Comments)
+            .where(Comments.id == comment_id)
+            .returning(Comments.id, Comments.event_id)
+            .cte("deleted")
+        )
+        unbump = (
+            update(Events)
+            .where(Events.id == deleted.c.event_id)
+            .values(comment_count=Events.comment_count - 1, updated_at=func.now())
+            .returning(Events.id, Events.comment_count)
+            .cte("unbump")
+        )
+        logged = (
+            log_rows("comment", deleted.c.event_id, deleted.c.id, "log_comment"),
+            log_rows("event", unbump.c.id, unbump.c.id, "log_event"),
+        )
+        result = await self.db.execute(select(unbump.c.id.label("event_id"), unbump.c.comment_count).add_cte(*logged))
+        row = result.first()
+        await self.db.commit()
+        if row is None:
+            return False
+        await response_cache.invalidate(f"comments:{row.event_id}", f"event:{row.event_id}")
+        await realtime.publish(row.event_id, "comment_deleted", {"id": comment_id, "comment_count": row.comment_count})
+        return True
+
     async def get_comment_by_id(self, comment_id: int) -> Comments | None:
         stmt = select(Comments).where(Comments.id == comment_id)
         result = await self.db.execute(stmt)
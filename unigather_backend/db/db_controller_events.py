@@ -1,49 +1,102 @@
-from typing import List, Optional
-from sqlalchemy import select, update
+from typing import List, Optional, Sequence
+from sqlalchemy import select, update, tuple_, func, exists, or_, and_, literal_column
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.db_models import Events
-from api.api_objects import EventBase, EventUpdate
-from datetime import datetime
+from sqlalchemy.orm import selectinload, joinedload
+from db.db_models import Events, Attendance, Comments, Likes
+from db.row_versions import versions_digest
+from db.projection import select_rows
+from db.change_log import log_row, log_rows, log_select
+from db.event_locations import location_columns
+from db import feed
+from api.api_objects import EventBase, EventResponse, EventUpdate
+from api.response_cache import response_cache
+from api.realtime import realtime
+from api.tracing import traced_methods
+from api import geohash
+from datetime import datetime, timezone
+import re
 
+@traced_methods
 class EventController:
     def __init__(self, db: AsyncSession):
         self.db = db
 
 
     async def add_event(self, event: EventBase) -> Optional[int]:
-        # Sprawdzamy, czy wydarzenie o takim tytule (lub innych unikalnych cechach) już istnieje
-        stmt = select(Events).where(Events.title == event.title, Events.created_by == event.created_by)
-        result = await self.db.execute(stmt)
-        existing_event = result.scalars().first()
-
-        if existing_event:
-            return None  # Wydarzenie już istnieje
-
-        dt = event.event_datetime
-        if dt.tzinfo is not None:
-            # drop the tzinfo so it matches your “TIMESTAMP WITHOUT TIME ZONE” column
-            dt = dt.replace(tzinfo=None)
-        
-        # Jeśli nie istnieje, dodajemy nowe wydarzenie
-        new_event = Events(
-            title=event.title,
-            description=event.description,
-            location=event.location,
-            datetime=dt,
-            visibility=event.visibility,
-            created_by=event.created_by,
-            created_at=datetime.now()
+        # Wydarzenie o tym samym tytule i autorze już istnieje -> ON CONFLICT, zwracamy None
+        dt = _naive(event.event_datetime)
+
+        inserted = (
+            insert(Events)
+            .values(
+                title=event.title,
+                description=event.description,
+                location=event.location,
+                datetime=dt,
+                visibility=event.visibility,
+                created_by=event.created_by,
+                created_at=datetime.now(),
+                **await location_columns(event.location)
+            )
+            .on_conflict_do_nothing(index_elements=[Events.created_by, Events.title])
+            .returning(*feed.EVENT_COLUMNS)
+            .cte("inserted")
         )
-        self.db.add(new_event)
+        logged = log_rows("event", inserted.c.id, inserted.c.id, "log_event")
+        fed = feed.add(feed.fan_out(inserted, event.created_by, friends_created=1), "feed_add")
+        result = await self.db.execute(select(inserted.c.id).add_cte(logged, fed))
+        event_id = result.scalar_one_or_none()
         await self.db.commit()
-        await self.db.refresh(new_event)
-        return new_event.id
+        if event_id is not None:
+            await response_cache.invalidate("events")
+        return event_id
 
     async def get_event_by_id(self, event_id: int) -> Optional[Events]:
         stmt = select(Events).where(Events.id == event_id)
         result = await self.db.execute(stmt)
         return result.scalars().first()
 
+    async def get_event_detail(self, event_id: int, viewer_id: int) -> Optional[dict]:
+        # 3 statements for the event (+ viewer subqueries), media and comments with authors,
+        # 1 for attendance counts - independent of the number of comments/media
+        liked_by_viewer = exists().where(Likes.event_id == Events.id, Likes.user_id == viewer_id)
+        viewer_status = (
+            select(Attendance.status)
+            .where(Attendance.event_id == Events.id, Attendance.user_id == viewer_id)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(Events, liked_by_viewer, viewer_status)
+            .where(Events.id == event_id)
+            .options(
+                selectinload(Events.media),
+                selectinload(Events.comments).joinedload(Comments.user),
+            )
+        )
+        result = await self.db.execute(stmt)
+        row = result.first()
+        if row is None:
+            return None
+        event, liked, status = row
+
+        counts = await self.db.execute(
+            select(Attendance.status, func.count())
+            .where(Attendance.event_id == event_id)
+            .group_by(Attendance.status)
+        )
+
+        return {
+            "event": event,
+            "attendance_counts": {status_name: count for status_name, count in counts.all()},
+            "viewer_status": status,
+            "like_count": event.like_count,
+            "liked_by_viewer": liked,
+            "media": sorted(event.media, key=lambda m: m.id),
+            "comments": sorted(event.comments, key=lambda c: (c.created_at or datetime.min, c.id)),
+        }
+
     async def get_events(self, created_by: Optional[int] = None, visibility: Optional[str] = None) -> List[Events]:
         stmt = select(Events)
 
@@ -55,6 +108,83 @@ class EventController:
         result = await self.db.execute(stmt)
         return result.scalars().all()
 
+    async def get_events_page(
+        self,
+        limit: int,
+        after: Optional[tuple[datetime, int]] = None,
+        created_by: Optional[int] = None,
+        visibility: Optional[str] = None,
+        upcoming: bool = False,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> tuple[List[Events], bool]:
+        # keyset pagination ordered by (datetime, id), returns (page, has_more);
+        # with `fields` Row tuples of those columns, plus the id and datetime the next cursor needs
+        if fields:
+            fields = list(dict.fromkeys([*fields, "id", "datetime"]))
+        stmt = _page_query(select_rows(Events, fields), limit, after, created_by, visibility, upcoming, date_from, date_to)
+        result = await self.db.execute(stmt)
+        events = list(result.all() if fields else result.scalars().all())
+        return events[:limit], len(events) > limit
+
+    async def get_events_page_version(
+        self,
+        limit: int,
+        after: Optional[tuple[datetime, int]] = None,
+        created_by: Optional[int] = None,
+        visibility: Optional[str] = None,
+        upcoming: bool = False,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> str:
+        # same rows as get_events_page (including the look-ahead row), only ids and versions
+        page = _page_query(
+            select(Events.id, Events.updated_at), limit, after, created_by, visibility, upcoming, date_from, date_to
+        ).subquery()
+        return await self.db.scalar(select(versions_digest(page.c.id, page.c.updated_at)))
+
+    async def get_event_version(self, event_id: int) -> Optional[datetime]:
+        return await self.db.scalar(select(Events.updated_at).where(Events.id == event_id))
+
+    async def get_nearby_events(
+        self, latitude: float, longitude: float, radius_km: float, limit: int
+    ) -> List[tuple[Events, float]]:
+        # candidates come from a few geohash prefix scans, the exact distance filters and sorts them
+        distance = _distance_km(latitude, longitude)
+        stmt = (
+            select(Events, distance.label("distance_km"))
+            .where(distance <= radius_km)
+            .order_by(distance, Events.id)
+            .limit(limit)
+        )
+        cells = geohash.covering_cells(latitude, longitude, radius_km)
+        if cells:
+            stmt = stmt.where(or_(*(Events.geohash.startswith(cell) for cell in cells)))
+        result = await self.db.execute(stmt)
+        return [(event, dist) for event, dist in result.all()]
+
+    async def search_events(
+        self, q: str, limit: int, after: Optional[tuple[float, int]] = None
+    ) -> tuple[List[tuple[Events, float]], bool]:
+        # best matches first (rank desc, id), keyset over the same order; returns (page, has_more)
+        query = _search_query(q)
+        if query is None:
+            return [], False
+        rank = func.ts_rank_cd(Events.search_vector, query)
+        stmt = (
+            select(Events, rank.label("rank"))
+            .where(Events.search_vector.op("@@")(query))
+            .order_by(rank.desc(), Events.id)
+            .limit(limit + 1)
+        )
+        if after is not None:
+            after_rank, after_id = after
+            stmt = stmt.where(or_(rank < after_rank, and_(rank == after_rank, Events.id > after_id)))
+        result = await self.db.execute(stmt)
+        rows = [(event, score) for event, score in result.all()]
+        return rows[:limit], len(rows) > limit
+
     async def update_event(self, event_id: int, event_data: EventUpdate) -> bool:
         event = await self.db.get(Events, event_id)
         if not event:
@@ -64,26 +194,96 @@ class EventController:
             event.title = event_data.title
         if event_data.description is not None:
             event.description = event_data.description
-        if event_data.location is not None:
+        if event_data.location is not None and event_data.location != event.location:
             event.location = event_data.location
+            for column, value in (await location_columns(event_data.location)).items():
+                setattr(event, column, value)
 
         if event_data.event_datetime is not None:
-            # strip tzinfo before assigning
-            new_dt = event_data.event_datetime
-            if new_dt.tzinfo is not None:
-                new_dt = new_dt.replace(tzinfo=None)
-            event.datetime = new_dt
+            event.datetime = _naive(event_data.event_datetime)
 
         if event_data.visibility is not None:
             event.visibility = event_data.visibility
 
+        event.updated_at = func.now()  # the database clock, like the counter updates
+        await self.db.execute(log_row("event", event_id, event_id))
+        if event_data.visibility is not None or event_data.event_datetime is not None:
+            # whether and until when the event is in anyone's feed
+            await self.db.flush()
+            await feed.rebuild(self.db, [event_id])
         await self.db.commit()
+        await response_cache.invalidate("events", f"event:{event_id}")
+        await realtime.publish(event_id, "event", EventResponse.model_validate(event))
         return True
 
     async def delete_event(self, event_id: int) -> bool:
         event = await self.db.get(Events, event_id)
         if not event:
             return False
+        # children go with the event (FK cascade), GET /sync reports them as deleted too
+        await self.db.execute(log_row("event", event_id, event_id))
+        await self.db.execute(log_select("comment", Comments.event_id, Comments.id, Comments.event_id == event_id))
+        await self.db.execute(log_select("like", Likes.event_id, Likes.user_id, Likes.event_id == event_id))
+        await self.db.execute(log_select("attendance", Attendance.event_id, Attendance.user_id, Attendance.event_id == event_id))
         await self.db.delete(event)
         await self.db.commit()
+        await response_cache.invalidate(
+            "events", f"event:{event_id}", f"attendance:{event_id}", f"comments:{event_id}", f"media:{event_id}"
+        )
+        await realtime.publish(event_id, "event_deleted")
         return True
+
+
+def _page_query(
+    stmt,
+    limit: int,
+    after: Optional[tuple[datetime, int]],
+    created_by: Optional[int],
+    visibility: Optional[str],
+    upcoming: bool,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+):
+    stmt = stmt.order_by(Events.datetime, Events.id)
+
+    if created_by:
+        stmt = stmt.where(Events.created_by == created_by)
+    if visibility:
+        stmt = stmt.where(Events.visibility == visibility)
+    if upcoming:
+        stmt = stmt.where(Events.datetime >= func.timezone("UTC", func.now()))
+    if date_from is not None:
+        stmt = stmt.where(Events.datetime >= _naive(date_from))
+    if date_to is not None:
+        stmt = stmt.where(Events.datetime < _naive(date_to))
+    if after is not None:
+        after_dt, after_id = after
+        stmt = stmt.where(tuple_(Events.datetime, Events.id) > (_naive(after_dt), after_id))
+
+    # one extra row tells whether another page exists
+    return stmt.limit(limit + 1)
+
+
+def _search_query(q: str, max_terms: int = 8):
+    # every word must match, as a prefix ("konc" finds "koncert", "koncertu")
+    words = re.findall(r"\w+", q.lower())[:max_terms]
+    if not words:
+        return None
+    terms = " & ".join(f"'{word}':*" for word in words)
+    return func.to_tsquery(literal_column("'simple'", REGCONFIG), terms)
+
+
+def _distance_km(latitude: float, longitude: float):
+    # haversine distance between the event and the given point
+    half_dlat = func.radians(Events.latitude - latitude) / 2
+    half_dlon = func.radians(Events.longitude - longitude) / 2
+    a = (
+        func.power(func.sin(half_dlat), 2)
+        + func.cos(func.radians(latitude)) * func.cos(func.radians(Events.latitude)) * func.power(func.sin(half_dlon), 2)
+    )
+    return 2 * geohash.EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(1.0, a)))
+
+
+def _naive(dt: datetime) -> datetime:
+    # events.datetime is TIMESTAMP WITHOUT TIME ZONE in UTC; aware values are converted, naive ones taken as UTC
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo is not None else dt
@@ -0,0 +1,34 @@
+from typing import List, Optional
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.db_models import Events, FeedItems
+from api.tracing import traced_methods
+
+
+@traced_methods
+class FeedController:
+    """Reads the precomputed feed_items rows, kept up to date by db/feed.py."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_feed_page(
+        self, user_id: int, limit: int, after: Optional[tuple[float, int]] = None
+    ) -> tuple[List[tuple[Events, FeedItems]], bool]:
+        # (score desc, event_id) walks ix_feed_items_user_score; returns (page, has_more)
+        stmt = (
+            select(Events, FeedItems)
+            .join(FeedItems, FeedItems.event_id == Events.id)
+            .where(FeedItems.user_id == user_id, FeedItems.event_datetime >= func.timezone("UTC", func.now()))
+            .order_by(FeedItems.score.desc(), FeedItems.event_id)
+            .limit(limit + 1)
+        )
+        if after is not None:
+            after_score, after_id = after
+            stmt = stmt.where(
+                or_(FeedItems.score < after_score, and_(FeedItems.score == after_score, FeedItems.event_id > after_id))
+            )
+        result = await self.db.execute(stmt)
+        rows = [(event, item) for event, item in result.all()]
+        return rows[:limit], len(rows) > limit
@@ -1,39 +1,48 @@
 from typing import List, Sequence
-from sqlalchemy import select
+from sqlalchemy import select, exists, literal, Integer, String, DateTime
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from db.db_models import Friends
+from db import feed
 from api.api_objects import Friendship, FriendshipUpdate
+from api.tracing import traced_methods
 from datetime import datetime
 
 
+@traced_methods
 class FriendshipController:
     def __init__(self, db: AsyncSession):
         self.db = db
 
 
     async def send_friend_request(self, friendship: Friendship) -> bool:
-        # Sprawdzamy, czy już istnieje prośba o przyjaźń w jedną lub drugą stronę
-        stmt = select(Friends).where(
-            (Friends.user_id == friendship.user_id and Friends.friend_id == friendship.friend_id) |
-            (Friends.user_id == friendship.friend_id and Friends.friend_id == friendship.user_id)
+        # Jedno zapytanie: prośba w tę samą stronę -> ON CONFLICT (klucz główny),
+        # prośba w przeciwną stronę -> warunek NOT EXISTS
+        reverse_exists = exists().where(
+            Friends.user_id == friendship.friend_id,
+            Friends.friend_id == friendship.user_id
         )
-        result = await self.db.execute(stmt)
-        existing_request = result.scalars().first()
-
-        if existing_request:
-            return False  # Prośba już istnieje
-
-        # Tworzymy nową prośbę o przyjaźń
-        new_request = Friends(
-            user_id=friendship.user_id,
-            friend_id=friendship.friend_id,
-            status=friendship.status,
-            created_at=datetime.now()
+        new_request = select(
+            literal(friendship.user_id, Integer),
+            literal(friendship.friend_id, Integer),
+            literal(friendship.status, String),
+            literal(datetime.now(), DateTime)
+        ).where(~reverse_exists)
+        inserted = (
+            insert(Friends)
+            .from_select(["user_id", "friend_id", "status", "created_at"], new_request)
+            .on_conflict_do_nothing(index_elements=[Friends.user_id, Friends.friend_id])
+            .returning(Friends.user_id, Friends.status)
+            .cte("inserted")
+        )
+        # created as accepted: each one's activity goes into the other's feed
+        fed = feed.befriend(
+            friendship.user_id, friendship.friend_id, feed.only_if(inserted, inserted.c.status == "accepted")
         )
-        self.db.add(new_request)
+        result = await self.db.execute(select(inserted.c.user_id).add_cte(*fed))
+        added = result.scalar_one_or_none() is not None
         await self.db.commit()
-        await self.db.refresh(new_request)  # Upewniamy się, że ID jest dostępne
-        return True
+        return added
 
     async def update_friend_status(self, user_id: int, friend_id: int, status: str) -> bool:
         stmt = select(Friends).where(
@@ -44,7 +53,10 @@ class FriendshipController:
         record = result.scalars().first()
 
         if record:
-            record.status = status
+            was_accepted, record.status = record.status == "accepted", status
+            if was_accepted != (status == "accepted"):
+                change = feed.befriend if status == "accepted" else feed.unfriend
+                await self.db.execute(select(literal(True)).add_cte(*change(user_id, friend_id)))
             await self.db.commit()
             return True
         return False
@@ -63,6 +75,8 @@ class FriendshipController:
         record = result.scalars().first()
 
         if record:
+            if record.status == "accepted":
+                await self.db.execute(select(literal(True)).add_cte(*feed.unfriend(user_id, friend_id)))
             await self.db.delete(record)
             await self.db.commit()
             return True
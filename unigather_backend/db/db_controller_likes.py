@@ -1,40 +1,111 @@
-from typing import List
+from typing import Iterable, List
 from datetime import datetime
-from sqlalchemy import select
+from sqlalchemy import DateTime, Integer, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from db.db_models import Likes
+from db.db_models import Likes, Events
+from db.change_log import log_rows
+from db import feed
 from api.api_objects import LikeBase
+from api.response_cache import response_cache
+from api.realtime import realtime, counters
+from api.tracing import traced_methods
 
+@traced_methods
 class LikeController:
     def __init__(self, db: AsyncSession):
         self.db = db
 
     async def add_like(self, like: LikeBase) -> bool:
-        new_like = Likes(
-            user_id=like.user_id,
-            event_id=like.event_id,
-            created_at=datetime.now()
+        return like.event_id in await self.add_likes(like.user_id, [like.event_id])
+
+    async def add_likes(self, user_id: int, event_ids: Iterable[int]) -> set[int]:
+        """
+        Likes every event of `event_ids` as `user_id` in one statement and
+        returns the ids of the events that were liked now (not before, and
+        existing).
+        """
+        # INSERT i podbicie events.like_count w jednym zapytaniu (CTE);
+        # licznik rośnie tylko, gdy wiersz faktycznie został dodany
+        rows = select(literal(user_id, Integer), Events.id, literal(datetime.now(), DateTime)).where(Events.id.in_(set(event_ids)))
+        inserted = (
+            insert(Likes)
+            .from_select(["user_id", "event_id", "created_at"], rows)
+            .on_conflict_do_nothing(index_elements=[Likes.user_id, Likes.event_id])
+            .returning(Likes.event_id, Likes.user_id)
+            .cte("inserted")
+        )
+        bump = (
+            update(Events)
+            .where(Events.id == inserted.c.event_id)
+            .values(like_count=Events.like_count + 1, updated_at=func.now())
+            .returning(*feed.EVENT_COLUMNS)
+            .cte("bump")
+        )
+        logged = (
+            log_rows("like", inserted.c.event_id, inserted.c.user_id, "log_like"),
+            log_rows("event", bump.c.id, bump.c.id, "log_event"),
+        )
+        # the likes show up in the feeds of the user's friends
+        fed = (
+            feed.add(feed.fan_out(bump, user_id, bump.c.id == inserted.c.event_id, friends_liked=1), "feed_add"),
+            feed.rerank(bump, user_id, "feed_rerank"),
         )
-        self.db.add(new_like)
         try:
+            # bump returns a row exactly for each like inserted
+            result = await self.db.execute(select(bump.c.id, *counters(bump)).add_cte(*logged, *fed))
+            counts = result.all()
             await self.db.commit()
-            return True
-        except Exception:
+        except IntegrityError:
+            # an event deleted meanwhile
             await self.db.rollback()
-            return False
+            return set()
+        await self._changed(counts)
+        return {row.id for row in counts}
 
     async def remove_like(self, like: LikeBase) -> bool:
-        stmt = select(Likes).where(
-            Likes.user_id  == like.user_id,
-            Likes.event_id == like.event_id
+        return like.event_id in await self.remove_likes(like.user_id, [like.event_id])
+
+    async def remove_likes(self, user_id: int, event_ids: Iterable[int]) -> set[int]:
+        """Removes the likes of `user_id` from `event_ids`; returns the events that had one."""
+        deleted = (
+            delete(Likes)
+            .where(
+                Likes.user_id  == user_id,
+                Likes.event_id.in_(set(event_ids))
+            )
+            .returning(Likes.event_id, Likes.user_id)
+            .cte("deleted")
         )
-        result = await self.db.execute(stmt)
-        existing = result.scalars().first()
-        if existing:
-            await self.db.delete(existing)
-            await self.db.commit()
-            return True
-        return False
+        unbump = (
+            update(Events)
+            .where(Events.id == deleted.c.event_id)
+            .values(like_count=Events.like_count - 1, updated_at=func.now())
+            .returning(*feed.EVENT_COLUMNS)
+            .cte("unbump")
+        )
+        logged = (
+            log_rows("like", deleted.c.event_id, deleted.c.user_id, "log_like"),
+            log_rows("event", unbump.c.id, unbump.c.id, "log_event"),
+        )
+        fed = (
+            *feed.subtract(feed.fan_out(unbump, user_id, unbump.c.id == deleted.c.event_id, friends_liked=1), "feed_sub"),
+            feed.rerank(unbump, user_id, "feed_rerank"),
+        )
+        result = await self.db.execute(select(unbump.c.id, *counters(unbump)).add_cte(*logged, *fed))
+        counts = result.all()
+        await self.db.commit()
+        await self._changed(counts)
+        return {row.id for row in counts}
+
+    async def _changed(self, rows) -> None:
+        # like_count is part of the cached event; GET /events pages catch up within their short TTL
+        for row in rows:
+            counts = row._asdict()
+            event_id = counts.pop("id")
+            await response_cache.invalidate(f"event:{event_id}")
+            await realtime.publish(event_id, "counts", counts)
 
     async def get_likes_for_user(self, user_id: int) -> List[Likes]:
         stmt = select(Likes).where(Likes.user_id == user_id)
@@ -1,43 +1,113 @@
-from typing import List, Sequence
+from typing import List, Optional, Sequence
 from datetime import datetime
-from sqlalchemy import select
+from sqlalchemy import Row, case, delete, func, select, update
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.db_models import Media
+from db.row_versions import versions_digest
+from db.projection import select_rows
 from api.api_objects import MediaBase
+from api.media_storage import StoredUpload
+from api.response_cache import response_cache
+from api.tracing import traced_methods
 
+@traced_methods
 class MediaController:
     def __init__(self, db: AsyncSession):
         self.db = db
 
     async def add_media(self, media: MediaBase, url: str) -> int:
-        # check for existing media by event_id + url
-        stmt = select(Media).where(
-            Media.event_id == media.event_id,
-            Media.url == url
-        )
-        result = await self.db.execute(stmt)
-        existing_media = result.scalars().first()
-        if existing_media:
-            return existing_media.id
-
-        # create new media
-        new_media = Media(
+        # the same (event_id, url) returns the existing id; the no-op DO UPDATE
+        # makes RETURNING yield the existing row in the same statement
+        stmt = insert(Media).values(
             event_id=media.event_id,
             user_id=media.user_id,
             type=media.type,
             url=url,
             uploaded_at=datetime.now()
         )
-        self.db.add(new_media)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Media.event_id, Media.url],
+            set_={"url": stmt.excluded.url}
+        ).returning(Media.id)
+        result = await self.db.execute(stmt)
+        media_id = result.scalar_one()
+        await self.db.commit()
+        await response_cache.invalidate(f"media:{media.event_id}")
+        return media_id
+
+    async def add_upload(self, event_id: int, user_id: int, upload: StoredUpload) -> Row:
+        """
+        Records an uploaded file (api/media_storage.py) and returns (id, status).
+        An image already processed for another upload gets its variants copied
+        in the same statement; otherwise it is 'processing' until ThumbnailPool
+        records them. Uploading the same file to the same event again returns
+        the existing row.
+        """
+        processed = Media.__table__.alias("processed")
+        done = (processed.c.content_hash == upload.content_hash, processed.c.status == "ready")
+        copied = lambda column: select(column).where(*done).limit(1).scalar_subquery()
+        values = {}
+        if upload.type == "image":
+            values = {
+                "width": copied(processed.c.width),
+                "height": copied(processed.c.height),
+                "variants": copied(processed.c.variants),
+                "status": case((copied(processed.c.variants).is_not(None), "ready"), else_="processing"),
+            }
+        stmt = insert(Media).values(
+            event_id=event_id,
+            user_id=user_id,
+            type=upload.type,
+            url=upload.url,
+            uploaded_at=datetime.now(),
+            content_hash=upload.content_hash,
+            content_type=upload.content_type,
+            size_bytes=upload.size,
+            **({"status": "ready"} | values),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Media.event_id, Media.url],
+            set_={"url": stmt.excluded.url}
+        ).returning(Media.id, Media.status)
+        row = (await self.db.execute(stmt)).one()
+        await self.db.commit()
+        await response_cache.invalidate(f"media:{event_id}")
+        return row
+
+    async def set_variants(self, content_hash: str, status: str, width: Optional[int], height: Optional[int], variants: Optional[dict]) -> int:
+        # every row of the same file, whichever event it was uploaded to
+        stmt = (
+            update(Media)
+            .where(Media.content_hash == content_hash)
+            .values(status=status, width=width, height=height, variants=variants, updated_at=func.now())
+            .returning(Media.event_id)
+        )
+        event_ids = set((await self.db.execute(stmt)).scalars())
         await self.db.commit()
-        await self.db.refresh(new_media)
-        return new_media.id
+        for event_id in event_ids:
+            await response_cache.invalidate(f"media:{event_id}")
+        return len(event_ids)
 
-    async def get_media_for_event(self, event_id: int) -> Sequence[Media]:
-        stmt = select(Media).where(Media.event_id == event_id)
+    async def get_unprocessed_uploads(self) -> Sequence[Row]:
+        stmt = (
+            select(Media.content_hash, Media.content_type)
+            .where(Media.status.in_(("processing", "failed")), Media.type == "image")
+            .distinct()
+        )
         result = await self.db.execute(stmt)
-        return result.scalars().all()
+        return result.all()
+
+    async def get_media_for_event(self, event_id: int, fields: Optional[Sequence[str]] = None) -> Sequence[Media]:
+        # with `fields` (names of columns) Row tuples of just those
+        stmt = select_rows(Media, fields).where(Media.event_id == event_id)
+        result = await self.db.execute(stmt)
+        return result.all() if fields else result.scalars().all()
+
+    async def get_media_version(self, event_id: int) -> str:
+        stmt = select(versions_digest(Media.id, Media.updated_at)).where(Media.event_id == event_id)
+        return await self.db.scalar(stmt)
 
     async def get_media_for_user(self, user_id: int) -> Sequence[Media]:
         stmt = select(Media).where(Media.user_id == user_id)
@@ -45,11 +115,13 @@ class MediaController:
         return result.scalars().all()
 
     async def delete_media(self, media_id: int) -> bool:
-        media = await self.db.get(Media, media_id)
-        if not media:
-            return False
-        await self.db.delete(media)
+        stmt = delete(Media).where(Media.id == media_id).returning(Media.event_id)
+        result = await self.db.execute(stmt)
+        row = result.first()
         await self.db.commit()
+        if row is None:
+            return False
+        await response_cache.invalidate(f"media:{row.event_id}")
         return True
     
     async def get_media_by_id(self, media_id: int) -> Media | None:
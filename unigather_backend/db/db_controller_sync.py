@@ -0,0 +1,99 @@
+from typing import Sequence
+from sqlalchemy import BigInteger, Text, cast, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from db.db_models import Attendance, ChangeLog, Comments, Events, Likes
+from api.tracing import traced_methods
+
+
+def _horizon():
+    # xmin of the statement's snapshot: every transaction below it has finished,
+    # so no change_log row below it can still appear
+    return cast(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text), BigInteger)
+
+
+@traced_methods
+class SyncController:
+    """
+    Reads change_log in (txid, id) order. Only rows of finished transactions
+    (txid below the snapshot xmin) are returned, which makes the position of
+    the last returned row a gap-free resume point even when writers commit
+    out of order. Changed keys are resolved against the live tables: rows
+    that still exist are returned as upserted, missing ones as deleted.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def head(self) -> tuple[int, int]:
+        stmt = (
+            select(ChangeLog.txid, ChangeLog.id)
+            .where(ChangeLog.txid < _horizon())
+            .order_by(ChangeLog.txid.desc(), ChangeLog.id.desc())
+            .limit(1)
+        )
+        row = (await self.db.execute(stmt)).first()
+        return (row.txid, row.id) if row else (0, 0)
+
+    async def changes_since(self, position: tuple[int, int], limit: int) -> dict:
+        stmt = (
+            select(ChangeLog.entity, ChangeLog.event_id, ChangeLog.row_id, ChangeLog.txid, ChangeLog.id)
+            .where(tuple_(ChangeLog.txid, ChangeLog.id) > position, ChangeLog.txid < _horizon())
+            .order_by(ChangeLog.txid, ChangeLog.id)
+            .limit(limit + 1)
+        )
+        rows = (await self.db.execute(stmt)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if rows:
+            position = (rows[-1].txid, rows[-1].id)
+
+        # a key changed several times is reported once, with its current state
+        keys: dict[str, dict] = {"event": {}, "comment": {}, "like": {}, "attendance": {}}
+        for row in rows:
+            keys[row.entity][(row.event_id, row.row_id)] = None
+
+        return {
+            "position": position,
+            "has_more": has_more,
+            "events": await self._events([row_id for _, row_id in keys["event"]]),
+            "comments": await self._comments([row_id for _, row_id in keys["comment"]]),
+            "likes": await self._pairs(Likes, list(keys["like"])),
+            "attendance": await self._pairs(Attendance, list(keys["attendance"])),
+        }
+
+    # rows and counters are written with Core statements, so copies already in the
+    # session's identity map may be stale; populate_existing reloads them
+
+    async def _events(self, ids: list[int]) -> dict:
+        if not ids:
+            return {"upserted": [], "deleted": []}
+        result = await self.db.execute(select(Events).where(Events.id.in_(ids)).execution_options(populate_existing=True))
+        events = result.scalars().all()
+        found = {event.id for event in events}
+        return {"upserted": events, "deleted": [i for i in ids if i not in found]}
+
+    async def _comments(self, ids: list[int]) -> dict:
+        if not ids:
+            return {"upserted": [], "deleted": []}
+        result = await self.db.execute(
+            select(Comments).options(joinedload(Comments.user)).where(Comments.id.in_(ids))
+            .execution_options(populate_existing=True)
+        )
+        comments = result.scalars().all()
+        found = {comment.id for comment in comments}
+        return {"upserted": comments, "deleted": [i for i in ids if i not in found]}
+
+    async def _pairs(self, model, pairs: list[tuple[int, int]]) -> dict:
+        # likes / attendance, keyed by (event_id, user_id)
+        if not pairs:
+            return {"upserted": [], "deleted": []}
+        result = await self.db.execute(
+            select(model).where(tuple_(model.event_id, model.user_id).in_(pairs))
+            .execution_options(populate_existing=True)
+        )
+        rows: Sequence = result.scalars().all()
+        found = {(row.event_id, row.user_id) for row in rows}
+        deleted = [{"event_id": e, "user_id": u} for e, u in pairs if (e, u) not in found]
+        return {"upserted": rows, "deleted": deleted}
@@ -1,32 +1,45 @@
 from typing import List, Optional, Sequence
-from sqlalchemy import select
+from sqlalchemy import delete, or_, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from api.api_objects import UserCreate, UserUpdate, AdminUserUpdate
-from db.db_models import Users
-from api.user_auth import hash_password, verify_password
+from api.api_objects import UserCreate, UserUpdate, AdminUserUpdate, UserResponsePublic
+from api.ttl_cache import TTLCache
+from db.db_models import Users, Events, Comments, Likes, Attendance
+from db.change_log import log_select
+from db.projection import select_rows
+from api.user_auth import hash_password_async, verify_password_async, principal_cache
+from api.tracing import traced_methods
+import os
 
+# public profiles (id, name, role) change rarely and are looked up in bulk for comment authors
+public_profile_cache = TTLCache(
+    max_size=int(os.getenv("PUBLIC_PROFILE_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("PUBLIC_PROFILE_CACHE_TTL", "30")),
+)
 
+
+@traced_methods
 class UserController:
     def __init__(self, db: AsyncSession):
         self.db = db
 
     async def add_user(self, user: UserCreate) -> Optional[int]:
-        result = await self.db.execute(
-            select(Users).where(Users.email == user.email)
-        )
-        if result.scalars().first():
-            return None
-
-        new_user = Users(
-            name=user.name,
-            email=user.email,
-            password_hash=hash_password(user.password),
-            role=user.role
+        # email is unique: an existing address makes ON CONFLICT return no row
+        stmt = (
+            insert(Users)
+            .values(
+                name=user.name,
+                email=user.email,
+                password_hash=await hash_password_async(user.password),
+                role=user.role
+            )
+            .on_conflict_do_nothing(index_elements=[Users.email])
+            .returning(Users.id)
         )
-        self.db.add(new_user)
+        result = await self.db.execute(stmt)
+        user_id = result.scalar_one_or_none()
         await self.db.commit()
-        await self.db.refresh(new_user)
-        return new_user.id
+        return user_id
         
     async def update_user(self, id: int, user: UserUpdate) -> bool:
         user_to_update = await self.db.get(Users, id)
@@ -38,26 +51,57 @@ class UserController:
         if user.email:
             user_to_update.email = user.email
         if user.password:
-            user_to_update.password_hash = hash_password(user.password)
+            user_to_update.password_hash = await hash_password_async(user.password)
+            # revoke tokens issued with the old password
+            user_to_update.token_version = (user_to_update.token_version or 0) + 1
 
         await self.db.commit()
+        principal_cache.invalidate(id)
+        public_profile_cache.invalidate(id)
         return True
         
 
-    async def get_users(self, name: Optional[str] = None, email: Optional[str] = None, role: Optional[str] = None) -> Sequence[Users]:
-        stmt = select(Users)
+    async def get_users(
+        self, name: Optional[str] = None, email: Optional[str] = None, role: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> Sequence[Users]:
+        # with `fields` (names of columns) Row tuples of just those
+        stmt = select_rows(Users, fields)
 
+        # plain ILIKE so the trigram indexes of migration 0008 can serve it
         if name:
-            stmt = stmt.where(Users.name.ilike(f"%{name}%"))
+            stmt = stmt.where(Users.name.ilike(f"%{_escape_like(name)}%", escape="\\"))
         if email:
-            stmt = stmt.where(Users.email.ilike(f"%{email}%"))
+            stmt = stmt.where(Users.email.ilike(f"%{_escape_like(email)}%", escape="\\"))
         if role:
             stmt = stmt.where(Users.role == role)
 
         result = await self.db.execute(stmt)
-        return result.scalars().all()
+        return result.all() if fields else result.scalars().all()
     
 
+    async def get_public_profiles(self, ids: Sequence[int]) -> List[UserResponsePublic]:
+        # cached profiles first, the rest with a single IN query; keeps the order of ids
+        wanted = list(dict.fromkeys(ids))
+        profiles = {}
+        missing = []
+        for user_id in wanted:
+            cached = public_profile_cache.get(user_id)
+            if cached is None:
+                missing.append(user_id)
+            else:
+                profiles[user_id] = cached
+
+        if missing:
+            result = await self.db.execute(
+                select(Users.id, Users.name, Users.role).where(Users.id.in_(missing))
+            )
+            for row in result:
+                profile = UserResponsePublic.model_validate(row)
+                public_profile_cache.set(profile.id, profile)
+                profiles[profile.id] = profile
+
+        return [profiles[user_id] for user_id in wanted if user_id in profiles]
+
     async def get_user_by_id(self, id: int) -> Optional[Users]:
         result = await self.db.execute(
             select(Users).where(Users.id == id)
@@ -69,8 +113,18 @@ class UserController:
         if not user_to_delete:
             return False
 
-        await self.db.delete(user_to_delete)
+        # the user's events, comments, likes and attendance are removed by FK cascades
+        await self.db.execute(log_select("event", Events.id, Events.id, Events.created_by == id))
+        # together with everything on those events, whoever wrote it
+        owned = select(Events.id).where(Events.created_by == id)
+        await self.db.execute(log_select("comment", Comments.event_id, Comments.id, or_(Comments.user_id == id, Comments.event_id.in_(owned))))
+        await self.db.execute(log_select("like", Likes.event_id, Likes.user_id, or_(Likes.user_id == id, Likes.event_id.in_(owned))))
+        await self.db.execute(log_select("attendance", Attendance.event_id, Attendance.user_id, or_(Attendance.user_id == id, Attendance.event_id.in_(owned))))
+        # Core delete: the ORM would first load and orphan the likes through the liked_events backref
+        await self.db.execute(delete(Users).where(Users.id == id))
         await self.db.commit()
+        principal_cache.invalidate(id)
+        public_profile_cache.invalidate(id)
         return True
         
 
@@ -79,7 +133,11 @@ class UserController:
             select(Users).where(Users.email == email)
         )
         user = result.scalars().first()
-        if user and verify_password(password, user.password_hash):
+        if user and await verify_password_async(password, user.password_hash):
             return user
         return None
-        
\ No newline at end of file
+
+
+def _escape_like(value: str) -> str:
+    # % and _ typed by the user are searched for literally
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
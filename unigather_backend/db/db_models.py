@@ -1,14 +1,23 @@
 from typing import List, Optional
 
-from sqlalchemy import Column, DateTime, ForeignKeyConstraint, Integer, PrimaryKeyConstraint, String, Text, UniqueConstraint, text
+from sqlalchemy import BigInteger, Column, Computed, DateTime, Double, ForeignKeyConstraint, Index, Integer, PrimaryKeyConstraint, String, Text, UniqueConstraint, text
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import Mapped, declarative_base, mapped_column, relationship
 from sqlalchemy.orm.base import Mapped
 
 Base = declarative_base()
 
+# 'simple' keeps words as written (no stemming), events are in Polish and English
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(location, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'C')"
+)
+
 
 class Users(Base):
     __tablename__ = 'users'
+    # name/email substring search uses pg_trgm GIN indexes, created by migration 0008 when the extension exists
     __table_args__ = (
         PrimaryKeyConstraint('id', name='users_pkey'),
         UniqueConstraint('email', name='users_email_key')
@@ -20,6 +29,7 @@ class Users(Base):
     password_hash = mapped_column(String(255), nullable=False)
     role = mapped_column(String(20), server_default=text("'student'::character varying"))
     created_at = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
+    token_version = mapped_column(Integer, nullable=False, server_default=text('0'))
 
     events: Mapped[List['Events']] = relationship('Events', uselist=True, back_populates='users')
     friends: Mapped[List['Friends']] = relationship('Friends', uselist=True, foreign_keys='[Friends.friend_id]', back_populates='friend')
@@ -32,7 +42,13 @@ class Events(Base):
     __tablename__ = 'events'
     __table_args__ = (
         ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='CASCADE', name='events_created_by_fkey'),
-        PrimaryKeyConstraint('id', name='events_pkey')
+        PrimaryKeyConstraint('id', name='events_pkey'),
+        Index('ix_events_datetime_id', 'datetime', 'id'),
+        Index('ix_events_created_by_datetime', 'created_by', 'datetime', 'id'),
+        Index('ix_events_visibility_datetime', 'visibility', 'datetime', 'id'),
+        Index('uq_events_created_by_title', 'created_by', 'title', unique=True),
+        Index('ix_events_geohash', 'geohash'),
+        Index('ix_events_search', 'search_vector', postgresql_using='gin')
     )
 
     id = mapped_column(Integer)
@@ -43,6 +59,19 @@ class Events(Base):
     visibility = mapped_column(String(20), server_default=text("'public'::character varying"))
     created_by = mapped_column(Integer)
     created_at = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
+    # Denormalized counters, kept in step by the like/attendance/comment controllers
+    like_count = mapped_column(Integer, nullable=False, server_default=text('0'))
+    going_count = mapped_column(Integer, nullable=False, server_default=text('0'))
+    interested_count = mapped_column(Integer, nullable=False, server_default=text('0'))
+    comment_count = mapped_column(Integer, nullable=False, server_default=text('0'))
+    updated_at = mapped_column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP'))
+    # Geocoded from location when the event is saved (api/geocoding.py), NULL if it could not be resolved
+    latitude = mapped_column(Double)
+    longitude = mapped_column(Double)
+    # "C" collation keeps prefix (LIKE 'u3h4%') lookups on the btree index usable
+    geohash = mapped_column(String(12, collation='C'))
+    # GET /events/search; title ranks above location above description. Never needed in responses
+    search_vector = mapped_column(TSVECTOR, Computed(SEARCH_VECTOR, persisted=True), deferred=True)
 
     users: Mapped[Optional['Users']] = relationship('Users', back_populates='events')
     attendance: Mapped[List['Attendance']] = relationship('Attendance', uselist=True, back_populates='event', cascade="all, delete-orphan")
@@ -55,7 +84,8 @@ class Friends(Base):
     __table_args__ = (
         ForeignKeyConstraint(['friend_id'], ['users.id'], ondelete='CASCADE', name='friends_friend_id_fkey'),
         ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='friends_user_id_fkey'),
-        PrimaryKeyConstraint('user_id', 'friend_id', name='friends_pkey')
+        PrimaryKeyConstraint('user_id', 'friend_id', name='friends_pkey'),
+        Index('ix_friends_friend_id', 'friend_id')
     )
 
     user_id = mapped_column(Integer, nullable=False)
@@ -72,13 +102,15 @@ class Attendance(Base):
     __table_args__ = (
         ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE', name='attendance_event_id_fkey'),
         ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='attendance_user_id_fkey'),
-        PrimaryKeyConstraint('user_id', 'event_id', name='attendance_pkey')
+        PrimaryKeyConstraint('user_id', 'event_id', name='attendance_pkey'),
+        Index('ix_attendance_event_id', 'event_id')
     )
 
     user_id = mapped_column(Integer, nullable=False)
     event_id = mapped_column(Integer, nullable=False)
     status = mapped_column(String(20), server_default=text("'interested'::character varying"))
     timestamp = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
+    updated_at = mapped_column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP'))
 
     event: Mapped['Events'] = relationship('Events', back_populates='attendance', passive_deletes=True)
     user: Mapped['Users'] = relationship('Users', back_populates='attendance')
@@ -89,7 +121,8 @@ class Comments(Base):
     __table_args__ = (
         ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE', name='comments_event_id_fkey'),
         ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='comments_user_id_fkey'),
-        PrimaryKeyConstraint('id', name='comments_pkey')
+        PrimaryKeyConstraint('id', name='comments_pkey'),
+        Index('ix_comments_event_id', 'event_id')
     )
 
     id = mapped_column(Integer)
@@ -97,6 +130,7 @@ class Comments(Base):
     event_id = mapped_column(Integer)
     user_id = mapped_column(Integer)
     created_at = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
+    updated_at = mapped_column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP'))
 
     event: Mapped[Optional['Events']] = relationship('Events', back_populates='comments', passive_deletes=True)
     user: Mapped[Optional['Users']] = relationship('Users', back_populates='comments', passive_deletes=True)
@@ -108,6 +142,10 @@ class Media(Base):
         ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
         ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
         PrimaryKeyConstraint('id', name='media_pkey'),
+        Index('ix_media_event_id', 'event_id'),
+        Index('ix_media_user_id', 'user_id'),
+        Index('uq_media_event_id_url', 'event_id', 'url', unique=True),
+        Index('ix_media_content_hash', 'content_hash'),
     )
 
     id = mapped_column(Integer)
@@ -116,6 +154,16 @@ class Media(Base):
     url = mapped_column(String(255), nullable=False)
     type = mapped_column(String(20))
     uploaded_at = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
+    updated_at = mapped_column(DateTime, nullable=False, server_default=text('CURRENT_TIMESTAMP'))
+    # uploaded files (POST /media/upload); null for media added by url
+    content_hash = mapped_column(String(64))
+    content_type = mapped_column(String(100))
+    size_bytes = mapped_column(BigInteger)
+    width = mapped_column(Integer)
+    height = mapped_column(Integer)
+    # {"thumb": url, "medium": url} once status is 'ready' ('processing', 'failed')
+    variants = mapped_column(JSONB(none_as_null=True))
+    status = mapped_column(String(20))
 
     event: Mapped[Optional['Events']] = relationship('Events', back_populates='media', passive_deletes=True)
     user: Mapped[Optional['Users']] = relationship('Users', backref='media_files', passive_deletes=True)
@@ -127,7 +175,8 @@ class Likes(Base):
     __table_args__ = (
         ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
         ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
-        PrimaryKeyConstraint('user_id', 'event_id', name='likes_pkey')
+        PrimaryKeyConstraint('user_id', 'event_id', name='likes_pkey'),
+        Index('ix_likes_event_id', 'event_id')
     )
 
     user_id = mapped_column(Integer, nullable=False)
@@ -136,3 +185,45 @@ class Likes(Base):
 
     user: Mapped['Users'] = relationship('Users', backref='liked_events', passive_deletes=True)
     event: Mapped['Events'] = relationship('Events', backref='liked_by', passive_deletes=True)
+
+
+class ChangeLog(Base):
+    # one row per changed event/comment/like/attendance, read by GET /sync
+    __tablename__ = 'change_log'
+    __table_args__ = (
+        PrimaryKeyConstraint('id', name='change_log_pkey'),
+        Index('ix_change_log_txid_id', 'txid', 'id'),
+        Index('ix_change_log_changed_at', 'changed_at')
+    )
+
+    id = mapped_column(BigInteger)
+    entity = mapped_column(String(20), nullable=False)
+    event_id = mapped_column(Integer)
+    row_id = mapped_column(Integer, nullable=False)
+    # id of the writing transaction, orders changes by commit visibility
+    txid = mapped_column(BigInteger, nullable=False, server_default=text('(pg_current_xact_id()::text)::bigint'))
+    changed_at = mapped_column(DateTime, server_default=text('CURRENT_TIMESTAMP'))
+
+
+class FeedItems(Base):
+    # precomputed GET /feed, maintained by db/feed.py
+    __tablename__ = 'feed_items'
+    __table_args__ = (
+        ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE', name='feed_items_user_id_fkey'),
+        ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE', name='feed_items_event_id_fkey'),
+        PrimaryKeyConstraint('user_id', 'event_id', name='feed_items_pkey'),
+        Index('ix_feed_items_user_score', 'user_id', text('score DESC'), 'event_id'),
+        Index('ix_feed_items_event_id', 'event_id')
+    )
+
+    user_id = mapped_column(Integer, nullable=False)
+    event_id = mapped_column(Integer, nullable=False)
+    # how many of the user's friends are going / interested / liked / created the event
+    friends_going = mapped_column(Integer, nullable=False, server_default=text('0'))
+    friends_interested = mapped_column(Integer, nullable=False, server_default=text('0'))
+    friends_liked = mapped_column(Integer, nullable=False, server_default=text('0'))
+    friends_created = mapped_column(Integer, nullable=False, server_default=text('0'))
+    popularity = mapped_column(Integer, nullable=False, server_default=text('0'))
+    recency = mapped_column(Double, nullable=False, server_default=text('0'))
+    score = mapped_column(Double, nullable=False, server_default=text('0'))
+    event_datetime = mapped_column(DateTime, nullable=False)
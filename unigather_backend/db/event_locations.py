@@ -0,0 +1,70 @@
+"""
+Coordinates of events, geocoded from their free text location.
+
+EventController stores latitude, longitude and geohash whenever an event is
+created or its location changes. Events saved before that (or while the
+geocoder was unreachable or slower than GEOCODER_TIMEOUT) are filled in by
+this job.
+
+Usage (from unigather_backend/):
+    python -m db.event_locations            geocode events without coordinates
+    python -m db.event_locations --all      geocode every event again
+"""
+import argparse
+import asyncio
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import geohash
+from api.geocoding import geocoder
+from db.change_log import log_row
+from db.db_models import Events
+
+
+async def location_columns(location: Optional[str]) -> dict:
+    coordinates = await geocoder.geocode(location)
+    if coordinates is None:
+        return {"latitude": None, "longitude": None, "geohash": None}
+    latitude, longitude = coordinates
+    return {"latitude": latitude, "longitude": longitude, "geohash": geohash.encode(latitude, longitude)}
+
+
+async def geocode_events(db: AsyncSession, everything: bool = False, batch_size: int = 100) -> list[int]:
+    """Geocodes events (by default only those without coordinates) and returns the ids that got new ones."""
+    stmt = select(Events.id, Events.location, Events.geohash).where(Events.location.is_not(None)).order_by(Events.id)
+    if not everything:
+        stmt = stmt.where(Events.geohash.is_(None))
+    rows = (await db.execute(stmt)).all()
+
+    changed = []
+    for row in rows:
+        columns = await location_columns(row.location)
+        if columns["geohash"] == row.geohash:
+            continue
+        await db.execute(update(Events).where(Events.id == row.id).values({**columns, "updated_at": func.now()}))
+        await db.execute(log_row("event", row.id, row.id))
+        changed.append(row.id)
+        if len(changed) % batch_size == 0:
+            await db.commit()
+    await db.commit()
+    return changed
+
+
+async def _main(everything: bool) -> None:
+    from db.database import engine, AsyncSessionLocal
+
+    try:
+        async with AsyncSessionLocal() as session:
+            changed = await geocode_events(session, everything)
+        print(f"Updated coordinates of {len(changed)} event(s)")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocode event locations")
+    parser.add_argument("--all", action="store_true", help="geocode every event, not only those without coordinates")
+    args = parser.parse_args()
+    asyncio.run(_main(args.all))
@@ -0,0 +1,258 @@
+"""
+Precomputed home feed (GET /feed).
+
+feed_items holds, per user, the upcoming public events their friends are
+going to, interested in, liked or created, with those friend counts and
+
+    score = 3 * going + 2 * interested + 1 * liked + 2 * created   (friends)
+          + popularity    floor(log2(1 + likes + going + interested))
+          + recency       event created_at / RECENCY_SECONDS
+
+Writes that change the inputs update the affected rows in the same statement,
+like the counters on events: a like or attendance fans out to the friends of
+the user who made it, a new event to its creator's friends, and a new
+friendship fans each friend's activity in to the other. Popularity only
+moves when an event crosses a power of two, so likes rewrite the rows of
+everyone else only log2(n) times over the life of an event.
+
+Concurrent writes to the same rows, deleted users and past events leave
+the table slightly off; rebuild() recomputes it from the source tables,
+e.g. nightly:
+    python -m db.feed
+"""
+import argparse
+import asyncio
+from typing import Iterable, Optional
+
+from sqlalchemy import Double, Integer, Numeric, case, cast, delete, exists, extract, func, literal, or_, select, union, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.db_models import Attendance, Events, FeedItems, Friends, Likes
+
+WEIGHTS = {"friends_going": 3, "friends_interested": 2, "friends_liked": 1, "friends_created": 2}
+COUNTS = tuple(WEIGHTS)
+RECENCY_SECONDS = 3 * 24 * 3600
+
+# what the feed needs to know about an event; counter CTEs return these
+EVENT_COLUMNS = (
+    Events.id, Events.like_count, Events.going_count, Events.interested_count,
+    Events.created_at, Events.datetime, Events.visibility, Events.created_by,
+)
+
+
+def _popularity(event):
+    engagement = 1 + event.c.like_count + event.c.going_count + event.c.interested_count
+    return cast(func.floor(func.log(2, cast(engagement, Numeric))), Integer)
+
+
+def _recency(event):
+    created = func.coalesce(event.c.created_at, func.timezone("UTC", func.now()))
+    return cast(extract("epoch", created), Double) / RECENCY_SECONDS
+
+
+def _score(counts: dict, popularity, recency):
+    return sum(WEIGHTS[name] * value for name, value in counts.items()) + popularity + recency
+
+
+def _columns(user_id, event, **counts) -> tuple:
+    # one feed row: user_id, event_id, the four counts, popularity, recency, score, event_datetime
+    as_sql = lambda v: literal(v, Integer) if isinstance(v, int) else v
+    counts = {name: as_sql(counts.get(name, 0)) for name in COUNTS}
+    popularity, recency = _popularity(event), _recency(event)
+    return (
+        as_sql(user_id).label("user_id"),
+        event.c.id.label("event_id"),
+        *(value.label(name) for name, value in counts.items()),
+        popularity.label("popularity"),
+        recency.label("recency"),
+        _score(counts, popularity, recency).label("score"),
+        event.c.datetime.label("event_datetime"),
+    )
+
+
+def _listed(event, user_id) -> tuple:
+    # events that belong in user_id's feed at all; events.datetime is UTC, like _page_query's upcoming filter
+    return (
+        event.c.visibility == "public",
+        event.c.datetime >= func.timezone("UTC", func.now()),
+        event.c.created_by.is_distinct_from(user_id),
+    )
+
+
+def _friend_edges():
+    # accepted friendships in both directions; UNION also drops pairs stored both ways
+    accepted = Friends.status == "accepted"
+    return union(
+        select(Friends.user_id, Friends.friend_id).where(accepted),
+        select(Friends.friend_id.label("user_id"), Friends.user_id.label("friend_id")).where(accepted),
+    ).subquery("friend_edges")
+
+
+def friends_of(user_id):
+    edges = _friend_edges()
+    return select(edges.c.user_id).where(edges.c.friend_id == user_id)
+
+
+def _activity(user_id=None):
+    # (user_id, event_id, friends_*) per attendance, like and created event
+    going = case((Attendance.status == "going", 1), else_=0)
+    interested = case((Attendance.status == "interested", 1), else_=0)
+    zero, one = literal(0, Integer), literal(1, Integer)
+    parts = [
+        select(Attendance.user_id, Attendance.event_id, going.label("friends_going"), interested.label("friends_interested"),
+               zero.label("friends_liked"), zero.label("friends_created"))
+        .where(Attendance.status.in_(("going", "interested"))),
+        select(Likes.user_id, Likes.event_id, zero, zero, one, zero),
+        select(Events.created_by, Events.id, zero, zero, zero, one),
+    ]
+    if user_id is not None:
+        parts = [
+            parts[0].where(Attendance.user_id == user_id),
+            parts[1].where(Likes.user_id == user_id),
+            parts[2].where(Events.created_by == user_id),
+        ]
+    return union_all(*parts).subquery("activity")
+
+
+def fan_out(event, actor, *where, **counts):
+    """
+    Feed rows of every friend of `actor` for `event` (a CTE with EVENT_COLUMNS),
+    e.g. fan_out(bump, user_id, bump.c.id == inserted.c.event_id, friends_liked=1).
+    `actor` is a user id: compared with a column of another CTE instead, the
+    friendships are read in full, as the lookup cannot reach into the UNION.
+    """
+    edges = _friend_edges()
+    return select(*_columns(edges.c.user_id, event, **counts)).where(
+        edges.c.friend_id == actor, *_listed(event, edges.c.user_id), *where
+    )
+
+
+def fan_in(recipient: int, friend: int, *where):
+    # feed rows the activity of `friend` adds to the feed of `recipient`
+    activity = _activity(friend)
+    events = Events.__table__
+    sums = {name: func.sum(activity.c[name]) for name in COUNTS}
+    return (
+        select(*_columns(recipient, events, **sums))
+        .join_from(activity, events, events.c.id == activity.c.event_id)
+        .where(*_listed(events, recipient), *where)
+        .group_by(events.c.id)
+    )
+
+
+def add(rows, name: str):
+    """CTE adding `rows` (from fan_out / fan_in) to the feed."""
+    stmt = insert(FeedItems).from_select([c.name for c in rows.selected_columns], rows)
+    new = stmt.excluded
+    counts = {c: getattr(FeedItems, c) + new[c] for c in COUNTS}
+    return stmt.on_conflict_do_update(
+        index_elements=[FeedItems.user_id, FeedItems.event_id],
+        set_={
+            **counts,
+            "popularity": new.popularity,
+            "recency": new.recency,
+            "score": _score(counts, new.popularity, new.recency),
+            "event_datetime": new.event_datetime,
+        },
+    ).cte(name)
+
+
+def subtract(rows, name: str) -> tuple:
+    """CTEs taking `rows` back out; rows left without any friend activity are deleted."""
+    delta = rows.cte(f"{name}_rows")
+    same_row = (FeedItems.user_id == delta.c.user_id, FeedItems.event_id == delta.c.event_id)
+    # the two conditions are exclusive, so no row is touched twice in one statement
+    emptied = delete(FeedItems).where(*same_row, *(getattr(FeedItems, c) <= delta.c[c] for c in COUNTS)).cte(f"{name}_delete")
+    counts = {c: getattr(FeedItems, c) - delta.c[c] for c in COUNTS}
+    kept = (
+        update(FeedItems)
+        .where(*same_row, or_(*(getattr(FeedItems, c) > delta.c[c] for c in COUNTS)))
+        .values(
+            **counts,
+            popularity=delta.c.popularity,
+            score=_score(counts, delta.c.popularity, FeedItems.recency),
+        )
+        .cte(f"{name}_update")
+    )
+    return emptied, kept
+
+
+def rerank(event, actor, name: str):
+    """
+    CTE moving the other rows of `event` when its popularity bucket changed;
+    the rows of actor's friends are rewritten by fan_out already.
+    """
+    popularity = _popularity(event)
+    return (
+        update(FeedItems)
+        .where(
+            FeedItems.event_id == event.c.id,
+            FeedItems.popularity != popularity,
+            FeedItems.user_id.not_in(friends_of(actor)),
+        )
+        .values(popularity=popularity, score=FeedItems.score - FeedItems.popularity + popularity)
+        .cte(name)
+    )
+
+
+def befriend(user_id: int, friend_id: int, *where) -> tuple:
+    """CTEs for a friendship that became accepted, e.g. only `where` the request was inserted."""
+    if user_id == friend_id:
+        return ()
+    return add(fan_in(user_id, friend_id, *where), "feed_befriend"), add(fan_in(friend_id, user_id, *where), "feed_befriended")
+
+
+def unfriend(user_id: int, friend_id: int) -> tuple:
+    if user_id == friend_id:
+        return ()
+    return (*subtract(fan_in(user_id, friend_id), "feed_unfriend"), *subtract(fan_in(friend_id, user_id), "feed_unfriended"))
+
+
+def only_if(cte, *where):
+    # condition for fan_in: the CTE returned a row (e.g. the insert happened)
+    return exists(select(cte).where(*where))
+
+
+async def rebuild(db: AsyncSession, event_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recomputes feed rows from the source tables (all of them, or those of
+    `event_ids`) and returns how many exist afterwards. Does not commit.
+    """
+    edges = _friend_edges()
+    activity = _activity()
+    events = Events.__table__
+    sums = {name: func.sum(activity.c[name]) for name in COUNTS}
+    fresh = (
+        select(*_columns(edges.c.user_id, events, **sums))
+        .join_from(activity, events, events.c.id == activity.c.event_id)
+        .join(edges, edges.c.friend_id == activity.c.user_id)
+        .where(*_listed(events, edges.c.user_id))
+        .group_by(edges.c.user_id, events.c.id)
+    )
+    stale = delete(FeedItems)
+    if event_ids is not None:
+        event_ids = list(event_ids)
+        fresh = fresh.where(events.c.id.in_(event_ids))
+        stale = stale.where(FeedItems.event_id.in_(event_ids))
+
+    await db.execute(stale)
+    result = await db.execute(insert(FeedItems).from_select([c.name for c in fresh.selected_columns], fresh))
+    return result.rowcount
+
+
+async def _main() -> None:
+    from db.database import engine, AsyncSessionLocal
+
+    try:
+        async with AsyncSessionLocal() as session:
+            rows = await rebuild(session)
+            await session.commit()
+        print(f"Rebuilt the feed: {rows} row(s)")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Rebuild the precomputed GET /feed table").parse_args()
+    asyncio.run(_main())
@@ -0,0 +1,86 @@
+"""
+Minimal versioned schema migrations.
+
+Each file in db/migrations is named <version>_<description>.sql and is applied
+once, in version order, inside a transaction. Applied versions are recorded in
+the schema_migrations table. Migrations must stay idempotent (IF NOT EXISTS)
+so they can run against databases created from uniGather.sql as well.
+
+Usage (from unigather_backend/):
+    python -m db.migrate            apply pending migrations
+    python -m db.migrate --status   list applied / pending versions
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+
+def discover_migrations(directory: Path = MIGRATIONS_DIR) -> list[tuple[str, Path]]:
+    migrations = []
+    for path in sorted(directory.glob("*.sql")):
+        version = path.stem.split("_", 1)[0]
+        migrations.append((version, path))
+    versions = [v for v, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Duplicate migration version in " + str(directory))
+    return migrations
+
+
+async def _ensure_version_table(conn: AsyncConnection) -> None:
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " version varchar(32) PRIMARY KEY,"
+        " applied_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP)"
+    ))
+
+
+async def applied_versions(conn: AsyncConnection) -> set[str]:
+    await _ensure_version_table(conn)
+    result = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return {row[0] for row in result}
+
+
+async def apply_migrations(engine: AsyncEngine, directory: Path = MIGRATIONS_DIR) -> list[str]:
+    applied = []
+    for version, path in discover_migrations(directory):
+        async with engine.begin() as conn:
+            if version in await applied_versions(conn):
+                continue
+            # scripts may hold several statements, run them through the driver directly
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.execute(path.read_text())
+            await conn.execute(
+                text("INSERT INTO schema_migrations (version) VALUES (:version)"),
+                {"version": version},
+            )
+        applied.append(version)
+    return applied
+
+
+async def _main(status_only: bool) -> None:
+    from db.database import engine
+
+    try:
+        if status_only:
+            async with engine.begin() as conn:
+                done = await applied_versions(conn)
+            for version, path in discover_migrations():
+                print(f"{'applied' if version in done else 'pending':<8} {path.name}")
+            return
+
+        applied = await apply_migrations(engine)
+        print("Applied: " + ", ".join(applied) if applied else "Database is up to date")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply UniGather schema migrations")
+    parser.add_argument("--status", action="store_true", help="only list migration status")
+    args = parser.parse_args()
+    asyncio.run(_main(args.status))
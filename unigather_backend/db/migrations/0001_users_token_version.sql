@@ -0,0 +1,2 @@
+-- Token version used to revoke JWTs after a password change (principal cache).
+ALTER TABLE users ADD COLUMN IF NOT EXISTS token_version integer DEFAULT 0 NOT NULL;
@@ -0,0 +1,12 @@
+-- Secondary indexes for every foreign-key lookup done by db/db_controller_*.py.
+-- Primary keys already cover attendance/likes by user_id and friends by user_id.
+CREATE INDEX IF NOT EXISTS ix_attendance_event_id ON attendance (event_id);
+CREATE INDEX IF NOT EXISTS ix_comments_event_id ON comments (event_id);
+CREATE INDEX IF NOT EXISTS ix_media_event_id ON media (event_id);
+CREATE INDEX IF NOT EXISTS ix_media_user_id ON media (user_id);
+CREATE INDEX IF NOT EXISTS ix_likes_event_id ON likes (event_id);
+CREATE INDEX IF NOT EXISTS ix_friends_friend_id ON friends (friend_id);
+-- events: keyset pagination order (datetime, id), optionally narrowed by creator or visibility
+CREATE INDEX IF NOT EXISTS ix_events_datetime_id ON events (datetime, id);
+CREATE INDEX IF NOT EXISTS ix_events_created_by_datetime ON events (created_by, datetime, id);
+CREATE INDEX IF NOT EXISTS ix_events_visibility_datetime ON events (visibility, datetime, id);
@@ -0,0 +1,5 @@
+-- Natural keys used by the INSERT ... ON CONFLICT paths in the controllers.
+-- Existing duplicate rows (same creator + title, same event + url) must be
+-- cleaned up before this migration can be applied.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_events_created_by_title ON events (created_by, title);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_media_event_id_url ON media (event_id, url);
@@ -0,0 +1,14 @@
+-- Denormalized like/attendance/comment counters on events, maintained by the
+-- controllers in the same statement as the write they count. The backfill
+-- below also repairs databases loaded from uniGather.sql, whose COPY data
+-- leaves the counters at 0.
+ALTER TABLE events ADD COLUMN IF NOT EXISTS like_count integer DEFAULT 0 NOT NULL;
+ALTER TABLE events ADD COLUMN IF NOT EXISTS going_count integer DEFAULT 0 NOT NULL;
+ALTER TABLE events ADD COLUMN IF NOT EXISTS interested_count integer DEFAULT 0 NOT NULL;
+ALTER TABLE events ADD COLUMN IF NOT EXISTS comment_count integer DEFAULT 0 NOT NULL;
+
+UPDATE events e SET
+    like_count = (SELECT count(*) FROM likes l WHERE l.event_id = e.id),
+    going_count = (SELECT count(*) FROM attendance a WHERE a.event_id = e.id AND a.status = 'going'),
+    interested_count = (SELECT count(*) FROM attendance a WHERE a.event_id = e.id AND a.status = 'interested'),
+    comment_count = (SELECT count(*) FROM comments c WHERE c.event_id = e.id);
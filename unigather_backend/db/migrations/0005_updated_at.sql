@@ -0,0 +1,6 @@
+-- Row versions for conditional GETs (ETag / If-None-Match). The controllers
+-- bump updated_at on every change of a row, including the event counters.
+ALTER TABLE events ADD COLUMN IF NOT EXISTS updated_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL;
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS updated_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL;
+ALTER TABLE media ADD COLUMN IF NOT EXISTS updated_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL;
+ALTER TABLE attendance ADD COLUMN IF NOT EXISTS updated_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP NOT NULL;
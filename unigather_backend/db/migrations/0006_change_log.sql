@@ -0,0 +1,14 @@
+-- Change log behind GET /sync. Controllers insert one row per changed
+-- event/comment/like/attendance in the same transaction as the change.
+-- txid is the writing transaction; readers only serve rows of transactions
+-- older than their snapshot's xmin, so (txid, id) is a gap-free sync token.
+CREATE TABLE IF NOT EXISTS change_log (
+    id bigserial CONSTRAINT change_log_pkey PRIMARY KEY,
+    entity character varying(20) NOT NULL,
+    event_id integer,
+    row_id integer NOT NULL,
+    txid bigint DEFAULT (pg_current_xact_id()::text)::bigint NOT NULL,
+    changed_at timestamp without time zone DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS ix_change_log_txid_id ON change_log (txid, id);
+CREATE INDEX IF NOT EXISTS ix_change_log_changed_at ON change_log (changed_at);
@@ -0,0 +1,6 @@
+-- Coordinates geocoded from events.location, and their geohash for
+-- GET /events/nearby. Existing rows are filled by python -m db.event_locations.
+ALTER TABLE events ADD COLUMN IF NOT EXISTS latitude double precision;
+ALTER TABLE events ADD COLUMN IF NOT EXISTS longitude double precision;
+ALTER TABLE events ADD COLUMN IF NOT EXISTS geohash varchar(12) COLLATE "C";
+CREATE INDEX IF NOT EXISTS ix_events_geohash ON events (geohash);
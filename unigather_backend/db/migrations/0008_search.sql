@@ -0,0 +1,21 @@
+-- Full text search over events (GET /events/search). The expression must stay
+-- in sync with SEARCH_VECTOR in db/db_models.py.
+ALTER TABLE events ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('simple'::regconfig, coalesce(location, '')), 'B') ||
+    setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'C')
+) STORED;
+CREATE INDEX IF NOT EXISTS ix_events_search ON events USING gin (search_vector);
+
+-- users: trigram indexes serve the ILIKE '%x%' filters of GET /users as they are.
+-- pg_trgm ships with contrib; without it the filters keep working unindexed.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        CREATE INDEX IF NOT EXISTS ix_users_name_trgm ON users USING gin (name gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS ix_users_email_trgm ON users USING gin (email gin_trgm_ops);
+    ELSE
+        RAISE NOTICE 'pg_trgm is not available, GET /users name/email search stays unindexed';
+    END IF;
+END $$;
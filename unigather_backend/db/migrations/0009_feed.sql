@@ -0,0 +1,20 @@
+-- Precomputed home feed (GET /feed), see db/feed.py. Fill it once after
+-- migrating with: python -m db.feed
+CREATE TABLE IF NOT EXISTS feed_items (
+    user_id integer NOT NULL,
+    event_id integer NOT NULL,
+    friends_going integer DEFAULT 0 NOT NULL,
+    friends_interested integer DEFAULT 0 NOT NULL,
+    friends_liked integer DEFAULT 0 NOT NULL,
+    friends_created integer DEFAULT 0 NOT NULL,
+    popularity integer DEFAULT 0 NOT NULL,
+    recency double precision DEFAULT 0 NOT NULL,
+    score double precision DEFAULT 0 NOT NULL,
+    event_datetime timestamp without time zone NOT NULL,
+    CONSTRAINT feed_items_pkey PRIMARY KEY (user_id, event_id),
+    CONSTRAINT feed_items_user_id_fkey FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    CONSTRAINT feed_items_event_id_fkey FOREIGN KEY (event_id) REFERENCES events(id) ON DELETE CASCADE
+);
+-- one page of a user's feed is a single range scan of this index
+CREATE INDEX IF NOT EXISTS ix_feed_items_user_score ON feed_items (user_id, score DESC, event_id);
+CREATE INDEX IF NOT EXISTS ix_feed_items_event_id ON feed_items (event_id);
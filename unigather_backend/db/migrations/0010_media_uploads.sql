@@ -0,0 +1,11 @@
+-- Uploaded media files (POST /media/upload, api/media_storage.py). Files are
+-- stored once per content hash; variants (thumbnails) are generated in the
+-- background and recorded on every row with the same hash.
+ALTER TABLE media ADD COLUMN IF NOT EXISTS content_hash varchar(64);
+ALTER TABLE media ADD COLUMN IF NOT EXISTS content_type varchar(100);
+ALTER TABLE media ADD COLUMN IF NOT EXISTS size_bytes bigint;
+ALTER TABLE media ADD COLUMN IF NOT EXISTS width integer;
+ALTER TABLE media ADD COLUMN IF NOT EXISTS height integer;
+ALTER TABLE media ADD COLUMN IF NOT EXISTS variants jsonb;
+ALTER TABLE media ADD COLUMN IF NOT EXISTS status varchar(20);
+CREATE INDEX IF NOT EXISTS ix_media_content_hash ON media (content_hash);
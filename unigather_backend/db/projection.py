@@ -0,0 +1,21 @@
+from typing import Iterable, Optional
+
+from sqlalchemy import inspect, select
+
+
+def columns_for(entity, names: Iterable[str]) -> list:
+    """
+    The mapped columns of `entity` called `names` (the fields of a response
+    model); names without a column, like relationships, are left out.
+    """
+    mapped = inspect(entity).column_attrs
+    return [getattr(entity, name) for name in names if name in mapped]
+
+
+def select_rows(entity, fields: Optional[Iterable[str]] = None):
+    """
+    select(entity), or only the columns called `fields`: Row tuples instead of
+    ORM instances, with the same attribute names (row.title) but neither the
+    unread columns nor an identity map entry per row.
+    """
+    return select(*columns_for(entity, fields)) if fields else select(entity)
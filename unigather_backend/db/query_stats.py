@@ -0,0 +1,116 @@
+"""
+SQL statements per request.
+
+install() hooks an engine so every statement it runs is timed. While a
+request is served, api.metrics.QueryMetricsMiddleware puts a RequestQueries
+in `current_request`, and the hooks add each statement to it: how many ran,
+how long the database took and how often each statement ran, which exposes
+N+1 patterns (one query per row of an earlier result) as the same statement
+repeated. Statements slower than SLOW_QUERY_MS are logged with their SQL
+(never their parameters), in requests or not.
+"""
+import hashlib
+import logging
+import os
+import re
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# a request running one statement this often is reported as a likely N+1
+REPEATED_STATEMENT_THRESHOLD = int(os.getenv("REPEATED_STATEMENT_THRESHOLD", "5"))
+
+# asyncpg placeholders come with a cast: $3::INTEGER
+_PLACEHOLDER = re.compile(r"\$\d+(?:::[A-Z ]+(?:\[\])?)?|%\(\w+\)s")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def normalize(statement: str) -> str:
+    """The statement with placeholders as `?`, so IN lists of any length read the same."""
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _PLACEHOLDER_LIST.sub("?, ...", statement)
+    return _SPACE.sub(" ", statement).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+class RequestQueries:
+    """The statements of one request."""
+
+    __slots__ = ("label", "statements", "seconds", "slow", "by_statement")
+
+    def __init__(self, label: str = ""):
+        # e.g. "GET /events/5", for log lines
+        self.label = label
+        self.statements = 0
+        self.seconds = 0.0
+        self.slow = 0
+        # statement text -> [times run, seconds]
+        self.by_statement: dict[str, list] = {}
+
+    def add(self, statement: str, seconds: float) -> None:
+        self.statements += 1
+        self.seconds += seconds
+        entry = self.by_statement.get(statement)
+        if entry is None:
+            self.by_statement[statement] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+    def normalized(self) -> dict[str, list]:
+        """by_statement with the texts normalized, so IN lists of different lengths count as one statement."""
+        merged: dict[str, list] = {}
+        for statement, (count, seconds) in self.by_statement.items():
+            entry = merged.setdefault(normalize(statement), [0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+        return merged
+
+
+current_request: ContextVar[Optional[RequestQueries]] = ContextVar("current_request", default=None)
+
+
+def _started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _finished(conn, cursor, statement, parameters, context, executemany):
+    _record(conn, statement)
+
+
+def _failed(exception_context):
+    if exception_context.connection is not None and exception_context.connection.info.get("query_started"):
+        _record(exception_context.connection, exception_context.statement or "")
+
+
+def _record(conn, statement: str) -> None:
+    seconds = time.perf_counter() - conn.info["query_started"].pop()
+    queries = current_request.get()
+    if queries is not None:
+        queries.add(statement, seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        if queries is not None:
+            queries.slow += 1
+        logger.warning(
+            "Slow statement (%.0f ms) in %s: %s",
+            seconds * 1000, queries.label if queries is not None else "background work", normalize(statement)[:1000],
+        )
+
+
+def install(engine) -> None:
+    """Times the statements of `engine` (async or sync); installing twice is harmless."""
+    target = getattr(engine, "sync_engine", engine)
+    for name, listener in (("before_cursor_execute", _started), ("after_cursor_execute", _finished), ("handle_error", _failed)):
+        if not event.contains(target, name, listener):
+            event.listen(target, name, listener)
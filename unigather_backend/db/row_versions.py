@@ -0,0 +1,15 @@
+from sqlalchemy import func, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+
+def versions_digest(key, updated_at):
+    """
+    Aggregate over the selected rows: md5 of their (key, updated_at) pairs in key
+    order. It changes whenever a row is inserted, updated or deleted, even if
+    transactions commit out of timestamp order (unlike max(updated_at)).
+    """
+    pairs = func.string_agg(
+        func.concat(key, ":", updated_at),
+        aggregate_order_by(literal_column("','"), key),
+    )
+    return func.md5(func.coalesce(pairs, ""))
@@ -1,10 +1,13 @@
-from fastapi import FastAPI, Depends, Form, HTTPException
+from fastapi import FastAPI, Depends, Form, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from typing import Optional, Annotated
+from datetime import datetime
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 
-from db.database import get_db
+from db.database import get_db, get_pool_status
 from db.db_controller_user import UserController
 from db.db_controller_events import EventController
 from db.db_controller_attendance import AttendanceController
@@ -12,19 +15,45 @@ from db.db_controller_comments import CommentController
 from db.db_controller_friends import FriendshipController
 from db.db_controller_media import MediaController
 from db.db_controller_likes import LikeController
+from db.db_controller_sync import SyncController
+from db.db_controller_feed import FeedController
 
 from api.api_objects import UserLogin, UserResponse, UserResponsePublic, UserUpdate, PublicUserCreate, UserCreate
-from api.api_objects import EventBase, EventUpdate
-from api.api_objects import AttendanceBase
-from api.api_objects import CommentBase
+from api.api_objects import EventBase, EventUpdate, EventDetailResponse, EventResponse, NearbyEventResponse, FeedEventResponse
+from api.api_objects import AttendanceBase, AttendanceResponse
+from api.api_objects import CommentBase, PlainCommentResponse
 from api.api_objects import Friendship, FriendshipUpdate
-from api.api_objects import MediaBase
+from api.api_objects import MediaBase, MediaResponse
 from api.api_objects import LikeBase
-
-from api.user_auth import oauth2_scheme, get_current_user, create_access_token
+from api.api_objects import SyncResponse
+from api.api_objects import AttendanceBatch, CommentBatch, LikeBatch, BatchItemResult, BatchResponse
+
+from api.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, encode_cursor, decode_cursor
+from api.pagination import encode_score_cursor, decode_score_cursor
+from api.pagination import DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT, encode_sync_token, decode_sync_token
+from api.response_cache import response_cache
+from api.serialization import json_response, serializer, sparse_fields
+from api.realtime import realtime, BrokerUnavailable, RealtimeFull, TooManySubscriptions
+from api.media_storage import media_uploads, LocalMediaStore, MediaFiles, InvalidUpload, UnsupportedMediaType, UploadTooLarge
+from api.thumbnails import thumbnail_pool
+from api.metrics import metrics, QueryMetricsMiddleware
+from api.tracing import tracing, TracingMiddleware
+from api.etags import make_etag
+from api.user_auth import oauth2_scheme, get_current_user, authenticate, create_access_token, token_claims, password_pool
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import time
+
+# ids per GET /users?ids= lookup
+MAX_BATCH_USER_IDS = 100
+
 
+def requested_fields(model, fields: Optional[str]) -> tuple[str, ...]:
+    """The fields of `model` a `fields=a,b` parameter asks for (all without one), 400 for unknown names."""
+    try:
+        return sparse_fields(model, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 tags_metadata = [
@@ -61,6 +90,18 @@ tags_metadata = [
         "name": "likes",
         "description": "Operations for liking/unliking events and fetching a user’s likes.",
     },
+    {
+        "name": "feed",
+        "description": "Upcoming public events ranked by what the user's friends do.",
+    },
+    {
+        "name": "sync",
+        "description": "Changes to events, comments, likes and attendance since a sync token.",
+    },
+    {
+        "name": "realtime",
+        "description": "Updates of subscribed events pushed over WebSocket (/ws) or server-sent events.",
+    },
     {
         "name": "health",
         "description": "Health check endpoint.",
@@ -80,6 +121,15 @@ description = """
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await realtime.close()
+    await thumbnail_pool.close()
+    tracing.shutdown()
+
+
 app = FastAPI(
     title="UniGather API",
     description=description,
@@ -90,7 +140,8 @@ app = FastAPI(
         "email": "contact@unigather.com",
     },
     
-    openapi_tags=tags_metadata
+    openapi_tags=tags_metadata,
+    lifespan=lifespan
 )
 
 
@@ -99,6 +150,40 @@ app = FastAPI(
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/pool", tags=["health"])
+async def pool_status():
+    return get_pool_status()
+
+@app.get("/health/realtime", tags=["health"])
+async def realtime_status():
+    return realtime.stats()
+
+@app.get("/health/thumbnails", tags=["health"])
+async def thumbnail_pool_status():
+    return thumbnail_pool.stats()
+
+@app.get("/health/cache", tags=["health"])
+async def response_cache_status():
+    return response_cache.stats()
+
+@app.get("/health/passwords", tags=["health"])
+async def password_pool_status():
+    return password_pool.stats()
+
+@app.get("/health/queries", tags=["health"])
+async def query_status(limit: int = Query(50, ge=1, le=500), current_user = Depends(get_current_user)):
+    """
+    The statements that took the most database time in this worker, with the
+    fingerprints /metrics labels them by. Admins only: the SQL shows the schema.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Only admins can view query statistics")
+    return metrics.top_statements(limit)
+
+@app.get("/metrics", tags=["health"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 #CORS (Cross-Origin Requests, for linking the frontend)
 app.add_middleware(
     CORSMiddleware,
@@ -106,17 +191,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
+# added last, so they wrap the whole app; the request span covers the metrics bookkeeping too
+app.add_middleware(QueryMetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
+# uploaded media in the local store (MEDIA_STORE=local); other stores serve their own urls
+if isinstance(media_uploads.store, LocalMediaStore) and media_uploads.store.base_url.startswith("/"):
+    app.mount(media_uploads.store.base_url, MediaFiles(directory=media_uploads.store.root, check_dir=False), name="media_files")
 
 #done
 @app.get("/users", tags=["users"])
-async def get_users(current_user = Depends(get_current_user), name: Optional[str] = None, email: Optional[str] = None, role: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+async def get_users(current_user = Depends(get_current_user), name: Optional[str] = None, email: Optional[str] = None, role: Optional[str] = None, ids: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Search users by name/email/role, or fetch public profiles in bulk with `ids=1,2,3`.
+    `fields=id,name` returns only some fields of each profile.
+    """
     service = UserController(db)
-    result = await service.get_users(name, email, role)
+    selected = requested_fields(UserResponsePublic, fields)
+    write = serializer(UserResponsePublic, selected).to_python
+    if ids is not None:
+        try:
+            user_ids = [int(part) for part in ids.split(",") if part.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be a comma separated list of integers")
+        if len(user_ids) > MAX_BATCH_USER_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_USER_IDS} ids per request")
+        users = await service.get_public_profiles(user_ids)
+        if not users:
+            return {"message": "No users found", "users": []}
+        return {"message": "Users found", "users": write(users)}
+
+    result = await service.get_users(name, email, role, fields=selected)
     if not result:
         return {"message": "No users found", "users": []}
-    users = [UserResponsePublic.model_validate(user) for user in result]
-    return {"message": "Users found", "users": users} 
+    return {"message": "Users found", "users": write(result)} 
     
 #done
 @app.get("/users/{user_id}", tags=["users"])
@@ -182,7 +292,7 @@ async def login(request: UserLogin, db: AsyncSession = Depends(get_db)):
     if not result:
         return {"message": "Invalid credentials", "user": None}
     
-    access_token = create_access_token(data={"sub": result.id})
+    access_token = create_access_token(data=token_claims(result))
     
     return {"message": "Login successful", "access_token": access_token, "token_type": "bearer", "user": result}
 
@@ -203,7 +313,7 @@ async def swagger_login(
             status_code=401,
             detail="Invalid credentials"
         )
-    token = create_access_token(data={"sub": user.id})
+    token = create_access_token(data=token_claims(user))
     return {"access_token": token, "token_type": "bearer", "user": user}
 
 #Events
@@ -213,19 +323,163 @@ async def create_event(event: EventBase, db: AsyncSession = Depends(get_db), cur
     event_id = await service.add_event(event)
     return {"message": "Event created", "event_id": event_id}
 
-@app.get("/events", tags=["events"])
-async def list_events(created_by: Optional[int] = None, visibility: Optional[str] = None, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+@app.get("/events", tags=["events"], response_model=list[EventResponse])
+async def list_events(
+    request: Request,
+    created_by: Optional[int] = None,
+    visibility: Optional[str] = None,
+    upcoming: bool = False,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Returns one page of events ordered by date. When more events exist,
+    the `X-Next-Cursor` response header holds the cursor for the next page.
+    `fields=id,title,datetime` returns (and reads) only some fields of each event.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    selected = requested_fields(EventResponse, fields)
+
     service = EventController(db)
-    result = await service.get_events(created_by, visibility)
-    return result
+    page_args = (limit, after, created_by, visibility, upcoming, date_from, date_to)
+    # built from the parsed arguments, so equivalent query strings (reordered, fields=b,a, extra parameters) share an entry
+    names = ("limit", "after", "created_by", "visibility", "upcoming", "date_from", "date_to")
+    variant = "&".join(f"{k}={v}" for k, v in zip(names, page_args)) + "&fields=" + (",".join(selected) if fields else "")
+
+    async def etag():
+        return make_etag("events", variant, await service.get_events_page_version(*page_args))
+
+    async def load(headers: dict):
+        events, has_more = await service.get_events_page(*page_args, fields=selected)
+        if has_more:
+            last = events[-1]
+            headers["X-Next-Cursor"] = encode_cursor(last.datetime, last.id)
+        return events
+
+    return await response_cache.serve(
+        "events", "events", variant, load, etag=etag, model=EventResponse, fields=selected, request=request
+    )
+
+@app.get("/events/search", tags=["events"], response_model=list[EventResponse])
+async def search_events(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Full text search over title, location and description. Every word of `q`
+    has to match (as a word prefix); title matches rank first. When more
+    results exist, the `X-Next-Cursor` response header holds the cursor for the next page.
+    """
+    try:
+        after = decode_score_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-@app.get("/events/{event_id}", tags=["events"])
-async def get_event(event_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
     service = EventController(db)
-    result = await service.get_event_by_id(event_id)
-    if result:
+    matches, has_more = await service.search_events(q, limit, after)
+    if has_more:
+        last, rank = matches[-1]
+        response.headers["X-Next-Cursor"] = encode_score_cursor(rank, last.id)
+    return [event for event, _ in matches]
+
+@app.get("/feed", tags=["feed"], response_model=list[FeedEventResponse])
+async def get_feed(
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Upcoming public events the current user's friends are going to, interested
+    in, liked or created, best first. The score weighs those friend counts,
+    the event's overall popularity and how recently it was created. When more
+    events exist, the `X-Next-Cursor` response header holds the cursor for the next page.
+    """
+    try:
+        after = decode_score_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    service = FeedController(db)
+    items, has_more = await service.get_feed_page(current_user.id, limit, after)
+    if has_more:
+        _, last = items[-1]
+        response.headers["X-Next-Cursor"] = encode_score_cursor(last.score, last.event_id)
+    return [
+        FeedEventResponse(
+            **EventResponse.model_validate(event).model_dump(),
+            score=item.score,
+            friends_going=item.friends_going,
+            friends_interested=item.friends_interested,
+            friends_liked=item.friends_liked,
+            friends_created=item.friends_created,
+        )
+        for event, item in items
+    ]
+
+NEARBY_DEFAULT_RADIUS_KM = 5.0
+NEARBY_MAX_RADIUS_KM = 50.0
+
+@app.get("/events/nearby", tags=["events"], response_model=list[NearbyEventResponse])
+async def nearby_events(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(NEARBY_DEFAULT_RADIUS_KM, gt=0, le=NEARBY_MAX_RADIUS_KM),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Events within `radius` km of (`lat`, `lon`), nearest first, with their
+    coordinates and distance. Events whose location could not be geocoded
+    are not included.
+    """
+    service = EventController(db)
+    nearby = await service.get_nearby_events(lat, lon, radius, limit)
+    return [
+        NearbyEventResponse(**EventResponse.model_validate(event).model_dump(), distance_km=round(distance, 3))
+        for event, distance in nearby
+    ]
+
+@app.get("/events/{event_id}", tags=["events"], response_model=EventResponse)
+async def get_event(request: Request, event_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    service = EventController(db)
+
+    async def etag():
+        return make_etag("event", event_id, await service.get_event_version(event_id))
+
+    async def load(headers: dict):
+        result = await service.get_event_by_id(event_id)
+        if not result:
+            raise HTTPException(status_code=404, detail="Event not found")
         return result
-    return {"error": "Event not found"}
+
+    return await response_cache.serve("event", f"event:{event_id}", "", load, etag=etag, model=EventResponse, request=request)
+
+@app.get("/events/{event_id}/detail", tags=["events"], response_model=EventDetailResponse)
+async def get_event_detail(event_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    """
+    Everything the event page needs in one call: the event, attendance counts,
+    likes, media and comments with their authors' public profiles.
+    """
+    service = EventController(db)
+    detail = await service.get_event_detail(event_id, current_user.id)
+    if detail is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    return EventDetailResponse.model_validate(detail)
 
 @app.put("/events/{event_id}", tags=["events"])
 async def update_event(event_id: int, event: EventUpdate, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
@@ -282,17 +536,37 @@ async def add_attendance(attendance: AttendanceBase, db: AsyncSession = Depends(
         return {"message": "Attendance added"}
     return {"error": "Could not add attendance"}
 
-@app.get("/attendance/event/{event_id}", tags=["attendance"])
-async def get_event_attendees(event_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+@app.post("/attendance/batch", tags=["attendance"], response_model=BatchResponse)
+async def add_attendance_batch(batch: AttendanceBatch, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    """
+    Signs the current user up for several events in one statement. Like
+    POST /attendance, an event the user is already signed up for is left as is.
+    """
+    statuses = {}
+    for item in batch.items:
+        statuses.setdefault(item.event_id, item.status)
+    changed = await AttendanceController(db).add_attendances(current_user.id, statuses)
+    return BatchResponse.of([item.event_id for item in batch.items], changed)
+
+@app.get("/attendance/event/{event_id}", tags=["attendance"], response_model=list[AttendanceResponse])
+async def get_event_attendees(request: Request, event_id: int, fields: Optional[str] = None, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
     service = AttendanceController(db)
-    result = await service.get_attendance_by_event(event_id)
-    return result
+    selected = requested_fields(AttendanceResponse, fields)
+    variant = ",".join(selected) if fields else ""
+
+    async def etag():
+        return make_etag("attendance", event_id, variant, await service.get_attendance_version(event_id))
 
-@app.get("/attendance/user/{user_id}", tags=["attendance"])
+    return await response_cache.serve(
+        "attendance", f"attendance:{event_id}", variant, lambda headers: service.get_attendance_by_event(event_id, selected),
+        etag=etag, model=AttendanceResponse, fields=selected, request=request,
+    )
+
+@app.get("/attendance/user/{user_id}", tags=["attendance"], response_model=list[AttendanceResponse])
 async def get_user_attendance(user_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
     service = AttendanceController(db)
     result = await service.get_attendance_by_user(user_id)
-    return result
+    return json_response(AttendanceResponse, result)
 
 @app.delete("/attendance", tags=["attendance"])
 async def delete_attendance(user_id: int, event_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
@@ -315,12 +589,29 @@ async def add_comment(comment: CommentBase, db: AsyncSession = Depends(get_db),
     comment_id = await service.add_comment(comment)
     return {"message": "Comment added", "comment_id": comment_id}
 
-@app.get("/comments/{event_id}", tags=["comments"])
-async def get_comments(event_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+@app.post("/comments/batch", tags=["comments"], response_model=BatchResponse)
+async def add_comment_batch(batch: CommentBatch, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    """Adds several comments of the current user in one statement; comment_id is null for unknown events."""
+    ids = await CommentController(db).add_comments(current_user.id, [(c.event_id, c.content) for c in batch.comments])
+    results = [
+        BatchItemResult(event_id=c.event_id, changed=comment_id is not None, comment_id=comment_id)
+        for c, comment_id in zip(batch.comments, ids)
+    ]
+    return BatchResponse(changed=sum(r.changed for r in results), results=results)
+
+@app.get("/comments/{event_id}", tags=["comments"], response_model=list[PlainCommentResponse])
+async def get_comments(request: Request, event_id: int, fields: Optional[str] = None, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
     service = CommentController(db)
+    selected = requested_fields(PlainCommentResponse, fields)
+    variant = ",".join(selected) if fields else ""
+
+    async def etag():
+        return make_etag("comments", event_id, variant, await service.get_comments_version(event_id))
 
-    result = await service.get_comments_for_event(event_id)
-    return result
+    return await response_cache.serve(
+        "comments", f"comments:{event_id}", variant, lambda headers: service.get_comments_for_event(event_id, selected),
+        etag=etag, model=PlainCommentResponse, fields=selected, request=request,
+    )
 
 @app.delete("/comments/{comment_id}", tags=["comments"])
 async def delete_comment(comment_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
@@ -372,11 +663,52 @@ async def add_media(media: MediaBase, url: str, db: AsyncSession = Depends(get_d
     media_id = await service.add_media(media, url)
     return {"message": "Media added", "media_id": media_id}
 
-@app.get("/media/{event_id}", tags=["media"])
-async def get_event_media(event_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+@app.post("/media/upload", tags=["media"])
+async def upload_media(request: Request, event_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    """
+    Uploads one image or video to an event as the multipart form field "file".
+    The body is streamed to storage as it arrives; a file stored before is not
+    stored again. Images are 'processing' until their thumbnails exist (see
+    the media's `variants`), videos are 'ready' right away.
+    """
+    if await EventController(db).get_event_version(event_id) is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    # ends the transaction, so no pooled connection is held while the body streams in
+    await db.commit()
+
+    try:
+        upload = await media_uploads.receive(request.headers, request.stream())
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnsupportedMediaType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    media = await MediaController(db).add_upload(event_id, current_user.id, upload)
+    if media.status == "processing":
+        thumbnail_pool.submit(media_uploads.store, upload.content_hash, upload.key)
+    return {
+        "message": "Media uploaded",
+        "media_id": media.id,
+        "url": upload.url,
+        "status": media.status,
+        "deduplicated": upload.deduplicated,
+    }
+
+@app.get("/media/{event_id}", tags=["media"], response_model=list[MediaResponse])
+async def get_event_media(request: Request, event_id: int, fields: Optional[str] = None, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
     service = MediaController(db)
-    result = await service.get_media_for_event(event_id)
-    return result
+    selected = requested_fields(MediaResponse, fields)
+    variant = ",".join(selected) if fields else ""
+
+    async def etag():
+        return make_etag("media", event_id, variant, await service.get_media_version(event_id))
+
+    return await response_cache.serve(
+        "media", f"media:{event_id}", variant, lambda headers: service.get_media_for_event(event_id, selected),
+        etag=etag, model=MediaResponse, fields=selected, request=request,
+    )
 
 
 @app.delete("/media/{media_id}", tags=["media"])
@@ -392,11 +724,11 @@ async def delete_media(media_id: int, db: AsyncSession = Depends(get_db), curren
     await service.delete_media(media_id)
     return {"message": "Media deleted"}
 
-@app.get("/media/user/{user_id}", tags=["media"])
+@app.get("/media/user/{user_id}", tags=["media"], response_model=list[MediaResponse])
 async def get_user_media(user_id: int, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
     service = MediaController(db)
     result = await service.get_media_for_user(user_id)
-    return result
+    return json_response(MediaResponse, result)
 
 
 
@@ -428,6 +760,18 @@ async def remove_like(
         return {"message": "Unliked"}
     return {"error": "Like not found"}
 
+@app.post("/likes/batch", tags=["likes"], response_model=BatchResponse)
+async def add_like_batch(batch: LikeBatch, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    """Likes several events as the current user in one statement."""
+    changed = await LikeController(db).add_likes(current_user.id, batch.event_ids)
+    return BatchResponse.of(batch.event_ids, changed)
+
+@app.delete("/likes/batch", tags=["likes"], response_model=BatchResponse)
+async def remove_like_batch(batch: LikeBatch, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    """Removes several likes of the current user in one statement."""
+    changed = await LikeController(db).remove_likes(current_user.id, batch.event_ids)
+    return BatchResponse.of(batch.event_ids, changed)
+
 @app.get("/likes/{user_id}", tags=["likes"])
 async def get_user_likes(
     user_id: int,
@@ -436,4 +780,90 @@ async def get_user_likes(
 ):
     service = LikeController(db)
     likes = await service.get_likes_for_user(user_id)
-    return {"message": "Likes retrieved", "likes": likes}
\ No newline at end of file
+    return {"message": "Likes retrieved", "likes": likes}
+
+
+#SYNC
+SYNC_RETENTION_DAYS = int(os.getenv("SYNC_RETENTION_DAYS", "30"))
+
+@app.get("/sync", tags=["sync"], response_model=SyncResponse)
+async def sync_changes(
+    since: Optional[str] = None,
+    limit: int = Query(DEFAULT_SYNC_LIMIT, ge=1, le=MAX_SYNC_LIMIT),
+    db: AsyncSession = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Events, comments, likes and attendance inserted, updated or deleted since
+    `since`. Without `since` only the current token is returned: call it
+    first, load the data through the regular endpoints, then poll with the
+    returned token. While `has_more` is true, call again right away.
+    """
+    service = SyncController(db)
+    if since is None:
+        txid, change_id = await service.head()
+        return SyncResponse(token=encode_sync_token(txid, change_id, time.time()))
+
+    try:
+        txid, change_id, issued_at = decode_sync_token(since)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    if time.time() - issued_at > SYNC_RETENTION_DAYS * 86400:
+        # older changes may already be pruned from the change log
+        raise HTTPException(status_code=410, detail="Sync token expired, reload all data")
+
+    changes = await service.changes_since((txid, change_id), limit)
+    txid, change_id = changes.pop("position")
+    return SyncResponse.model_validate(
+        {**changes, "token": encode_sync_token(txid, change_id, time.time())}, from_attributes=True
+    )
+
+@app.websocket("/ws")
+async def realtime_updates(websocket: WebSocket, db: AsyncSession = Depends(get_db)):
+    """
+    Pushes updates of subscribed events. Authenticate with `?token=` (browsers
+    cannot set headers on WebSockets) or an Authorization header, then send
+    {"action": "subscribe", "event_ids": [1, 2]}. Messages are
+    {"type": ..., "event_id": ..., "data": ...} with type comment,
+    comment_deleted, counts, event, event_deleted, or resync: some updates were
+    dropped and the client should reload (e.g. through GET /sync).
+    """
+    token = websocket.query_params.get("token")
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if token is None and scheme.lower() == "bearer":
+        token = credentials
+    try:
+        await authenticate(token, db)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    finally:
+        # the connection may stay open for hours, it must not hold a pooled connection
+        await db.close()
+    await realtime.serve_websocket(websocket)
+
+@app.get("/sse", tags=["realtime"])
+async def realtime_stream(
+    event_ids: list[int] = Query(..., min_length=1),
+    current_user = Depends(get_current_user)
+):
+    """
+    The messages of /ws for the given events as server-sent events, for
+    clients without WebSocket support.
+    """
+    try:
+        subscriber = await realtime.connect()
+    except RealtimeFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except BrokerUnavailable:
+        raise HTTPException(status_code=503, detail="Realtime updates are unavailable, try again later")
+    try:
+        realtime.subscribe(subscriber, event_ids)
+    except TooManySubscriptions as e:
+        realtime.disconnect(subscriber)
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        realtime.stream(subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
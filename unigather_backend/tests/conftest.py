@@ -3,6 +3,7 @@
 import os
 import sys
 import asyncio
+from contextlib import contextmanager
 
 import pytest
 import pytest_asyncio
@@ -12,6 +13,7 @@ from sqlalchemy.ext.asyncio import (
     AsyncSession,
     create_async_engine,
 )
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker
 
 
@@ -75,6 +77,34 @@ async def db_session(async_engine: AsyncEngine) -> AsyncSession:
 
 
 
+@pytest.fixture
+def count_queries(db_session: AsyncSession):
+    """
+    Context manager collecting every SQL statement sent while it is active:
+
+        with count_queries() as statements:
+            await controller.add_comment(...)
+        assert len(statements) == 1
+    """
+    sync_engine = db_session.bind.sync_engine
+
+    @contextmanager
+    def _count():
+        statements = []
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(sync_engine, "before_cursor_execute", _record)
+        try:
+            yield statements
+        finally:
+            event.remove(sync_engine, "before_cursor_execute", _record)
+
+    return _count
+
+
+
 @pytest_asyncio.fixture
 async def client(db_session: AsyncSession):
     """
@@ -83,8 +113,13 @@ async def client(db_session: AsyncSession):
     """
     from main import app
     from db.database import get_db
+    from db.db_controller_user import public_profile_cache
+    from api.response_cache import response_cache, MemoryCacheBackend
 
     app.dependency_overrides[get_db] = lambda: db_session
+    _ua.principal_cache.clear()
+    public_profile_cache.clear()
+    response_cache.backend = MemoryCacheBackend()  # ids repeat across tests
 
  
     from httpx import AsyncClient, ASGITransport
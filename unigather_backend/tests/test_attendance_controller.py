@@ -1,4 +1,6 @@
 
+import asyncio
+
 import pytest
 from datetime import datetime, timedelta
 
@@ -198,3 +200,33 @@ async def test_delete_nonexistent_attendance_returns_false(db_session: AsyncSess
 
     
     assert await ctrl.delete_attendance(user.id, event.id) is False
+
+
+@pytest.mark.asyncio
+async def test_add_attendance_concurrent_is_idempotent(db_session: AsyncSession, async_engine):
+    """
+    Two sessions adding the same attendance at the same time:
+    exactly one succeeds and no IntegrityError escapes.
+    """
+    user = Users(name="Race User", email="race@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    event = Events(
+        title="Race Event",
+        datetime=datetime.utcnow() + timedelta(days=1),
+        visibility="public",
+        created_by=user.id,
+    )
+    db_session.add(event)
+    await db_session.commit()
+
+    payload = AttendanceBase(user_id=user.id, event_id=event.id, status="going")
+    async with AsyncSession(async_engine) as first, AsyncSession(async_engine) as second:
+        results = await asyncio.gather(
+            AttendanceController(first).add_attendance(payload),
+            AttendanceController(second).add_attendance(payload),
+        )
+
+    assert sorted(results) == [False, True]
+    rows = await db_session.execute(select(Attendance))
+    assert len(rows.scalars().all()) == 1
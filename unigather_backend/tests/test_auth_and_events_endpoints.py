@@ -66,5 +66,5 @@ async def test_user_registration_and_login(client):
     assert delete_resp.json()["message"] == "Event deleted"
 
     missing_resp = await client.get(f"/events/{event_id}")
-    assert missing_resp.status_code == 200
-    assert missing_resp.json()["error"] == "Event not found"
+    assert missing_resp.status_code == 404
+    assert missing_resp.json()["detail"] == "Event not found"
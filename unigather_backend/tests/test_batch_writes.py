@@ -0,0 +1,138 @@
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import user_auth
+from api.api_objects import EventBase, Friendship, MAX_BATCH_SIZE
+from db import feed
+from db.db_controller_attendance import AttendanceController
+from db.db_controller_comments import CommentController
+from db.db_controller_events import EventController
+from db.db_controller_friends import FriendshipController
+from db.db_controller_likes import LikeController
+from db.db_models import ChangeLog, Comments, Events, FeedItems, Users
+
+
+async def _setup(db_session: AsyncSession, events: int = 3):
+    users = [Users(name=f"Batch {i}", email=f"batch{i}@example.com", password_hash="x", role="student") for i in range(3)]
+    db_session.add_all(users)
+    await db_session.commit()
+    me, friend, host = (user.id for user in users)
+    assert await FriendshipController(db_session).send_friend_request(Friendship(user_id=me, friend_id=friend, status="accepted"))
+    event_ids = [
+        await EventController(db_session).add_event(EventBase(
+            title=f"Event {i}", location=None, event_datetime=datetime.now() + timedelta(days=1 + i),
+            visibility="public", created_by=host,
+        ))
+        for i in range(events)
+    ]
+    return users[0], me, friend, event_ids
+
+
+async def _counters(db_session: AsyncSession, event_ids: list[int]) -> dict:
+    db_session.expire_all()
+    rows = await db_session.execute(
+        select(Events.id, Events.like_count, Events.going_count, Events.interested_count, Events.comment_count).where(Events.id.in_(event_ids))
+    )
+    return {row.id: tuple(row)[1:] for row in rows}
+
+
+async def _feed_matches_rebuild(db_session: AsyncSession) -> bool:
+    snapshot = lambda: db_session.execute(select(FeedItems.user_id, FeedItems.event_id, FeedItems.friends_liked,
+                                                 FeedItems.friends_going, FeedItems.friends_interested, FeedItems.score))
+    db_session.expire_all()
+    incremental = set(await snapshot())
+    await feed.rebuild(db_session)
+    await db_session.commit()
+    return set(await snapshot()) == incremental and bool(incremental)
+
+
+@pytest.mark.asyncio
+async def test_batches_write_like_single_calls(db_session: AsyncSession, count_queries):
+    """
+    1) add_likes / remove_likes / add_attendances / add_comments are one statement each, whatever the batch size.
+    2) They skip repeats and unknown events, and report what changed.
+    3) Counters, the change log and the friends' feed rows come out as with one call per item.
+    """
+    _, me, friend, (a, b, c) = await _setup(db_session)
+    likes, attendance, comments = LikeController(db_session), AttendanceController(db_session), CommentController(db_session)
+
+    with count_queries() as statements:
+        assert await likes.add_likes(me, [a, b, a, 999999]) == {a, b}
+    assert len(statements) == 1
+    with count_queries() as statements:
+        assert await likes.add_likes(me, [a, c]) == {c}
+    assert len(statements) == 1
+    assert await likes.add_likes(friend, [a]) == {a}
+
+    with count_queries() as statements:
+        assert await attendance.add_attendances(me, {a: "going", b: "interested", c: "not going", 999999: "going"}) == {a, b, c}
+    assert len(statements) == 1
+    assert await attendance.add_attendances(me, {a: "interested"}) == set()
+
+    with count_queries() as statements:
+        ids = await comments.add_comments(me, [(a, "first"), (999999, "lost"), (a, "second"), (b, "third")])
+    assert len(statements) == 1
+    assert ids[1] is None and None not in (ids[0], ids[2], ids[3]) and ids[0] < ids[2]
+    stored = dict((await db_session.execute(select(Comments.id, Comments.content).where(Comments.id.in_([ids[0], ids[2], ids[3]])))).all())
+    assert stored == {ids[0]: "first", ids[2]: "second", ids[3]: "third"}
+
+    #                like, going, interested, comments
+    assert await _counters(db_session, [a, b, c]) == {a: (2, 1, 0, 2), b: (1, 0, 1, 1), c: (1, 0, 0, 0)}
+    # the friend sees my likes and attendance of a, b and c
+    assert await _feed_matches_rebuild(db_session)
+
+    with count_queries() as statements:
+        assert await likes.remove_likes(me, [a, b, 999999]) == {a, b}
+    assert len(statements) == 1
+    assert await likes.remove_likes(me, [a]) == set()
+    assert await _counters(db_session, [a, b, c]) == {a: (1, 1, 0, 2), b: (0, 0, 1, 1), c: (1, 0, 0, 0)}
+    assert await _feed_matches_rebuild(db_session)
+
+    logged = await db_session.execute(select(ChangeLog.entity, func.count()).group_by(ChangeLog.entity))
+    # likes: 4 added + 2 removed; attendance 3; comments 3
+    assert {k: v for k, v in logged if k != "event"} == {"like": 6, "attendance": 3, "comment": 3}
+
+
+@pytest.mark.asyncio
+async def test_batch_endpoints(client, db_session: AsyncSession):
+    """
+    1) The batch endpoints act as the current user and return one result per item, in order.
+    2) Empty and oversized batches are rejected before touching the database.
+    """
+    user, me, _, (a, b, c) = await _setup(db_session)
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+
+    response = await client.post("/likes/batch", json={"event_ids": [a, b, a, 999999]}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"changed": 2, "results": [
+        {"event_id": a, "changed": True, "comment_id": None},
+        {"event_id": b, "changed": True, "comment_id": None},
+        {"event_id": a, "changed": False, "comment_id": None},
+        {"event_id": 999999, "changed": False, "comment_id": None},
+    ]}
+    response = await client.request("DELETE", "/likes/batch", json={"event_ids": [b, c]}, headers=headers)
+    assert [r["changed"] for r in response.json()["results"]] == [True, False]
+
+    response = await client.post("/attendance/batch", headers=headers, json={"items": [
+        {"event_id": a, "status": "going"}, {"event_id": b, "status": "interested"}, {"event_id": a, "status": "interested"},
+    ]})
+    assert response.json()["changed"] == 2
+    assert [r["changed"] for r in response.json()["results"]] == [True, True, False]
+
+    response = await client.post("/comments/batch", headers=headers, json={"comments": [
+        {"event_id": c, "content": "offline 1"}, {"event_id": 999999, "content": "gone"}, {"event_id": c, "content": "offline 2"},
+    ]})
+    results = response.json()["results"]
+    assert [r["changed"] for r in results] == [True, False, True]
+    assert results[0]["comment_id"] < results[2]["comment_id"] and results[1]["comment_id"] is None
+    comments = (await client.get(f"/comments/{c}", headers=headers)).json()
+    assert [(x["user_id"], x["content"]) for x in comments] == [(me, "offline 1"), (me, "offline 2")]
+    assert await _counters(db_session, [a, b, c]) == {a: (1, 1, 0, 0), b: (0, 0, 1, 0), c: (0, 0, 0, 2)}
+
+    assert (await client.post("/likes/batch", json={"event_ids": []}, headers=headers)).status_code == 422
+    too_many = {"event_ids": list(range(MAX_BATCH_SIZE + 1))}
+    assert (await client.post("/likes/batch", json=too_many, headers=headers)).status_code == 422
+    assert (await client.post("/likes/batch", json={"event_ids": [a]})).status_code == 401
@@ -0,0 +1,44 @@
+from benchmarks.bench_load import MIN_REQUESTS, compare, summarize
+
+
+def _results(latency: float, requests: int = MIN_REQUESTS) -> dict:
+    # (latencies in seconds, errors) per endpoint
+    return {"list_events": ([latency] * requests, 0), "like": ([latency * 2] * 10, 1)}
+
+
+def test_summarize_reports_each_endpoint_and_the_total():
+    """
+    1) Requests, rps, percentiles (ms), errors and statements per endpoint.
+    2) The total weighs each endpoint's statements by its requests.
+    """
+    results = {"list_events": ([0.001 * i for i in range(1, 101)], 0), "like": ([0.05] * 50, 2)}
+    summary = summarize(results, {"list_events": 2, "like": 4}, duration=10)
+
+    events = summary["list_events"]
+    assert events["requests"] == 100 and events["rps"] == 10
+    assert (round(events["p50"]), round(events["p95"]), round(events["p99"])) == (51, 96, 100)
+    assert summary["like"]["errors"] == 2 and summary["like"]["p99"] == 50
+    total = summary["total"]
+    assert total["requests"] == 150 and total["rps"] == 15 and total["errors"] == 2
+    assert round(total["statements"], 2) == round((100 * 2 + 50 * 4) / 150, 2)
+
+
+def test_compare_flags_slower_endpoints_and_more_statements():
+    """
+    1) The same numbers, or changes within the tolerance, are no regression.
+    2) Latency and rps beyond the tolerance are, but only for endpoints with MIN_REQUESTS in the baseline.
+    3) Any extra statement is a regression.
+    """
+    baseline = summarize(_results(0.010), {"list_events": 2, "like": 3}, duration=10)
+
+    assert compare(baseline, baseline, tolerance=0.25) == []
+    assert compare(summarize(_results(0.012), {"list_events": 2, "like": 3}, 10), baseline, 0.25) == []
+
+    slower = summarize(_results(0.020, requests=MIN_REQUESTS // 2), {"list_events": 2, "like": 3}, 10)
+    regressions = compare(slower, baseline, 0.25)
+    assert "list_events p50 10.0 -> 20.0 ms" in regressions
+    assert any(r.startswith("list_events rps") for r in regressions)
+    assert not any(r.startswith("like ") for r in regressions)  # 10 requests are too few to judge latency
+
+    more = summarize(_results(0.010), {"list_events": 2, "like": 4}, 10)
+    assert compare(more, baseline, 0.25) == ["like statements 3.0 -> 4.0", "total statements 2.2 -> 2.3"]
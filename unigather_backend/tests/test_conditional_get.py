@@ -0,0 +1,116 @@
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import user_auth
+from api.api_objects import CommentBase, EventUpdate, LikeBase
+from db.db_controller_comments import CommentController
+from db.db_controller_events import EventController
+from db.db_controller_likes import LikeController
+from db.db_models import Users, Events
+
+
+async def _seed(db_session: AsyncSession):
+    user = Users(name="Etag User", email="etag@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    events = [
+        Events(title=f"Etag Event {i}", datetime=datetime.utcnow() + timedelta(days=i + 1), created_by=user.id)
+        for i in range(2)
+    ]
+    db_session.add_all(events)
+    await db_session.commit()
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+    return user, events, headers
+
+
+@pytest.mark.asyncio
+async def test_row_versions_follow_every_change(db_session: AsyncSession):
+    """
+    1) The comment collection version changes with its content, not on reads.
+    2) The event version changes on update and when a like bumps its counter.
+    3) The events page version changes when any event on the page changes.
+    """
+    user, events, _ = await _seed(db_session)
+    comments = CommentController(db_session)
+    ctrl = EventController(db_session)
+
+    empty = await comments.get_comments_version(events[0].id)
+    assert await comments.get_comments_version(events[0].id) == empty
+    comment_id = await comments.add_comment(CommentBase(event_id=events[0].id, user_id=user.id, content="a"))
+    one = await comments.get_comments_version(events[0].id)
+    await comments.delete_comment(comment_id)
+    assert one != empty
+    # back to the same (empty) collection, so the same version
+    assert await comments.get_comments_version(events[0].id) == empty
+
+    page = await ctrl.get_events_page_version(limit=10)
+    event_version = await ctrl.get_event_version(events[1].id)
+    await ctrl.update_event(events[1].id, EventUpdate(title="Renamed"))
+    updated = await ctrl.get_event_version(events[1].id)
+    assert updated > event_version
+    await LikeController(db_session).add_like(LikeBase(user_id=user.id, event_id=events[1].id))
+    assert await ctrl.get_event_version(events[1].id) > updated
+    assert await ctrl.get_events_page_version(limit=10) != page
+    assert await ctrl.get_event_version(0) is None
+
+
+@pytest.mark.asyncio
+async def test_conditional_get_returns_304_until_data_changes(client, db_session: AsyncSession):
+    """
+    1) Read routes send an ETag; repeating the request with If-None-Match gives an empty 304.
+    2) A write to the collection makes the old ETag stale, the next request gets 200 and a new ETag.
+    3) A like does so for its event; cached GET /events pages keep answering 304 until their TTL runs out.
+    """
+    user, events, headers = await _seed(db_session)
+    event_id = events[0].id
+
+    for path in ("/events?limit=1", f"/events/{event_id}", f"/comments/{event_id}", f"/media/{event_id}", f"/attendance/event/{event_id}"):
+        first = await client.get(path, headers=headers)
+        assert first.status_code == 200 and first.headers["ETag"].startswith('"'), path
+        again = await client.get(path, headers={**headers, "If-None-Match": first.headers["ETag"]})
+        assert again.status_code == 304 and again.content == b"", path
+        assert again.headers["ETag"] == first.headers["ETag"]
+
+    first = await client.get(f"/comments/{event_id}", headers=headers)
+    await CommentController(db_session).add_comment(CommentBase(event_id=event_id, user_id=user.id, content="new"))
+    changed = await client.get(f"/comments/{event_id}", headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != first.headers["ETag"]
+    assert [c["content"] for c in changed.json()] == ["new"]
+
+    page = await client.get("/events?limit=1", headers=headers)
+    detail = await client.get(f"/events/{event_id}", headers=headers)
+    await LikeController(db_session).add_like(LikeBase(user_id=user.id, event_id=event_id))
+    db_session.expire_all()
+    refreshed = await client.get(f"/events/{event_id}", headers={**headers, "If-None-Match": detail.headers["ETag"]})
+    assert refreshed.status_code == 200
+    assert refreshed.json()["like_count"] == 1
+    stale = await client.get("/events?limit=1", headers={**headers, "If-None-Match": page.headers["ETag"]})
+    assert stale.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_cached_responses_answer_conditional_gets_without_the_database(client, db_session: AsyncSession, count_queries):
+    """
+    1) Once a response is cached, a repeat (with or without a matching If-None-Match) runs no SQL at all.
+    2) A cache miss still checks the row versions, and a matching ETag gives a 304 without loading rows.
+    """
+    user, events, headers = await _seed(db_session)
+    path = f"/comments/{events[0].id}"
+    first = await client.get(path, headers=headers)
+
+    with count_queries() as statements:
+        hit = await client.get(path, headers=headers)
+        not_modified = await client.get(path, headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert statements == []
+    assert hit.headers["X-Cache"] == "HIT" and hit.headers["ETag"] == first.headers["ETag"]
+    assert not_modified.status_code == 304 and not_modified.headers["ETag"] == first.headers["ETag"]
+
+    from api.response_cache import MemoryCacheBackend, response_cache
+    response_cache.backend = MemoryCacheBackend()
+    with count_queries() as statements:
+        revalidated = await client.get(path, headers={**headers, "If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert len(statements) == 1 and "md5" in statements[0]
@@ -0,0 +1,72 @@
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.db_models import Users, Events
+from db.db_controller_attendance import AttendanceController
+from db.db_controller_comments import CommentController
+from db.db_controller_events import EventController
+from db.db_controller_friends import FriendshipController
+from db.db_controller_likes import LikeController
+from db.db_controller_media import MediaController
+from db.db_controller_user import UserController
+from api.api_objects import AttendanceBase, CommentBase, EventBase, Friendship, LikeBase, MediaBase, UserCreate
+
+
+@pytest.mark.asyncio
+async def test_each_create_is_one_statement(db_session: AsyncSession, count_queries):
+    """
+    Every create path sends exactly one SQL statement: generated ids and
+    duplicate detection come back through RETURNING, no SELECT/refresh().
+    """
+    author = Users(name="Creator", email="creator@example.com", password_hash="x", role="student")
+    friend = Users(name="Friend", email="friend@example.com", password_hash="x", role="student")
+    db_session.add_all([author, friend])
+    await db_session.commit()
+    event = Events(
+        title="Existing",
+        datetime=datetime.utcnow() + timedelta(days=1),
+        visibility="public",
+        created_by=author.id,
+    )
+    other = Events(
+        title="Batched",
+        datetime=datetime.utcnow() + timedelta(days=2),
+        visibility="public",
+        created_by=author.id,
+    )
+    db_session.add_all([event, other])
+    await db_session.commit()
+
+    creates = {
+        "add_user": lambda: UserController(db_session).add_user(
+            UserCreate(name="New", email="new@example.com", role="student", password="pw")),
+        "add_event": lambda: EventController(db_session).add_event(
+            EventBase(title="New Event", event_datetime=datetime.utcnow(), visibility="public", created_by=author.id)),
+        "add_comment": lambda: CommentController(db_session).add_comment(
+            CommentBase(event_id=event.id, user_id=author.id, content="hello")),
+        "add_media": lambda: MediaController(db_session).add_media(
+            MediaBase(event_id=event.id, user_id=author.id, type="image"), "http://x/new.png"),
+        "add_attendance": lambda: AttendanceController(db_session).add_attendance(
+            AttendanceBase(user_id=author.id, event_id=event.id, status="going")),
+        "send_friend_request": lambda: FriendshipController(db_session).send_friend_request(
+            Friendship(user_id=author.id, friend_id=friend.id, status="pending")),
+        "add_like": lambda: LikeController(db_session).add_like(
+            LikeBase(user_id=author.id, event_id=event.id)),
+        # batches are one statement however many rows they write
+        "add_likes": lambda: LikeController(db_session).add_likes(author.id, [other.id, 0]),
+        "add_attendances": lambda: AttendanceController(db_session).add_attendances(author.id, {other.id: "interested", 0: "going"}),
+        "add_comments": lambda: CommentController(db_session).add_comments(author.id, [(event.id, "one"), (other.id, "two")]),
+    }
+
+    for name, create in creates.items():
+        with count_queries() as statements:
+            result = await create()
+        assert result, f"{name} did not create a row"
+        assert len(statements) == 1, f"{name} sent {len(statements)} statements: {statements}"
+
+        # repeating the same create is still a single statement
+        with count_queries() as statements:
+            await create()
+        assert len(statements) == 1, f"{name} (repeated) sent {len(statements)} statements: {statements}"
@@ -0,0 +1,83 @@
+import time
+
+import pytest
+from sqlalchemy import NullPool, AsyncAdaptedQueuePool, event, text
+
+import db.database as database
+from conftest import TEST_DATABASE_URL
+
+
+@pytest.mark.asyncio
+async def test_serverless_mode_uses_null_pool():
+    engine = database.build_engine(TEST_DATABASE_URL, mode="serverless")
+    try:
+        assert isinstance(engine.pool, NullPool)
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_pooled_mode_reuses_connection(monkeypatch):
+    """
+    In pooled mode two sequential checkouts must be served by the same
+    physical connection, so the second request skips the connect handshake.
+    """
+    monkeypatch.setattr(database, "SSL", "disable")
+    engine = database.build_engine(TEST_DATABASE_URL, mode="pooled")
+    try:
+        assert isinstance(engine.pool, AsyncAdaptedQueuePool)
+
+        async with engine.connect() as conn:
+            first_pid = (await conn.execute(text("SELECT pg_backend_pid()"))).scalar_one()
+        async with engine.connect() as conn:
+            second_pid = (await conn.execute(text("SELECT pg_backend_pid()"))).scalar_one()
+
+        assert first_pid == second_pid
+        assert engine.pool.checkedin() == 1
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_pooled_mode_drops_idle_connections(monkeypatch):
+    """
+    A connection that stayed in the pool longer than pool_max_idle is replaced on checkout.
+    """
+    monkeypatch.setattr(database, "SSL", "disable")
+    monkeypatch.setattr(database, "POOL_MAX_IDLE", 0.05)
+    engine = database.build_engine(TEST_DATABASE_URL, mode="pooled")
+    try:
+        async with engine.connect() as conn:
+            first_pid = (await conn.execute(text("SELECT pg_backend_pid()"))).scalar_one()
+        time.sleep(0.1)
+        async with engine.connect() as conn:
+            second_pid = (await conn.execute(text("SELECT pg_backend_pid()"))).scalar_one()
+
+        assert first_pid != second_pid
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_schema_is_bound_per_connection(monkeypatch):
+    """
+    The schema comes from the connection startup settings, so a fresh
+    connection already has it on its search_path without any SET statement.
+    """
+    monkeypatch.setattr(database, "SSL", "disable")
+    monkeypatch.setattr(database, "SCHEMA", "pg_catalog")
+    engine = database.build_engine(TEST_DATABASE_URL, mode="serverless")
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    try:
+        async with engine.connect() as conn:
+            search_path = (await conn.execute(text("SHOW search_path"))).scalar_one()
+
+        assert search_path == "pg_catalog"
+        assert not any(s.upper().startswith("SET ") for s in statements)
+    finally:
+        await engine.dispose()
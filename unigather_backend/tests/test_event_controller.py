@@ -1,11 +1,13 @@
 
 
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
-from db.db_models import Users
+from db.db_models import Users, Events, Comments, Media, Attendance
 from db.db_controller_events import EventController
-from api.api_objects import EventBase, EventUpdate
+from db.db_controller_likes import LikeController
+from api.api_objects import EventBase, EventUpdate, EventDetailResponse
+from api.pagination import encode_cursor, decode_cursor, encode_score_cursor, decode_score_cursor
 
 
 @pytest.mark.asyncio
@@ -230,3 +232,132 @@ async def test_delete_event(db_session):
     assert await ctrl.get_event_by_id(eid) is None
 
     assert await ctrl.delete_event(eid) is False
+
+
+@pytest.mark.asyncio
+async def test_get_events_page_keyset(db_session):
+    """
+    1) Insert five events, two of them in the past and two sharing the same datetime.
+    2) Walk the pages with limit=2 using cursors, verify order by (datetime, id) and no duplicates.
+    3) upcoming / date range filters are applied in SQL, with aware datetimes compared in UTC.
+    """
+    user = Users(
+        name="Pager",
+        email="pager@example.com",
+        password_hash="fakehash",
+        role="student"
+    )
+    db_session.add(user)
+    await db_session.commit()
+    await db_session.refresh(user)
+
+    ctrl = EventController(db_session)
+    now = datetime.utcnow().replace(microsecond=0)
+    offsets = [-2, -1, 1, 1, 3]
+    for i, days in enumerate(offsets):
+        await ctrl.add_event(EventBase(
+            title=f"Paged {i}",
+            event_datetime=now + timedelta(days=days),
+            visibility="public",
+            created_by=user.id
+        ))
+
+    seen = []
+    after = None
+    while True:
+        page, has_more = await ctrl.get_events_page(limit=2, after=after)
+        seen.extend(page)
+        if not has_more:
+            break
+        cursor = encode_cursor(page[-1].datetime, page[-1].id)
+        after = decode_cursor(cursor)
+
+    assert [e.title for e in seen] == [f"Paged {i}" for i in range(5)]
+    assert len({e.id for e in seen}) == 5
+
+    upcoming, has_more = await ctrl.get_events_page(limit=10, upcoming=True)
+    assert [e.title for e in upcoming] == ["Paged 2", "Paged 3", "Paged 4"]
+    assert has_more is False
+
+    ranged, _ = await ctrl.get_events_page(
+        limit=10,
+        date_from=now - timedelta(days=1),
+        date_to=now + timedelta(days=2)
+    )
+    assert [e.title for e in ranged] == ["Paged 1", "Paged 2", "Paged 3"]
+    # the same range with a UTC+2 offset
+    plus_two = timezone(timedelta(hours=2))
+    ranged, _ = await ctrl.get_events_page(
+        limit=10,
+        date_from=(now - timedelta(days=1)).replace(tzinfo=timezone.utc).astimezone(plus_two),
+        date_to=(now + timedelta(days=2)).replace(tzinfo=timezone.utc).astimezone(plus_two)
+    )
+    assert [e.title for e in ranged] == ["Paged 1", "Paged 2", "Paged 3"]
+
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+    # crafted cursors: ids beyond int4, a score too large for a float
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(now, 2**31))
+    for crafted in (encode_score_cursor(10**400, 1), encode_score_cursor(0.5, -2**40)):
+        with pytest.raises(ValueError):
+            decode_score_cursor(crafted)
+
+
+@pytest.mark.asyncio
+async def test_get_event_detail_fixed_query_count(db_session, count_queries):
+    """
+    1) Create an event with comments from several authors, media, attendance and likes.
+    2) get_event_detail(...) returns everything in 4 statements, regardless of row counts.
+    3) Counts, viewer state and embedded comment authors are correct.
+    """
+    users = [
+        Users(name=f"Detail {i}", email=f"detail{i}@example.com", password_hash="x", role="student")
+        for i in range(3)
+    ]
+    db_session.add_all(users)
+    await db_session.commit()
+    viewer, other, third = users
+
+    ev = Events(
+        title="Detail Event",
+        datetime=datetime.utcnow() + timedelta(days=1),
+        visibility="public",
+        created_by=viewer.id
+    )
+    db_session.add(ev)
+    await db_session.commit()
+
+    db_session.add_all([
+        Comments(event_id=ev.id, user_id=other.id, content="first", created_at=datetime.utcnow()),
+        Comments(event_id=ev.id, user_id=third.id, content="second", created_at=datetime.utcnow() + timedelta(seconds=1)),
+        Comments(event_id=ev.id, user_id=other.id, content="third", created_at=datetime.utcnow() + timedelta(seconds=2)),
+        Media(event_id=ev.id, user_id=viewer.id, url="http://x/a.png", type="image"),
+        Attendance(user_id=viewer.id, event_id=ev.id, status="going"),
+        Attendance(user_id=other.id, event_id=ev.id, status="going"),
+        Attendance(user_id=third.id, event_id=ev.id, status="interested"),
+    ])
+    await db_session.commit()
+    # through the controller, which keeps Events.like_count in step
+    likes = LikeController(db_session)
+    await likes.add_likes(other.id, [ev.id])
+    await likes.add_likes(third.id, [ev.id])
+    db_session.expunge_all()
+
+    ctrl = EventController(db_session)
+    with count_queries() as statements:
+        detail = await ctrl.get_event_detail(ev.id, viewer.id)
+
+    assert len(statements) == 4
+
+    response = EventDetailResponse.model_validate(detail)
+    assert response.event.title == "Detail Event"
+    assert response.attendance_counts == {"going": 2, "interested": 1}
+    assert response.viewer_status == "going"
+    assert response.like_count == 2
+    assert response.liked_by_viewer is False
+    assert [m.url for m in response.media] == ["http://x/a.png"]
+    assert [c.content for c in response.comments] == ["first", "second", "third"]
+    assert [c.author.name for c in response.comments] == ["Detail 1", "Detail 2", "Detail 1"]
+
+    assert await ctrl.get_event_detail(9999, viewer.id) is None
@@ -0,0 +1,117 @@
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.counters import reconcile_event_counters
+from db.db_controller_attendance import AttendanceController
+from db.db_controller_comments import CommentController
+from db.db_controller_events import EventController
+from db.db_controller_likes import LikeController
+from db.db_models import Users, Events, Likes
+from api.api_objects import AttendanceBase, CommentBase, EventResponse, LikeBase
+
+
+async def _seed(db_session: AsyncSession, users: int = 3):
+    people = [
+        Users(name=f"Counter User {i}", email=f"counter{i}@example.com", password_hash="x", role="student")
+        for i in range(users)
+    ]
+    db_session.add_all(people)
+    await db_session.commit()
+    event = Events(
+        title="Counted Event",
+        datetime=datetime.utcnow() + timedelta(days=1),
+        visibility="public",
+        created_by=people[0].id,
+    )
+    db_session.add(event)
+    await db_session.commit()
+    return people, event
+
+
+async def _counters(db_session: AsyncSession, event_id: int) -> tuple:
+    result = await db_session.execute(
+        select(Events.like_count, Events.going_count, Events.interested_count, Events.comment_count)
+        .where(Events.id == event_id)
+    )
+    return tuple(result.one())
+
+
+@pytest.mark.asyncio
+async def test_counters_follow_writes(db_session: AsyncSession):
+    """
+    1) Likes, attendance and comments bump the matching counter on events.
+    2) Duplicate likes/attendance do not count twice.
+    3) Removing rows (and removing missing rows) brings the counters back down exactly once.
+    """
+    people, event = await _seed(db_session)
+    likes = LikeController(db_session)
+    attendance = AttendanceController(db_session)
+    comments = CommentController(db_session)
+
+    for user in people:
+        assert await likes.add_like(LikeBase(user_id=user.id, event_id=event.id))
+    assert not await likes.add_like(LikeBase(user_id=people[0].id, event_id=event.id))
+
+    await attendance.add_attendance(AttendanceBase(user_id=people[0].id, event_id=event.id, status="going"))
+    await attendance.add_attendance(AttendanceBase(user_id=people[1].id, event_id=event.id, status="interested"))
+    await attendance.add_attendance(AttendanceBase(user_id=people[2].id, event_id=event.id, status="not going"))
+    await attendance.add_attendance(AttendanceBase(user_id=people[0].id, event_id=event.id, status="interested"))
+
+    first = await comments.add_comment(CommentBase(event_id=event.id, user_id=people[1].id, content="one"))
+    await comments.add_comment(CommentBase(event_id=event.id, user_id=people[2].id, content="two"))
+
+    assert await _counters(db_session, event.id) == (3, 1, 1, 2)
+
+    assert await likes.remove_like(LikeBase(user_id=people[1].id, event_id=event.id))
+    assert not await likes.remove_like(LikeBase(user_id=people[1].id, event_id=event.id))
+    assert await attendance.delete_attendance(people[0].id, event.id)
+    assert await attendance.delete_attendance(people[2].id, event.id)
+    assert not await attendance.delete_attendance(people[2].id, event.id)
+    assert await comments.delete_comment(first)
+    assert not await comments.delete_comment(first)
+
+    assert await _counters(db_session, event.id) == (2, 0, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_counters_exposed_on_event_responses(db_session: AsyncSession):
+    """
+    1) The counters are part of EventResponse for list reads.
+    """
+    people, event = await _seed(db_session, users=2)
+    event_id = event.id
+    for user in people:
+        await LikeController(db_session).add_like(LikeBase(user_id=user.id, event_id=event.id))
+    await CommentController(db_session).add_comment(CommentBase(event_id=event.id, user_id=people[0].id, content="hi"))
+
+    db_session.expire_all()  # a new request would not hold the Event loaded by _seed
+    ctrl = EventController(db_session)
+    events, _ = await ctrl.get_events_page(limit=10)
+    listed = EventResponse.model_validate(next(e for e in events if e.id == event_id))
+    assert (listed.like_count, listed.comment_count, listed.going_count) == (2, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_reconcile_repairs_drift(db_session: AsyncSession):
+    """
+    1) Rows deleted behind the controllers' back leave the counters stale.
+    2) reconcile_event_counters() rewrites them and reports the repaired events.
+    3) A second run finds nothing to repair.
+    """
+    people, event = await _seed(db_session, users=2)
+    for user in people:
+        await LikeController(db_session).add_like(LikeBase(user_id=user.id, event_id=event.id))
+    await AttendanceController(db_session).add_attendance(
+        AttendanceBase(user_id=people[1].id, event_id=event.id, status="going"))
+
+    await db_session.execute(delete(Likes).where(Likes.user_id == people[1].id))
+    await db_session.execute(delete(Users).where(Users.id == people[1].id))  # cascades to attendance
+    await db_session.commit()
+    assert await _counters(db_session, event.id) == (2, 1, 0, 0)
+
+    assert await reconcile_event_counters(db_session) == [event.id]
+    assert await _counters(db_session, event.id) == (1, 0, 0, 0)
+    assert await reconcile_event_counters(db_session) == []
@@ -0,0 +1,118 @@
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import user_auth
+from api.api_objects import EventBase, EventUpdate
+from db.db_controller_events import EventController
+from db.db_controller_user import UserController
+from db.db_models import Users
+
+
+async def _owner(db_session: AsyncSession) -> Users:
+    user = Users(name="Searcher", email="searcher@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    return user
+
+
+async def _add(ctrl: EventController, user: Users, title: str, description: str = None, location: str = None) -> int:
+    return await ctrl.add_event(EventBase(
+        title=title, description=description, location=location,
+        event_datetime=datetime.utcnow() + timedelta(days=1), visibility="public", created_by=user.id,
+    ))
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_and_matches_prefixes(db_session: AsyncSession):
+    """
+    1) Title matches rank above location matches above description matches.
+    2) Every word must match, as a word prefix.
+    3) Operators and quotes typed by the user are just text.
+    4) Edits are searchable right away (the vector is a generated column).
+    """
+    user = await _owner(db_session)
+    ctrl = EventController(db_session)
+    in_description = await _add(ctrl, user, "Evening", description="Jazz koncert on the lawn")
+    in_title = await _add(ctrl, user, "Koncert jazzowy", location="Aula")
+    in_location = await _add(ctrl, user, "Open mic", location="Klub Koncert")
+    await _add(ctrl, user, "Chess club", description="Weekly games")
+
+    found, has_more = await ctrl.search_events("koncert", limit=10)
+    assert [event.id for event, _ in found] == [in_title, in_location, in_description]
+    assert not has_more
+    assert found[0][1] > found[1][1] > found[2][1]
+
+    found, _ = await ctrl.search_events("KONC jazz", limit=10)
+    assert [event.id for event, _ in found] == [in_title, in_description]
+
+    assert (await ctrl.search_events("koncert & !jazz | ' (", limit=10))[0] != []
+    assert await ctrl.search_events("&& !! ''", limit=10) == ([], False)
+    assert await ctrl.search_events("opera", limit=10) == ([], False)
+
+    await ctrl.update_event(in_location, EventUpdate(title="Opera night"))
+    found, _ = await ctrl.search_events("opera", limit=10)
+    assert [event.id for event, _ in found] == [in_location]
+
+
+@pytest.mark.asyncio
+async def test_search_pages_with_equal_ranks(db_session: AsyncSession):
+    """
+    Following (rank, id) cursors visits every match once, also across ties.
+    """
+    user = await _owner(db_session)
+    ctrl = EventController(db_session)
+    created = [await _add(ctrl, user, f"Workshop {i}") for i in range(5)]
+    best = await _add(ctrl, user, "Workshop workshop")
+
+    seen, after = [], None
+    while True:
+        page, has_more = await ctrl.search_events("workshop", limit=2, after=after)
+        seen += [event.id for event, _ in page]
+        if not has_more:
+            break
+        last, rank = page[-1]
+        after = (rank, last.id)
+    assert seen == [best] + created
+
+
+@pytest.mark.asyncio
+async def test_search_endpoint(client, db_session: AsyncSession):
+    """
+    GET /events/search returns ranked events and a cursor header while more exist.
+    """
+    user = await _owner(db_session)
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+    ctrl = EventController(db_session)
+    for i in range(3):
+        await _add(ctrl, user, f"Hackathon {i}", location="D20")
+
+    first = await client.get("/events/search", params={"q": "hackathon", "limit": 2}, headers=headers)
+    assert first.status_code == 200
+    assert [e["title"] for e in first.json()] == ["Hackathon 0", "Hackathon 1"]
+    cursor = first.headers["X-Next-Cursor"]
+
+    second = await client.get("/events/search", params={"q": "hackathon", "limit": 2, "cursor": cursor}, headers=headers)
+    assert [e["title"] for e in second.json()] == ["Hackathon 2"]
+    assert "X-Next-Cursor" not in second.headers
+
+    assert (await client.get("/events/search", params={"q": "x", "cursor": "bad"}, headers=headers)).status_code == 400
+    assert (await client.get("/events/search", headers=headers)).status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_user_search_escapes_wildcards(db_session: AsyncSession):
+    """
+    % and _ in a name/email filter match themselves, not any text.
+    """
+    db_session.add_all([
+        Users(name="Anna_Nowak", email="anna@example.com", password_hash="x", role="student"),
+        Users(name="Annabel", email="annabel@example.com", password_hash="x", role="student"),
+    ])
+    await db_session.commit()
+    users = UserController(db_session)
+
+    assert [u.name for u in await users.get_users(name="anna_")] == ["Anna_Nowak"]
+    assert await users.get_users(name="%") == []
+    assert sorted(u.name for u in await users.get_users(email="ANNA")) == ["Anna_Nowak", "Annabel"]
@@ -0,0 +1,195 @@
+import random
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import user_auth
+from api.api_objects import AttendanceBase, EventBase, EventUpdate, Friendship, LikeBase
+from db import feed
+from db.db_controller_attendance import AttendanceController
+from db.db_controller_events import EventController
+from db.db_controller_feed import FeedController
+from db.db_controller_friends import FriendshipController
+from db.db_controller_likes import LikeController
+from db.db_models import FeedItems, Users
+
+
+async def _users(db_session: AsyncSession, n: int) -> list[Users]:
+    users = [Users(name=f"User {i}", email=f"feed{i}@example.com", password_hash="x", role="student") for i in range(n)]
+    db_session.add_all(users)
+    await db_session.commit()
+    return users
+
+
+async def _user_ids(db_session: AsyncSession, n: int) -> list[int]:
+    # plain ids, the tests expire the session to see what the statements wrote
+    return [user.id for user in await _users(db_session, n)]
+
+
+async def _event(db_session: AsyncSession, title: str, user_id: int, days: float = 1, visibility: str = "public") -> int:
+    return await EventController(db_session).add_event(EventBase(
+        title=title, location=None, event_datetime=datetime.now() + timedelta(days=days),
+        visibility=visibility, created_by=user_id,
+    ))
+
+
+async def _befriend(db_session: AsyncSession, user_id: int, friend_id: int, status: str = "accepted") -> None:
+    assert await FriendshipController(db_session).send_friend_request(Friendship(user_id=user_id, friend_id=friend_id, status=status))
+
+
+async def _feed(db_session: AsyncSession) -> dict:
+    # {(user_id, event_id): (going, interested, liked, created, popularity, score)}
+    rows = (await db_session.execute(select(FeedItems))).scalars().all()
+    return {
+        (r.user_id, r.event_id): (r.friends_going, r.friends_interested, r.friends_liked, r.friends_created, r.popularity, round(r.score, 6))
+        for r in rows
+    }
+
+
+@pytest.mark.asyncio
+async def test_feed_follows_friend_activity(db_session: AsyncSession):
+    """
+    1) Likes, attendance and new events reach the feeds of the actor's friends only.
+    2) Private, past and own events never show up.
+    3) Undoing the activity takes the row out again.
+    """
+    me, friend, stranger, host = await _user_ids(db_session, 4)
+    await _befriend(db_session, me, friend)
+    await _befriend(db_session, stranger, host, status="pending")
+    party = await _event(db_session, "Party", host)
+    private = await _event(db_session, "Private", host, visibility="private")
+    past = await _event(db_session, "Past", host, days=-1)
+    mine = await _event(db_session, "Mine", me)
+
+    for event_id in (party, private, past, mine):
+        assert await LikeController(db_session).add_like(LikeBase(user_id=friend, event_id=event_id))
+    await LikeController(db_session).add_like(LikeBase(user_id=stranger, event_id=party))
+    await AttendanceController(db_session).add_attendance(AttendanceBase(user_id=friend, event_id=party, status="going"))
+
+    db_session.expire_all()
+    rows = await _feed(db_session)
+    # party: going + liked by friend, popularity floor(log2(1 + 2 likes + 1 going)) = 2
+    assert {key for key in rows if key[0] == me} == {(me, party)}
+    assert rows[me, party][:5] == (1, 0, 1, 0, 2)
+    # the friend sees "mine" as created by me; their own like does not count
+    assert set(rows) == {(me, party), (friend, mine)}
+    assert rows[friend, mine][:4] == (0, 0, 0, 1)
+
+    await LikeController(db_session).remove_like(LikeBase(user_id=friend, event_id=party))
+    db_session.expire_all()
+    assert (await _feed(db_session))[me, party][:5] == (1, 0, 0, 0, 1)
+    await AttendanceController(db_session).delete_attendance(friend, party)
+    db_session.expire_all()
+    assert (me, party) not in await _feed(db_session)
+
+
+@pytest.mark.asyncio
+async def test_friendship_changes_move_activity(db_session: AsyncSession):
+    """
+    1) Accepting a request brings each friend's activity into the other's feed.
+    2) Unfriending (status change or delete) removes it, other friends' activity stays.
+    """
+    me, friend, other, host = await _user_ids(db_session, 4)
+    party = await _event(db_session, "Party", host)
+    await LikeController(db_session).add_like(LikeBase(user_id=friend, event_id=party))
+    await LikeController(db_session).add_like(LikeBase(user_id=other, event_id=party))
+    await _befriend(db_session, me, other)
+    await _befriend(db_session, me, friend, status="pending")
+    db_session.expire_all()
+    assert (await _feed(db_session))[me, party][2] == 1
+
+    friends = FriendshipController(db_session)
+    assert await friends.update_friend_status(me, friend, "accepted")
+    db_session.expire_all()
+    assert (await _feed(db_session))[me, party][2] == 2
+
+    assert await friends.update_friend_status(me, friend, "blocked")
+    db_session.expire_all()
+    assert (await _feed(db_session))[me, party][2] == 1
+
+    assert await friends.delete_friend(me, other)
+    db_session.expire_all()
+    assert await _feed(db_session) == {}
+
+
+@pytest.mark.asyncio
+async def test_incremental_feed_matches_rebuild(db_session: AsyncSession):
+    """
+    After a random mix of likes, attendance, friendships and event changes the
+    incrementally maintained rows equal a rebuild from the source tables,
+    including popularity buckets of events crossing powers of two.
+    """
+    rnd = random.Random(17)
+    users = await _user_ids(db_session, 8)
+    events = [await _event(db_session, f"Event {i}", users[i % 8]) for i in range(5)]
+    likes, attendance = LikeController(db_session), AttendanceController(db_session)
+    friends = FriendshipController(db_session)
+    for _ in range(120):
+        a, b = rnd.sample(users, 2)
+        event_id = rnd.choice(events)
+        op = rnd.random()
+        if op < 0.3:
+            await likes.add_like(LikeBase(user_id=a, event_id=event_id))
+        elif op < 0.4:
+            await likes.remove_like(LikeBase(user_id=a, event_id=event_id))
+        elif op < 0.6:
+            status = rnd.choice(["going", "interested", "not going"])
+            await attendance.add_attendance(AttendanceBase(user_id=a, event_id=event_id, status=status))
+        elif op < 0.7:
+            await attendance.delete_attendance(a, event_id)
+        elif op < 0.8:
+            await friends.send_friend_request(Friendship(user_id=a, friend_id=b, status=rnd.choice(["pending", "accepted"])))
+        elif op < 0.9:
+            await friends.update_friend_status(a, b, rnd.choice(["accepted", "rejected"]))
+        elif op < 0.95:
+            await friends.delete_friend(a, b)
+        else:
+            events.append(await _event(db_session, f"Event {len(events)}", a))
+
+    db_session.expire_all()
+    incremental = await _feed(db_session)
+    assert len(incremental) > 10
+    await feed.rebuild(db_session)
+    await db_session.commit()
+    db_session.expire_all()
+    assert await _feed(db_session) == incremental
+
+    # moving an event into the past or making it private drops it everywhere
+    await EventController(db_session).update_event(events[0], EventUpdate(visibility="private"))
+    db_session.expire_all()
+    assert all(event_id != events[0] for _, event_id in await _feed(db_session))
+
+
+@pytest.mark.asyncio
+async def test_feed_endpoint_pages_by_score(client, db_session: AsyncSession):
+    """
+    GET /feed returns the current user's rows best first and pages with X-Next-Cursor.
+    """
+    me, going, liking, host = await _users(db_session, 4)
+    await _befriend(db_session, me.id, going.id)
+    await _befriend(db_session, liking.id, me.id)
+    liked = await _event(db_session, "Liked", host.id)
+    attended = await _event(db_session, "Attended", host.id)
+    both = await _event(db_session, "Both", host.id)
+    await AttendanceController(db_session).add_attendance(AttendanceBase(user_id=going.id, event_id=attended, status="going"))
+    await AttendanceController(db_session).add_attendance(AttendanceBase(user_id=going.id, event_id=both, status="going"))
+    await LikeController(db_session).add_like(LikeBase(user_id=liking.id, event_id=liked))
+    await LikeController(db_session).add_like(LikeBase(user_id=liking.id, event_id=both))
+
+    page = await FeedController(db_session).get_feed_page(me.id, limit=10)
+    assert [event.id for event, _ in page[0]] == [both, attended, liked]
+
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(me))}
+    response = await client.get("/feed", params={"limit": 2}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert [e["title"] for e in body] == ["Both", "Attended"]
+    assert body[0]["friends_going"] == 1 and body[0]["friends_liked"] == 1 and body[0]["score"] > body[1]["score"]
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = await client.get("/feed", params={"limit": 2, "cursor": cursor}, headers=headers)
+    assert [e["title"] for e in response.json()] == ["Liked"]
+    assert "X-Next-Cursor" not in response.headers
+    assert (await client.get("/feed", params={"cursor": "nope"}, headers=headers)).status_code == 400
@@ -229,3 +229,27 @@ async def test_delete_nonexistent_friend_returns_false(db_session: AsyncSession)
     ctrl = FriendshipController(db_session)
     result = await ctrl.delete_friend(12345, 67890)
     assert result is False
+
+
+@pytest.mark.asyncio
+async def test_send_friend_requests_to_several_users(db_session: AsyncSession):
+    """
+    A pending request to one user must not block requests to other users;
+    only the same pair (in either direction) is rejected.
+    """
+    users = [
+        Users(name=f"Multi {i}", email=f"multi{i}@example.com", password_hash="irrelevant", role="student")
+        for i in range(3)
+    ]
+    db_session.add_all(users)
+    await db_session.commit()
+    sender, first, second = users
+
+    ctrl = FriendshipController(db_session)
+    assert await ctrl.send_friend_request(Friendship(user_id=sender.id, friend_id=first.id, status="pending")) is True
+    assert await ctrl.send_friend_request(Friendship(user_id=sender.id, friend_id=second.id, status="pending")) is True
+    assert await ctrl.send_friend_request(Friendship(user_id=first.id, friend_id=second.id, status="pending")) is True
+    assert await ctrl.send_friend_request(Friendship(user_id=second.id, friend_id=sender.id, status="pending")) is False
+
+    result = await db_session.execute(select(Friends))
+    assert len(result.scalars().all()) == 3
@@ -0,0 +1,185 @@
+import asyncio
+import math
+import random
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import geohash, user_auth
+from api.api_objects import EventBase, EventUpdate
+from api.geocoding import Geocoder, OfflineGeocoder
+from db.db_controller_events import EventController
+from db.db_models import Users, Events
+from db.event_locations import geocode_events
+
+PLAC_GRUNWALDZKI = (51.1116, 17.0604)
+
+
+def _haversine_km(a, b) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * geohash.EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+async def _owner(db_session: AsyncSession) -> Users:
+    user = Users(name="Mapper", email="mapper@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    return user
+
+
+def _event(title: str, location, user: Users) -> EventBase:
+    return EventBase(
+        title=title, location=location, event_datetime=datetime.utcnow() + timedelta(days=1),
+        visibility="public", created_by=user.id,
+    )
+
+
+def test_geohash_encode_and_cover():
+    """
+    1) encode matches the reference value.
+    2) Every point inside the circle lies in one of the covering cells.
+    3) Circles larger than any cell need no filter.
+    """
+    assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+    rnd = random.Random(7)
+    for center, radius in [(PLAC_GRUNWALDZKI, 1.0), (PLAC_GRUNWALDZKI, 20.0), ((0.0, 179.99), 5.0), ((-33.9, 18.4), 0.2)]:
+        cells = geohash.covering_cells(*center, radius)
+        assert cells
+        for _ in range(500):
+            # random point at most `radius` km away
+            bearing, dist = rnd.uniform(0, 2 * math.pi), radius * math.sqrt(rnd.random())
+            lat = center[0] + math.degrees(dist * math.cos(bearing) / geohash.EARTH_RADIUS_KM)
+            lon = center[1] + math.degrees(dist * math.sin(bearing) / geohash.EARTH_RADIUS_KM / math.cos(math.radians(lat)))
+            lon = (lon + 180) % 360 - 180
+            if _haversine_km(center, (lat, lon)) > radius:
+                continue
+            hashed = geohash.encode(lat, lon)
+            assert any(hashed.startswith(cell) for cell in cells), (center, radius, lat, lon)
+
+    assert geohash.covering_cells(0.0, 0.0, 6000) == []
+
+
+@pytest.mark.asyncio
+async def test_geocoder_caches_and_never_raises():
+    """
+    1) The offline geocoder resolves "lat, lon" strings and known campus places.
+    2) Results, including misses, are cached per address.
+    3) A failing or slow provider leaves the event without coordinates instead of failing the save;
+       such lookups are not cached, the next save (or the backfill job) tries again.
+    """
+    offline = OfflineGeocoder()
+    assert await offline.geocode("51.1, -17.25") == (51.1, -17.25)
+    assert await offline.geocode("Plac Grunwaldzki, Wrocław") == PLAC_GRUNWALDZKI
+    assert await offline.geocode("Somewhere else") is None
+
+    class CountingProvider:
+        calls = 0
+
+        async def geocode(self, address):
+            self.calls += 1
+            return (1.0, 2.0) if address == "known" else None
+
+    provider = CountingProvider()
+    geocoder = Geocoder(provider)
+    assert await geocoder.geocode("known") == (1.0, 2.0)
+    assert await geocoder.geocode("Known ") == (1.0, 2.0)
+    assert await geocoder.geocode("unknown") is None
+    assert await geocoder.geocode("unknown") is None
+    assert await geocoder.geocode("") is None
+    assert provider.calls == 2
+
+    class BrokenProvider:
+        async def geocode(self, address):
+            raise OSError("no network")
+
+    assert await Geocoder(BrokenProvider()).geocode("anything") is None
+
+    class SlowProvider(CountingProvider):
+        delay = 5.0
+
+        async def geocode(self, address):
+            await asyncio.sleep(self.delay)
+            return await super().geocode(address)
+
+    slow = SlowProvider()
+    geocoder = Geocoder(slow, timeout=0.05)
+    assert await geocoder.geocode("known") is None
+    slow.delay = 0
+    assert await geocoder.geocode("known") == (1.0, 2.0)
+    assert slow.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_nearby_events_sorted_by_distance(db_session: AsyncSession):
+    """
+    1) Events are geocoded once, when they are saved.
+    2) get_nearby_events returns only events inside the radius, nearest first.
+    3) Changing the location moves the event.
+    """
+    user = await _owner(db_session)
+    ctrl = EventController(db_session)
+    near = await ctrl.add_event(_event("Lecture", "Politechnika Wrocławska", user))
+    here = await ctrl.add_event(_event("Meetup", "Plac Grunwaldzki", user))
+    far = await ctrl.add_event(_event("Concert", "Dworzec Główny", user))
+    await ctrl.add_event(_event("Online", "Zoom", user))
+    await ctrl.add_event(_event("Somewhere", None, user))
+
+    stored = await db_session.get(Events, here)
+    assert (stored.latitude, stored.longitude) == PLAC_GRUNWALDZKI
+    assert stored.geohash == geohash.encode(*PLAC_GRUNWALDZKI)
+
+    nearby = await ctrl.get_nearby_events(*PLAC_GRUNWALDZKI, radius_km=1.0, limit=10)
+    assert [event.id for event, _ in nearby] == [here, near]
+    assert nearby[0][1] == pytest.approx(0, abs=1e-6)
+    assert nearby[1][1] == pytest.approx(_haversine_km(PLAC_GRUNWALDZKI, (51.1075, 17.0625)), rel=1e-6)
+
+    everything = await ctrl.get_nearby_events(*PLAC_GRUNWALDZKI, radius_km=5.0, limit=10)
+    assert [event.id for event, _ in everything] == [here, near, far]
+
+    await ctrl.update_event(far, EventUpdate(location="Pasaż Grunwaldzki"))
+    db_session.expire_all()
+    nearby = await ctrl.get_nearby_events(*PLAC_GRUNWALDZKI, radius_km=1.0, limit=2)
+    assert [event.id for event, _ in nearby] == [here, far]
+
+
+@pytest.mark.asyncio
+async def test_geocode_events_backfills_missing_coordinates(db_session: AsyncSession):
+    """
+    Events saved without coordinates (e.g. before the columns existed) get them from the job.
+    """
+    user = await _owner(db_session)
+    event_id = await EventController(db_session).add_event(_event("Old", "Hala Stulecia", user))
+    await db_session.execute(update(Events).values(latitude=None, longitude=None, geohash=None))
+    await db_session.commit()
+
+    assert await geocode_events(db_session) == [event_id]
+    assert await geocode_events(db_session) == []
+    row = (await db_session.execute(select(Events.latitude, Events.longitude).where(Events.id == event_id))).one()
+    assert tuple(row) == (51.1069, 17.0773)
+
+
+@pytest.mark.asyncio
+async def test_nearby_endpoint(client, db_session: AsyncSession):
+    """
+    GET /events/nearby returns events with coordinates and distance; out of range parameters get 422.
+    """
+    user = await _owner(db_session)
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+    await EventController(db_session).add_event(_event("Lecture", "Politechnika Wrocławska", user))
+    await EventController(db_session).add_event(_event("Market", "Rynek", user))
+
+    response = await client.get("/events/nearby", params={"lat": 51.1116, "lon": 17.0604, "radius": 1}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert [e["title"] for e in body] == ["Lecture"]
+    assert body[0]["latitude"] == 51.1075 and body[0]["distance_km"] > 0
+
+    response = await client.get("/events/nearby", params={"lat": 51.1116, "lon": 17.0604, "radius": 5}, headers=headers)
+    assert [e["title"] for e in response.json()] == ["Lecture", "Market"]
+
+    assert (await client.get("/events/nearby", params={"lat": 95, "lon": 17}, headers=headers)).status_code == 422
+    assert (await client.get("/events/nearby", params={"lat": 51, "lon": 17, "radius": 500}, headers=headers)).status_code == 422
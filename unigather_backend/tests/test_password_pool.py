@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+import pytest
+
+from api.password_pool import PasswordWorkerPool, PasswordPoolBusy
+
+
+@pytest.mark.asyncio
+async def test_pool_limits_concurrency_and_reports_queue():
+    """
+    With 2 workers and 5 jobs, at most 2 run at once and the rest wait in line.
+    """
+    pool = PasswordWorkerPool(max_workers=2)
+    release = threading.Event()
+    running = []
+    peak = []
+
+    def job(n):
+        running.append(n)
+        peak.append(len(running))
+        release.wait(timeout=5)
+        running.remove(n)
+        return n * 2
+
+    tasks = [asyncio.create_task(pool.run(job, n)) for n in range(5)]
+    await asyncio.sleep(0.05)
+    assert pool.in_flight == 2
+    assert pool.waiting == 3
+
+    release.set()
+    results = await asyncio.gather(*tasks)
+    assert results == [0, 2, 4, 6, 8]
+    assert max(peak) == 2
+    assert pool.stats()["completed"] == 5
+    assert pool.stats()["max_waiting"] == 3
+
+
+@pytest.mark.asyncio
+async def test_pool_rejects_when_queue_is_full():
+    pool = PasswordWorkerPool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    first = asyncio.create_task(pool.run(release.wait, 5))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(pool.run(release.wait, 5))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(PasswordPoolBusy):
+        await pool.run(release.wait, 5)
+    assert pool.rejected == 1
+
+    release.set()
+    await asyncio.gather(first, second)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_keeps_the_slot_until_the_job_finishes():
+    """
+    1) Cancelling a caller whose job is running leaves the thread busy, so its slot stays taken.
+    2) The slot is freed once the thread is done, and the next job runs.
+    """
+    pool = PasswordWorkerPool(max_workers=1)
+    release = threading.Event()
+
+    first = asyncio.create_task(pool.run(release.wait, 5))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(pool.run(lambda: "second"))
+    await asyncio.sleep(0.01)
+    assert pool.in_flight == 1 and pool.waiting == 1
+
+    release.set()
+    assert await second == "second"
+    assert first.cancelled() and pool.completed == 2
+
+
+def test_pool_created_outside_a_loop_runs_on_any_loop():
+    """The semaphore is made on the loop that uses it, so one pool serves one loop after another."""
+    pool = PasswordWorkerPool(max_workers=1)
+    assert asyncio.run(pool.run(len, "abc")) == 3
+    assert asyncio.run(pool.run(len, "abcd")) == 4
+
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import api.user_auth as user_auth
+from api.principal_cache import Principal, PrincipalCache
+from api.api_objects import UserCreate, UserUpdate
+from db.db_controller_user import UserController
+
+
+def test_cache_ttl_and_lru_eviction():
+    cache = PrincipalCache(max_size=2, ttl=0.05)
+    cache.set(Principal(id=1, role="student"))
+    cache.set(Principal(id=2, role="student"))
+    assert cache.get(1).id == 1
+
+    # 2 is now the least recently used entry
+    cache.set(Principal(id=3, role="admin"))
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+
+    time.sleep(0.06)
+    assert cache.get(1) is None
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_hits_db_once(db_session: AsyncSession, count_queries):
+    """
+    1) Create a user and a token for it.
+    2) First get_current_user(...) loads the principal from the DB.
+    3) Second call is served from the principal cache without any SQL.
+    """
+    user_auth.principal_cache.clear()
+    ctrl = UserController(db_session)
+    user_id = await ctrl.add_user(UserCreate(name="Cache", email="cache@example.com", role="student", password="pw"))
+    user = await ctrl.get_user_by_id(user_id)
+    token = user_auth.create_access_token(user_auth.token_claims(user))
+
+    with count_queries() as statements:
+        first = await user_auth.get_current_user(token, db_session)
+        queries_after_first = len(statements)
+        second = await user_auth.get_current_user(token, db_session)
+
+    assert first == second == Principal(id=user_id, role="student", token_version=0)
+    assert queries_after_first == 1
+    assert len(statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_password_change_invalidates_cache_and_old_tokens(db_session: AsyncSession):
+    user_auth.principal_cache.clear()
+
+    ctrl = UserController(db_session)
+    user_id = await ctrl.add_user(UserCreate(name="Rotate", email="rotate@example.com", role="student", password="old"))
+    user = await ctrl.get_user_by_id(user_id)
+    old_token = user_auth.create_access_token(user_auth.token_claims(user))
+
+    await user_auth.get_current_user(old_token, db_session)
+    assert user_auth.principal_cache.get(user_id) is not None
+
+    await ctrl.update_user(user_id, UserUpdate(password="new"))
+    assert user_auth.principal_cache.get(user_id) is None
+
+    with pytest.raises(HTTPException) as exc_info:
+        await user_auth.get_current_user(old_token, db_session)
+    assert exc_info.value.status_code == 401
+
+    user = await ctrl.get_user_by_id(user_id)
+    new_token = user_auth.create_access_token(user_auth.token_claims(user))
+    principal = await user_auth.get_current_user(new_token, db_session)
+    assert principal.token_version == 1
+
+
+@pytest.mark.asyncio
+async def test_tokens_of_unknown_users_or_without_a_version_are_rejected(db_session: AsyncSession):
+    """
+    1) A token of a deleted user, or of an id that never existed, is rejected.
+    2) A token without a version claim cannot be revoked and is rejected too.
+    3) The role comes from the database, not from a claim in the token.
+    """
+    user_auth.principal_cache.clear()
+    ctrl = UserController(db_session)
+    user_id = await ctrl.add_user(UserCreate(name="Gone", email="gone@example.com", role="student", password="pw"))
+    token = user_auth.create_access_token({**user_auth.token_claims(await ctrl.get_user_by_id(user_id)), "role": "admin"})
+    assert await user_auth.get_current_user(token, db_session) == Principal(id=user_id, role="student", token_version=0)
+
+    for claims in ({"sub": user_id}, {"sub": 999999, "ver": 0}):
+        with pytest.raises(HTTPException) as exc_info:
+            await user_auth.get_current_user(user_auth.create_access_token(claims), db_session)
+        assert exc_info.value.status_code == 401
+
+    await ctrl.delete_user(user_id)
+    with pytest.raises(HTTPException) as exc_info:
+        await user_auth.get_current_user(token, db_session)
+    assert exc_info.value.status_code == 401
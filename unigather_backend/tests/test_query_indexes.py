@@ -0,0 +1,188 @@
+import json
+import re
+
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.db_models import Users, Events, Comments, Media
+from db.db_controller_attendance import AttendanceController
+from db.db_controller_comments import CommentController
+from db.db_controller_events import EventController
+from db.db_controller_feed import FeedController
+from db.db_controller_friends import FriendshipController
+from db.db_controller_likes import LikeController
+from db.db_controller_media import MediaController
+from db.db_controller_user import UserController
+from db.migrate import apply_migrations, discover_migrations
+from api.api_objects import AttendanceBase, CommentBase, EventBase, Friendship, LikeBase, MediaBase
+
+
+async def _seed(db_session: AsyncSession):
+    user = Users(name="Index User", email="index@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    await db_session.refresh(user)
+
+    ev = Events(
+        title="Index Event",
+        datetime=datetime.utcnow() + timedelta(days=1),
+        visibility="public",
+        created_by=user.id,
+    )
+    db_session.add(ev)
+    await db_session.commit()
+    await db_session.refresh(ev)
+    return user, ev
+
+
+async def _controller_reads(db_session: AsyncSession, user, ev):
+    """
+    Every lookup path of the db_controller_* modules, as (label, coroutine factory).
+    Unfiltered list queries (get_users/get_events without arguments) read whole tables by design.
+    """
+    attendance = AttendanceController(db_session)
+    comments = CommentController(db_session)
+    events = EventController(db_session)
+    feed = FeedController(db_session)
+    friends = FriendshipController(db_session)
+    likes = LikeController(db_session)
+    media = MediaController(db_session)
+    users = UserController(db_session)
+    return [
+        ("attendance.add_attendance", lambda: attendance.add_attendance(AttendanceBase(user_id=user.id, event_id=ev.id, status="going"))),
+        ("attendance.get_attendance_by_event", lambda: attendance.get_attendance_by_event(ev.id)),
+        ("attendance.get_attendance_version", lambda: attendance.get_attendance_version(ev.id)),
+        ("attendance.get_attendance_by_user", lambda: attendance.get_attendance_by_user(user.id)),
+        ("attendance.delete_attendance", lambda: attendance.delete_attendance(0, ev.id)),
+        ("comments.add_comment", lambda: comments.add_comment(CommentBase(event_id=ev.id, user_id=user.id, content="Indexed"))),
+        ("comments.get_comments_for_event", lambda: comments.get_comments_for_event(ev.id)),
+        ("comments.get_comments_version", lambda: comments.get_comments_version(ev.id)),
+        ("comments.get_comment_by_id", lambda: comments.get_comment_by_id(1)),
+        ("events.add_event", lambda: events.add_event(EventBase(title="Index Event", event_datetime=ev.datetime, visibility="public", created_by=user.id))),
+        ("events.get_event_by_id", lambda: events.get_event_by_id(ev.id)),
+        ("events.get_events(created_by)", lambda: events.get_events(created_by=user.id)),
+        ("events.get_events(visibility)", lambda: events.get_events(visibility="public")),
+        ("events.get_events_page", lambda: events.get_events_page(limit=10)),
+        ("events.get_event_version", lambda: events.get_event_version(ev.id)),
+        ("events.get_events_page_version", lambda: events.get_events_page_version(limit=10)),
+        ("events.get_events_page(upcoming)", lambda: events.get_events_page(limit=10, upcoming=True)),
+        ("events.get_events_page(created_by)", lambda: events.get_events_page(limit=10, created_by=user.id)),
+        ("events.get_events_page(visibility)", lambda: events.get_events_page(limit=10, visibility="public")),
+        ("events.search_events", lambda: events.search_events("index event", limit=10)),
+        ("events.search_events(after)", lambda: events.search_events("index", limit=10, after=(0.1, ev.id))),
+        ("events.get_nearby_events", lambda: events.get_nearby_events(51.1, 17.0, 5.0, limit=10)),
+        ("feed.get_feed_page", lambda: feed.get_feed_page(user.id, limit=10)),
+        ("feed.get_feed_page(after)", lambda: feed.get_feed_page(user.id, limit=10, after=(1.5, ev.id))),
+        ("friends.send_friend_request", lambda: friends.send_friend_request(Friendship(user_id=user.id, friend_id=user.id, status="pending"))),
+        ("friends.get_friends", lambda: friends.get_friends(user.id)),
+        ("friends.update_friend_status", lambda: friends.update_friend_status(user.id, 0, "accepted")),
+        ("friends.delete_friend", lambda: friends.delete_friend(user.id, 0)),
+        ("likes.get_likes_for_user", lambda: likes.get_likes_for_user(user.id)),
+        ("likes.add_like", lambda: likes.add_like(LikeBase(user_id=user.id, event_id=ev.id))),
+        ("likes.add_likes", lambda: likes.add_likes(user.id, [ev.id, 0])),
+        ("likes.remove_like", lambda: likes.remove_like(LikeBase(user_id=user.id, event_id=0))),
+        ("media.add_media", lambda: media.add_media(MediaBase(event_id=ev.id, user_id=user.id, type="image"), "http://x/1.png")),
+        ("media.get_media_for_event", lambda: media.get_media_for_event(ev.id)),
+        ("media.get_media_version", lambda: media.get_media_version(ev.id)),
+        ("media.get_media_for_user", lambda: media.get_media_for_user(user.id)),
+        ("media.get_media_by_id", lambda: media.get_media_by_id(1)),
+        ("users.get_user_by_id", lambda: users.get_user_by_id(user.id)),
+        ("users.login_user", lambda: users.login_user("nobody@example.com", "x")),
+    ]
+
+
+LEADING_COLUMNS_SQL = """
+SELECT c.relname, a.attname
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+"""
+
+
+def _unindexed_scans(node: dict, leading: dict) -> list[str]:
+    """
+    A predicate is served by an index only when the scan seeks on the index's
+    leading column. Seq Scans, and index scans that walk a whole index while
+    filtering (or with a condition on a non-leading column) are reported.
+    """
+    problems = []
+    node_type = node["Node Type"]
+    if node_type == "Seq Scan":
+        problems.append(f"Seq Scan on {node.get('Relation Name')}")
+    elif node_type in ("Index Scan", "Index Only Scan", "Bitmap Index Scan"):
+        index_name = node.get("Index Name")
+        cond = node.get("Index Cond")
+        if cond is None and "Filter" in node:
+            problems.append(f"Full {node_type} of {index_name} filtering {node['Filter']}")
+        elif cond is not None and not re.search(rf"\b{leading[index_name]}\b", cond):
+            problems.append(f"{node_type} of {index_name} without its leading column: {cond}")
+    for child in node.get("Plans", []):
+        problems.extend(_unindexed_scans(child, leading))
+    return problems
+
+
+@pytest.mark.asyncio
+async def test_controller_queries_use_indexes(db_session: AsyncSession):
+    """
+    1) Run every controller read path and capture the SQL it sends.
+    2) EXPLAIN each statement with sequential scans disabled, including the CTE
+       writes (WITH ...) and INSERT ... SELECTs; if no index can serve the predicate
+       the planner still falls back to a Seq Scan.
+    3) Every path sent at least one statement, so no label passes by checking nothing.
+    """
+    user, ev = await _seed(db_session)
+    sync_engine = db_session.bind.sync_engine
+    captured = []
+    current = {"label": None}
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")):
+            captured.append((current["label"], statement, parameters))
+
+    paths = await _controller_reads(db_session, user, ev)
+    event.listen(sync_engine, "before_cursor_execute", _record)
+    try:
+        for label, call in paths:
+            current["label"] = label
+            await call()
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", _record)
+
+    conn = await db_session.connection()
+    raw = (await conn.get_raw_connection()).driver_connection
+    leading = {r[0]: r[1] for r in await raw.fetch(LEADING_COLUMNS_SQL)}
+    await raw.execute("SET enable_seqscan = off")
+    failures = []
+    try:
+        for label, statement, parameters in captured:
+            plan = await raw.fetchval("EXPLAIN (FORMAT JSON) " + statement, *parameters)
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            problems = _unindexed_scans(plan[0]["Plan"], leading)
+            if problems:
+                failures.append(f"{label}: {statement}\n" + "\n".join(problems))
+    finally:
+        await raw.execute("RESET enable_seqscan")
+
+    assert {label for label, _ in paths} == {label for label, _, _ in captured}, "paths without any captured statement"
+    assert not failures, "\n\n".join(failures)
+
+
+@pytest.mark.asyncio
+async def test_migrations_apply_once(db_session: AsyncSession):
+    """
+    Migrations are idempotent against a schema built from the models and are recorded,
+    so a second run applies nothing.
+    """
+    engine = db_session.bind
+    first = await apply_migrations(engine)
+    assert first == [version for version, _ in discover_migrations()]
+
+    second = await apply_migrations(engine)
+    assert second == []
+
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql("DROP TABLE schema_migrations")
@@ -0,0 +1,117 @@
+import logging
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import user_auth
+from api.metrics import MetricsRegistry, QueryMetricsMiddleware
+from db import query_stats
+from db.db_models import Users, Events
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    """Value of one sample in Prometheus text output, 0 when absent."""
+    for line in text.splitlines():
+        if line.startswith(name + "{") and all(f'{k}="{v}"' in line for k, v in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_normalize_merges_in_lists_and_placeholders():
+    sql = "SELECT users.id \nFROM users WHERE users.id IN ($1::INTEGER, $2::INTEGER, $3::INTEGER) AND users.role = $4::VARCHAR"
+    assert query_stats.normalize(sql) == "SELECT users.id FROM users WHERE users.id IN (?, ...) AND users.role = ?"
+    assert query_stats.normalize("SELECT 1 WHERE x IN ($1, $2, $3)") == query_stats.normalize("SELECT 1 WHERE x IN ($7, $8)")
+
+
+@pytest.mark.asyncio
+async def test_metrics_record_statements_per_route(client, db_session: AsyncSession, count_queries):
+    """
+    1) A request's statements and database time are recorded under its route template.
+    2) Each statement is exported by fingerprint, and /health/queries shows its SQL, to admins only.
+    3) Unknown paths are reported as "unmatched".
+    """
+    query_stats.install(db_session.bind)
+    query_stats.install(db_session.bind)  # twice is harmless
+    user = Users(name="Metrics User", email="metrics@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    event = Events(title="Metrics Event", datetime=datetime.utcnow() + timedelta(days=1), created_by=user.id)
+    db_session.add(event)
+    await db_session.commit()
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+    route = {"route": "/events/{event_id}/detail", "method": "GET"}
+
+    before = (await client.get("/metrics")).text
+    with count_queries() as statements:
+        assert (await client.get(f"/events/{event.id}/detail", headers=headers)).status_code == 200
+    after = (await client.get("/metrics")).text
+    assert statements
+
+    assert _sample(after, "unigather_db_statements_per_request_count", **route) == _sample(before, "unigather_db_statements_per_request_count", **route) + 1
+    assert _sample(after, "unigather_db_statements_per_request_sum", **route) - _sample(before, "unigather_db_statements_per_request_sum", **route) == len(statements)
+    assert _sample(after, "unigather_db_time_seconds_sum", **route) > _sample(before, "unigather_db_time_seconds_sum", **route)
+    assert _sample(after, "unigather_http_requests_total", status="200", **route) >= 1
+    assert "# TYPE unigather_http_request_duration_seconds histogram" in after
+
+    assert (await client.get("/health/queries", headers=headers)).status_code == 403
+    admin = Users(name="Metrics Admin", email="metrics-admin@example.com", password_hash="x", role="admin")
+    db_session.add(admin)
+    await db_session.commit()
+    admin_headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(admin))}
+    top = (await client.get("/health/queries", params={"limit": 500}, headers=admin_headers)).json()
+    detail = [s for s in top if s["route"] == route["route"]]
+    assert detail and all(re.fullmatch(r"[0-9a-f]{12}", s["statement"]) for s in detail)
+    assert _sample(after, "unigather_db_statement_runs_total", route=route["route"], statement=detail[0]["statement"]) >= 1
+
+    assert (await client.get("/no/such/path")).status_code == 404
+    text = (await client.get("/metrics")).text
+    assert _sample(text, "unigather_http_requests_total", route="unmatched", method="GET", status="404") >= 1
+
+
+@pytest.mark.asyncio
+async def test_repeated_and_slow_statements_are_flagged(db_session: AsyncSession, monkeypatch, caplog):
+    """
+    1) A request running one statement REPEATED_STATEMENT_THRESHOLD times is counted and logged once per route.
+    2) IN lists of different lengths count as the same statement.
+    3) Statements over SLOW_QUERY_MS are counted per route and logged with their SQL.
+    """
+    query_stats.install(db_session.bind)
+    monkeypatch.setattr(query_stats, "REPEATED_STATEMENT_THRESHOLD", 5)
+    registry = MetricsRegistry()
+    app = FastAPI()
+
+    @app.get("/users/{count}")
+    async def one_query_per_user(count: int):
+        for user_id in range(count):
+            await db_session.execute(select(Users.name).where(Users.id == user_id))
+        await db_session.execute(select(Users.id).where(Users.id.in_([1, 2, 3])))
+        await db_session.execute(select(Users.id).where(Users.id.in_([1, 2])))
+        return {}
+
+    app.add_middleware(QueryMetricsMiddleware, registry=registry)
+    route = {"route": "/users/{count}", "method": "GET"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+        with caplog.at_level(logging.WARNING):
+            await http.get("/users/2")
+            assert registry.repeated.values == {}
+            await http.get("/users/6")
+            await http.get("/users/7")
+        monkeypatch.setattr(query_stats, "SLOW_QUERY_MS", 0)
+        await http.get("/users/1")
+
+    text = registry.render()
+    assert _sample(text, "unigather_db_repeated_statement_requests_total", **route) == 2
+    assert len([r for r in caplog.records if "N+1" in r.getMessage()]) == 1
+    assert "GET /users/6 ran one statement 6 times" in caplog.text
+
+    in_lists = [s for s in registry.top_statements() if "IN (" in s["sql"]]
+    assert len(in_lists) == 1 and in_lists[0]["runs"] == 8
+
+    assert _sample(text, "unigather_db_slow_statements_total", **route) == 3
+    assert _sample(text, "unigather_db_statements_per_request_sum", **route) == 2 + 6 + 7 + 1 + 8
+    assert "Slow statement" in caplog.text and "in GET /users/1: SELECT users.name" in caplog.text
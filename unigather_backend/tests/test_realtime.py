@@ -0,0 +1,266 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import asyncpg
+import httpx
+import pytest
+import pytest_asyncio
+import uvicorn
+from sqlalchemy.ext.asyncio import AsyncSession
+from websockets.asyncio.client import connect
+from websockets.exceptions import InvalidStatus
+
+from api import user_auth
+from api.api_objects import AttendanceBase, CommentBase, EventUpdate, LikeBase
+from api.realtime import RESYNC, BrokerUnavailable, MemoryBroker, PostgresBroker, RealtimeFull, RealtimeHub, RedisBroker, Subscriber, TooManySubscriptions
+from db.db_controller_attendance import AttendanceController
+from db.db_controller_comments import CommentController
+from db.db_controller_events import EventController
+from db.db_controller_likes import LikeController
+from db.db_models import Users, Events
+from conftest import TEST_DATABASE_URL
+
+
+class FakePubSub:
+    """Just enough of Redis PUBLISH / SUBSCRIBE to exercise RedisBroker without a server."""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                count = int((await reader.readuntil(b"\r\n"))[1:-2])
+                args = []
+                for _ in range(count):
+                    size = int((await reader.readuntil(b"\r\n"))[1:-2])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                name = args[0].decode().upper()
+                if name == "SUBSCRIBE":
+                    self.subscribers.setdefault(args[1], []).append(writer)
+                    writer.write(b"*3\r\n$9\r\nsubscribe\r\n$%d\r\n%s\r\n:1\r\n" % (len(args[1]), args[1]))
+                elif name == "PUBLISH":
+                    targets = self.subscribers.get(args[1], [])
+                    for target in targets:
+                        target.write(b"*3\r\n$7\r\nmessage\r\n$%d\r\n%s\r\n$%d\r\n%s\r\n" % (len(args[1]), args[1], len(args[2]), args[2]))
+                    writer.write(b":%d\r\n" % len(targets))
+                else:
+                    writer.write(b"+OK\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+
+async def _event_with_owner(db_session: AsyncSession):
+    user = Users(name="Live", email="live@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    event = Events(title="Live Event", datetime=datetime.utcnow() + timedelta(days=1), visibility="public", created_by=user.id)
+    db_session.add(event)
+    await db_session.commit()
+    return user, event
+
+
+@pytest_asyncio.fixture
+async def live_server(db_session: AsyncSession):
+    """The app on a real port in this event loop, so WebSocket and streaming clients can connect."""
+    from main import app
+    from db.database import get_db
+
+    app.dependency_overrides[get_db] = lambda: db_session
+    user_auth.principal_cache.clear()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    yield server.servers[0].sockets[0].getsockname()[1]
+    server.should_exit = True
+    await task
+    app.dependency_overrides.clear()
+
+
+async def _next(ws) -> dict:
+    return json.loads(await asyncio.wait_for(ws.recv(), 5))
+
+
+def test_slow_subscriber_gets_resync_instead_of_unbounded_queue():
+    """
+    1) Messages queue up to max_bytes.
+    2) The next one replaces the whole queue with a single resync message.
+    """
+    subscriber = Subscriber(max_bytes=100)
+    for i in range(3):
+        subscriber.push(json.dumps({"n": i, "pad": "x" * 10}))
+    assert len(subscriber) == 3 and subscriber.dropped == 0
+
+    for i in range(5):
+        subscriber.push(json.dumps({"n": i, "pad": "x" * 10}))
+    assert subscriber.dropped > 0
+    assert len(subscriber) < 5 and subscriber._queue[0] == RESYNC
+
+
+@pytest.mark.asyncio
+async def test_hub_routes_messages_and_enforces_limits():
+    """
+    1) Only subscribers of the event get its message.
+    2) Subscriptions and connections are capped.
+    """
+    hub = RealtimeHub(MemoryBroker(), max_connections=2, max_subscriptions=2)
+    first, second = await hub.connect(), await hub.connect()
+    with pytest.raises(RealtimeFull):
+        await hub.connect()
+    hub.subscribe(first, [1, 2])
+    hub.subscribe(second, [2])
+    with pytest.raises(TooManySubscriptions):
+        hub.subscribe(first, [3])
+
+    await hub.publish(1, "counts", {"like_count": 1})
+    await hub.publish(2, "event_deleted")
+    assert json.loads(await first.next()) == {"type": "counts", "event_id": 1, "data": {"like_count": 1}}
+    assert json.loads(await first.next())["type"] == "event_deleted"
+    assert json.loads(await second.next())["event_id"] == 2
+    assert len(second) == 0
+
+    hub.disconnect(first)
+    await hub.publish(1, "counts", {})
+    assert hub.stats()["connections"] == 1 and hub.stats()["subscribed_events"] == 1
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_controller_writes_are_pushed_over_websocket(live_server, db_session: AsyncSession):
+    """
+    1) A bad token is refused during the handshake.
+    2) After subscribing, comments, like / attendance counts and event edits arrive in order.
+    3) Updates of other events are not sent.
+    """
+    user, event = await _event_with_owner(db_session)
+    other = Events(title="Other", datetime=event.datetime, visibility="public", created_by=user.id)
+    db_session.add(other)
+    await db_session.commit()
+    token = user_auth.create_access_token(user_auth.token_claims(user))
+
+    with pytest.raises(InvalidStatus):
+        async with connect(f"ws://127.0.0.1:{live_server}/ws?token=nope"):
+            pass
+
+    async with connect(f"ws://127.0.0.1:{live_server}/ws", additional_headers={"Authorization": f"Bearer {token}"}) as ws:
+        await ws.send("not json")
+        assert (await _next(ws))["type"] == "error"
+        await ws.send(json.dumps({"action": "subscribe", "event_ids": [event.id]}))
+        assert await _next(ws) == {"type": "subscribed", "event_ids": [event.id]}
+
+        await LikeController(db_session).add_like(LikeBase(user_id=user.id, event_id=other.id))
+        comment_id = await CommentController(db_session).add_comment(CommentBase(event_id=event.id, user_id=user.id, content="hi"))
+        await LikeController(db_session).add_like(LikeBase(user_id=user.id, event_id=event.id))
+        await AttendanceController(db_session).add_attendance(AttendanceBase(user_id=user.id, event_id=event.id, status="going"))
+        await EventController(db_session).update_event(event.id, EventUpdate(title="Renamed"))
+
+        comment = await _next(ws)
+        assert comment["type"] == "comment" and comment["data"]["id"] == comment_id
+        assert comment["data"]["content"] == "hi" and comment["data"]["comment_count"] == 1
+        assert await _next(ws) == {"type": "counts", "event_id": event.id, "data": {"like_count": 1, "going_count": 0, "interested_count": 0}}
+        assert (await _next(ws))["data"]["going_count"] == 1
+        edited = await _next(ws)
+        assert edited["type"] == "event" and edited["data"]["title"] == "Renamed"
+
+
+@pytest.mark.asyncio
+async def test_sse_stream(live_server, db_session: AsyncSession):
+    """
+    /sse sends the same messages as server-sent events.
+    """
+    user, event = await _event_with_owner(db_session)
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{live_server}", timeout=5) as client:
+        assert (await client.get("/sse", headers=headers)).status_code == 422
+        async with client.stream("GET", "/sse", params={"event_ids": [event.id]}, headers=headers) as response:
+            assert response.headers["content-type"].startswith("text/event-stream")
+            await AttendanceController(db_session).add_attendance(AttendanceBase(user_id=user.id, event_id=event.id, status="interested"))
+            lines = response.aiter_lines()
+            line = await asyncio.wait_for(anext(lines), 5)
+            assert line.startswith("data: ")
+            assert json.loads(line[len("data: "):])["data"]["interested_count"] == 1
+
+
+async def _across_workers(make_broker, oversized: bool) -> None:
+    # two hubs with their own broker connections, as two worker processes would have
+    publisher, listener = RealtimeHub(make_broker()), RealtimeHub(make_broker())
+    subscriber = await listener.connect()
+    listener.subscribe(subscriber, [7])
+    try:
+        await publisher.publish(7, "comment", {"content": "hello"})
+        assert json.loads(await asyncio.wait_for(subscriber.next(), 5))["data"] == {"content": "hello"}
+        if oversized:
+            await publisher.publish(7, "comment", {"content": "x" * 10000})
+            assert json.loads(await asyncio.wait_for(subscriber.next(), 5))["data"] is None
+    finally:
+        await publisher.close()
+        await listener.close()
+
+
+@pytest.mark.asyncio
+async def test_postgres_broker_reaches_other_workers():
+    """
+    1) LISTEN/NOTIFY carries a message to another hub.
+    2) Messages over the NOTIFY limit are sent without their data.
+    """
+    url = TEST_DATABASE_URL.replace("+asyncpg", "")
+    await _across_workers(lambda: PostgresBroker(lambda: asyncpg.connect(url), channel="ug_realtime_test"), oversized=True)
+
+
+@pytest.mark.asyncio
+async def test_redis_broker_reaches_other_workers():
+    """The same over Redis PUBLISH / SUBSCRIBE."""
+    server = FakePubSub()
+    port = await server.start()
+    try:
+        await _across_workers(lambda: RedisBroker(f"redis://127.0.0.1:{port}"), oversized=False)
+    finally:
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_bad_messages_and_broker_failures_do_not_break_the_hub():
+    """
+    1) A malformed message on the channel is dropped; later messages still arrive.
+    2) A broker that cannot start refuses the connection: BrokerUnavailable, WebSocket closed with 1011.
+    """
+    server = FakePubSub()
+    port = await server.start()
+    hub = RealtimeHub(RedisBroker(f"redis://127.0.0.1:{port}"))
+    try:
+        subscriber = await hub.connect()
+        hub.subscribe(subscriber, [7])
+        for payload in ("not json", "[1]", '{"event_id": [7]}', ""):
+            await hub.broker.publish(payload)
+        await hub.publish(7, "comment", {"content": "after"})
+        assert json.loads(await asyncio.wait_for(subscriber.next(), 5))["data"] == {"content": "after"}
+        assert hub.stats()["errors"] == 4
+    finally:
+        await hub.close()
+        await server.stop()
+
+    class ClosedWebSocket:
+        code = None
+
+        async def close(self, code):
+            self.code = code
+
+    hub = RealtimeHub(RedisBroker(f"redis://127.0.0.1:{port}"))
+    with pytest.raises(BrokerUnavailable):
+        await hub.connect()
+    websocket = ClosedWebSocket()
+    await hub.serve_websocket(websocket)
+    assert websocket.code == 1011 and hub.stats()["connections"] == 0
+    await hub.close()
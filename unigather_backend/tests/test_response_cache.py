@@ -0,0 +1,237 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import user_auth
+from api.api_objects import CommentBase, LikeBase
+from api.response_cache import CacheUnavailable, MemoryCacheBackend, RedisCacheBackend, ResponseCache, response_cache
+from db.db_controller_comments import CommentController
+from db.db_controller_likes import LikeController
+from db.db_models import Users, Events
+
+
+class FakeRedis:
+    """
+    Just enough of the Redis protocol (GET, SET PX, AUTH, SELECT) to exercise
+    RedisCacheBackend without a server.
+    """
+
+    def __init__(self, password=None):
+        self.data = {}
+        self.commands = []
+        self.server = None
+        self.password = password
+        # the next GET is answered with this instead of the stored value
+        self.garbage = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                count = int((await reader.readuntil(b"\r\n"))[1:-2])
+                args = []
+                for _ in range(count):
+                    size = int((await reader.readuntil(b"\r\n"))[1:-2])
+                    args.append((await reader.readexactly(size + 2))[:-2])
+                self.commands.append(args[0].decode())
+                writer.write(self._execute(args))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    def _execute(self, args) -> bytes:
+        name = args[0].decode().upper()
+        if name == "GET":
+            if self.garbage is not None:
+                reply, self.garbage = self.garbage, None
+                return reply
+            entry = self.data.get(args[1])
+            if entry is None or entry[0] < time.monotonic():
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(entry[1]), entry[1])
+        if name == "SET":
+            self.data[args[1]] = (time.monotonic() + int(args[4]) / 1000, args[2])
+            return b"+OK\r\n"
+        if name == "AUTH" and args[1].decode() != self.password:
+            return b"-WRONGPASS invalid password\r\n"
+        if name in ("AUTH", "SELECT"):
+            return b"+OK\r\n"
+        return b"-ERR unknown command\r\n"
+
+
+@pytest_asyncio.fixture
+async def fake_redis():
+    server = FakeRedis()
+    port = await server.start()
+    yield server, port
+    await server.stop()
+
+
+def _loader(calls: list, value):
+    async def load(headers: dict):
+        calls.append(1)
+        headers["X-Next-Cursor"] = "abc"
+        return value
+    return load
+
+
+async def _exercise(cache: ResponseCache):
+    calls = []
+    first = await cache.serve("events", "events", "limit=1", _loader(calls, [{"id": 1}]))
+    second = await cache.serve("events", "events", "limit=1", _loader(calls, [{"id": 2}]))
+    other = await cache.serve("events", "events", "limit=2", _loader(calls, [{"id": 3}]))
+    assert len(calls) == 2
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+    assert second.body == first.body == b'[{"id":1}]'
+    assert second.headers["X-Next-Cursor"] == "abc"
+
+    await cache.invalidate("events")
+    again = await cache.serve("events", "events", "limit=2", _loader(calls, [{"id": 4}]))
+    assert again.headers["X-Cache"] == "MISS" and again.body == b'[{"id":4}]'
+    assert other.body == b'[{"id":3}]'
+    assert (cache.hits, cache.misses) == (1, 3)
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_caches_and_invalidates_scope():
+    """
+    1) A repeated request is served from the cache with its headers.
+    2) Invalidating a scope drops every variant cached under it.
+    """
+    await _exercise(ResponseCache(MemoryCacheBackend(), {"events": 30}))
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_against_fake_server(fake_redis):
+    """
+    1) The same flow works over the Redis protocol.
+    2) Entries are written with an expiry (SET ... PX).
+    """
+    server, port = fake_redis
+    backend = RedisCacheBackend(f"redis://127.0.0.1:{port}/1")
+    try:
+        await _exercise(ResponseCache(backend, {"events": 30}))
+    finally:
+        await backend.close()
+    assert {"SELECT", "GET", "SET"} <= set(server.commands)
+
+
+@pytest.mark.asyncio
+async def test_unreachable_redis_falls_back_to_database(fake_redis):
+    """
+    1) With the cache server gone every request is a miss served by the loader.
+    2) Failures are counted instead of raised.
+    """
+    server, port = fake_redis
+    await server.stop()
+    cache = ResponseCache(RedisCacheBackend(f"redis://127.0.0.1:{port}"), {"events": 30})
+    calls = []
+    for _ in range(2):
+        response = await cache.serve("events", "events", "", _loader(calls, []))
+        assert response.status_code == 200
+    await cache.invalidate("events")
+    assert len(calls) == 2
+    assert cache.errors == 3  # two lookups and the invalidation
+
+
+@pytest.mark.asyncio
+async def test_redis_handshake_and_reply_failures_drop_the_connection(fake_redis):
+    """
+    1) A rejected AUTH does not leave the unauthenticated connection in place.
+    2) A malformed reply is a cache failure (not a ValueError in the request) and drops the connection.
+    """
+    server, port = fake_redis
+    backend = RedisCacheBackend(f"redis://:wrong@127.0.0.1:{port}/1")
+    for _ in range(2):
+        with pytest.raises(CacheUnavailable):
+            await backend.get("k")
+        assert backend._writer is None
+    assert server.commands == ["AUTH", "AUTH"]
+
+    server.password = "wrong"
+    await backend.set("k", b"v", 30)
+    server.garbage = b"$not-a-length\r\n"
+    with pytest.raises(CacheUnavailable):
+        await backend.get("k")
+    assert backend._writer is None
+    assert await backend.get("k") == b"v"
+    await backend.close()
+
+
+@pytest.mark.asyncio
+async def test_zero_ttl_disables_route():
+    """
+    A route with TTL 0 always calls the loader and never touches the backend.
+    """
+    backend = MemoryCacheBackend()
+    cache = ResponseCache(backend, {"media": 0})
+    calls = []
+    for _ in range(2):
+        await cache.serve("media", "media:1", "", _loader(calls, []))
+    assert len(calls) == 2 and len(backend) == 0
+
+
+@pytest.mark.asyncio
+async def test_comment_write_invalidates_cached_route(client, db_session: AsyncSession):
+    """
+    1) GET /comments/{event_id} is cached after the first call.
+    2) Adding a comment through the controller invalidates it, the next GET sees the comment.
+    """
+    user = Users(name="Cache User", email="cache@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    event = Events(title="Cached Event", datetime=datetime.utcnow() + timedelta(days=1), created_by=user.id)
+    db_session.add(event)
+    await db_session.commit()
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+
+    hits = response_cache.hits
+    first = await client.get(f"/comments/{event.id}", headers=headers)
+    second = await client.get(f"/comments/{event.id}", headers=headers)
+    assert first.json() == second.json() == []
+    assert (first.headers["X-Cache"], second.headers["X-Cache"]) == ("MISS", "HIT")
+
+    await CommentController(db_session).add_comment(CommentBase(event_id=event.id, user_id=user.id, content="new"))
+
+    third = await client.get(f"/comments/{event.id}", headers=headers)
+    assert third.headers["X-Cache"] == "MISS"
+    assert [c["content"] for c in third.json()] == ["new"]
+    assert response_cache.hits == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_like_invalidates_only_its_event(client, db_session: AsyncSession):
+    """
+    1) GET /events and GET /events/{id} are cached after the first call.
+    2) A like invalidates the event, the next GET /events/{id} is a miss showing the new like_count.
+    3) The GET /events pages stay cached until their TTL runs out.
+    """
+    user = Users(name="Liker", email="liker@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    event = Events(title="Liked", datetime=datetime.utcnow() + timedelta(days=1), created_by=user.id)
+    db_session.add(event)
+    await db_session.commit()
+    event_id = event.id
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+
+    for path in ("/events", f"/events/{event_id}"):
+        assert (await client.get(path, headers=headers)).headers["X-Cache"] == "MISS"
+        assert (await client.get(path, headers=headers)).headers["X-Cache"] == "HIT"
+    await LikeController(db_session).add_like(LikeBase(user_id=user.id, event_id=event_id))
+    db_session.expire_all()
+    detail = await client.get(f"/events/{event_id}", headers=headers)
+    assert detail.headers["X-Cache"] == "MISS" and detail.json()["like_count"] == 1
+    listed = await client.get("/events", headers=headers)
+    assert listed.headers["X-Cache"] == "HIT" and listed.json()[0]["like_count"] == 0
@@ -0,0 +1,149 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import orjson
+import pytest
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import user_auth
+from api.api_objects import CommentResponse, EventResponse, MediaResponse, PlainCommentResponse
+from api.serialization import serializer
+from db.db_controller_events import EventController
+from db.db_controller_user import UserController
+from db.db_models import Comments, Events, Media, Users
+
+
+def test_serializer_matches_response_models():
+    """
+    1) An ORM row is written with exactly the fields of the response model, as pydantic would write them.
+    2) Nested response models (a comment's author) are written the same way, from their validation alias.
+    3) Lists, None and dicts (error bodies) are handled; types orjson lacks go through jsonable_encoder.
+    """
+    now = datetime(2026, 3, 1, 18, 30, 0, 123456)
+    event = Events(id=7, title="Gala", description=None, location="Aula", datetime=now, visibility="public", created_by=1,
+                   created_at=now, like_count=2, going_count=1, interested_count=0, comment_count=3,
+                   updated_at=now, latitude=51.1, longitude=17.03, geohash="u3h4")
+    expected = EventResponse.model_validate(event).model_dump(mode="json")
+    assert orjson.loads(serializer(EventResponse).dumps(event)) == expected
+    assert orjson.loads(serializer(EventResponse).dumps([event, event])) == [expected, expected]
+    assert "geohash" not in expected and "updated_at" not in expected
+
+    media = Media(id=3, event_id=7, user_id=1, type="image", url="/m/a.jpg", uploaded_at=now, variants={"thumb": "/m/t.jpg"}, status="ready")
+    assert orjson.loads(serializer(MediaResponse).dumps([media])) == [MediaResponse.model_validate(media).model_dump(mode="json")]
+
+    author = Users(id=1, name="Ala", email="ala@example.com", role="student")
+    comment = Comments(id=5, event_id=7, user_id=1, content="Hi", created_at=now, user=author)
+    written = orjson.loads(serializer(CommentResponse).dumps(comment))
+    assert written == jsonable_encoder(CommentResponse.model_validate(comment))
+    assert written["author"] == {"id": 1, "name": "Ala", "role": "student"}
+
+    assert serializer(EventResponse).dumps(None) == b"null"
+    assert serializer(EventResponse).dumps({"error": "Event not found"}) == b'{"error":"Event not found"}'
+    assert serializer(EventResponse).dumps([]) == b"[]"
+    event.latitude = Decimal("51.25")
+    assert orjson.loads(serializer(EventResponse).dumps(event))["latitude"] == 51.25
+
+
+@pytest.mark.asyncio
+async def test_list_endpoints_return_response_model_fields(client, db_session: AsyncSession):
+    """
+    1) GET /events, /events/{id} and /comments/{event_id} return the fields of their response models only.
+    2) The cached copy of a list is the same body.
+    """
+    user = Users(name="Serializer User", email="serializer@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    event = Events(title="Serialized", datetime=datetime.utcnow() + timedelta(days=1), created_by=user.id, visibility="public")
+    db_session.add(event)
+    await db_session.commit()
+    db_session.add(Comments(event_id=event.id, user_id=user.id, content="First"))
+    await db_session.commit()
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+
+    events = await client.get("/events", params={"created_by": user.id}, headers=headers)
+    assert events.status_code == 200 and events.headers["content-type"] == "application/json"
+    assert [set(e) for e in events.json()] == [set(EventResponse.model_fields)]
+    assert events.json()[0]["id"] == event.id and events.json()[0]["title"] == "Serialized"
+    again = await client.get("/events", params={"created_by": user.id}, headers=headers)
+    assert again.content == events.content
+
+    single = await client.get(f"/events/{event.id}", headers=headers)
+    assert single.json() == events.json()[0]
+    missing = await client.get("/events/999999", headers=headers)
+    assert missing.status_code == 404 and missing.json() == {"detail": "Event not found"}
+
+    comments = (await client.get(f"/comments/{event.id}", headers=headers)).json()
+    assert [set(c) for c in comments] == [set(PlainCommentResponse.model_fields)]
+    assert comments[0]["content"] == "First" and comments[0]["user_id"] == user.id
+
+
+@pytest.mark.asyncio
+async def test_projection_reads_rows_not_entities(db_session: AsyncSession, count_queries):
+    """
+    1) With `fields` the controllers select only those columns and return Row tuples,
+       without adding instances to the session's identity map.
+    2) An events page always carries the id and datetime its next cursor needs.
+    """
+    user = Users(name="Projected User", email="projected@example.com", password_hash="x", role="org")
+    db_session.add(user)
+    await db_session.commit()
+    start = datetime.utcnow() + timedelta(days=1)
+    db_session.add_all([Events(title=f"Projected {i}", datetime=start + timedelta(hours=i), created_by=user.id) for i in range(3)])
+    await db_session.commit()
+    db_session.expunge_all()
+
+    with count_queries() as statements:
+        page, has_more = await EventController(db_session).get_events_page(limit=2, created_by=user.id, fields=("title",))
+    assert has_more and [row.title for row in page] == ["Projected 0", "Projected 1"]
+    assert page[1].id and page[1].datetime == start + timedelta(hours=1)
+    assert "description" not in statements[0] and "geohash" not in statements[0]
+    assert len(db_session.identity_map) == 0
+
+    [row] = await UserController(db_session).get_users(email="projected@", fields=("id", "name"))
+    assert tuple(row) == (user.id, "Projected User")
+    assert len(db_session.identity_map) == 0
+
+
+@pytest.mark.asyncio
+async def test_sparse_fieldsets(client, db_session: AsyncSession):
+    """
+    1) `fields=` narrows list responses to the named fields; the next-page cursor still works.
+    2) Each fieldset has its own ETag and cache entry; the same query in another spelling shares it.
+    3) Unknown fields are a 400.
+    """
+    user = Users(name="Sparse User", email="sparse@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    start = datetime.utcnow() + timedelta(days=1)
+    events = [Events(title=f"Sparse {i}", description="long text", datetime=start + timedelta(hours=i), created_by=user.id) for i in range(3)]
+    db_session.add_all(events)
+    await db_session.commit()
+    db_session.add(Comments(event_id=events[0].id, user_id=user.id, content="Sparse comment"))
+    await db_session.commit()
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+
+    params = {"created_by": user.id, "limit": 2, "fields": "title,id"}
+    first = await client.get("/events", params=params, headers=headers)
+    assert first.json() == [{"id": events[0].id, "title": "Sparse 0"}, {"id": events[1].id, "title": "Sparse 1"}]
+    rest = await client.get("/events", params={**params, "cursor": first.headers["X-Next-Cursor"]}, headers=headers)
+    assert rest.json() == [{"id": events[2].id, "title": "Sparse 2"}]
+    reordered = await client.get(f"/events?fields=id,%20title&limit=2&created_by={user.id}&unused=1", headers=headers)
+    assert reordered.headers["X-Cache"] == "HIT" and reordered.headers["ETag"] == first.headers["ETag"]
+
+    url = f"/comments/{events[0].id}"
+    sparse = await client.get(url, params={"fields": "content"}, headers=headers)
+    full = await client.get(url, headers=headers)
+    assert sparse.json() == [{"content": "Sparse comment"}]
+    assert full.json()[0]["content"] == "Sparse comment" and len(full.json()[0]) == len(PlainCommentResponse.model_fields)
+    assert sparse.headers["ETag"] != full.headers["ETag"]
+    assert (await client.get(url, params={"fields": "content"}, headers=headers)).json() == sparse.json()
+
+    users = await client.get("/users", params={"name": "Sparse", "fields": "name"}, headers=headers)
+    assert users.json()["users"] == [{"name": "Sparse User"}]
+    by_id = await client.get("/users", params={"ids": str(user.id), "fields": "id,role"}, headers=headers)
+    assert by_id.json()["users"] == [{"id": user.id, "role": "student"}]
+
+    bad = await client.get("/events", params={"fields": "title,password_hash"}, headers=headers)
+    assert bad.status_code == 400 and "password_hash" in bad.json()["detail"]
+    assert (await client.get(url, params={"fields": ","}, headers=headers)).status_code == 400
@@ -0,0 +1,162 @@
+import pytest
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import user_auth
+from api.api_objects import AttendanceBase, CommentBase, EventBase, EventUpdate, LikeBase
+from api.pagination import encode_sync_token
+from db.db_controller_attendance import AttendanceController
+from db.db_controller_comments import CommentController
+from db.db_controller_events import EventController
+from db.db_controller_likes import LikeController
+from db.db_controller_sync import SyncController
+from db.db_controller_user import UserController
+from db.db_models import Users, ChangeLog
+
+
+async def _user(db_session: AsyncSession, name: str) -> Users:
+    user = Users(name=name, email=f"{name.lower()}@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    return user
+
+
+def _event(title: str, user: Users) -> EventBase:
+    return EventBase(title=title, event_datetime=datetime.utcnow() + timedelta(days=1), visibility="public", created_by=user.id)
+
+
+@pytest.mark.asyncio
+async def test_changes_since_reports_upserts_and_deletes(db_session: AsyncSession):
+    """
+    1) Without changes the head is (0, 0).
+    2) Writes through the controllers show up as upserted rows with their current state.
+    3) Deletes after the returned position show up as deleted keys.
+    """
+    sync = SyncController(db_session)
+    assert await sync.head() == (0, 0)
+
+    user = await _user(db_session, "Syncer")
+    event_id = await EventController(db_session).add_event(_event("Synced", user))
+    comment_id = await CommentController(db_session).add_comment(CommentBase(event_id=event_id, user_id=user.id, content="hi"))
+    await LikeController(db_session).add_like(LikeBase(user_id=user.id, event_id=event_id))
+    await AttendanceController(db_session).add_attendance(AttendanceBase(user_id=user.id, event_id=event_id, status="going"))
+
+    changes = await sync.changes_since((0, 0), limit=100)
+    assert not changes["has_more"]
+    assert [e.id for e in changes["events"]["upserted"]] == [event_id]
+    assert changes["events"]["upserted"][0].like_count == 1
+    assert [c.id for c in changes["comments"]["upserted"]] == [comment_id]
+    assert [(l.event_id, l.user_id) for l in changes["likes"]["upserted"]] == [(event_id, user.id)]
+    assert [a.status for a in changes["attendance"]["upserted"]] == ["going"]
+    assert changes["position"] == await sync.head()
+
+    await CommentController(db_session).delete_comment(comment_id)
+    await LikeController(db_session).remove_like(LikeBase(user_id=user.id, event_id=event_id))
+
+    later = await sync.changes_since(changes["position"], limit=100)
+    assert later["comments"] == {"upserted": [], "deleted": [comment_id]}
+    assert later["likes"] == {"upserted": [], "deleted": [{"event_id": event_id, "user_id": user.id}]}
+    assert [e.like_count for e in later["events"]["upserted"]] == [0]
+    assert later["attendance"] == {"upserted": [], "deleted": []}
+
+    nothing = await sync.changes_since(later["position"], limit=100)
+    assert nothing["position"] == later["position"] and nothing["events"]["upserted"] == []
+
+
+@pytest.mark.asyncio
+async def test_paging_with_limit(db_session: AsyncSession):
+    """
+    With more changes than `limit`, has_more is set and following the
+    returned positions visits every change exactly once.
+    """
+    user = await _user(db_session, "Pager")
+    ctrl = EventController(db_session)
+    created = [await ctrl.add_event(_event(f"Paged {i}", user)) for i in range(5)]
+
+    sync = SyncController(db_session)
+    position, seen, pages = (0, 0), [], 0
+    while True:
+        changes = await sync.changes_since(position, limit=2)
+        seen += [e.id for e in changes["events"]["upserted"]]
+        position = changes["position"]
+        pages += 1
+        if not changes["has_more"]:
+            break
+    assert seen == created
+    assert pages == 3
+
+
+@pytest.mark.asyncio
+async def test_open_transaction_holds_back_later_commits(db_session: AsyncSession, async_engine):
+    """
+    1) A change logged by a still running transaction hides every change committed after it.
+    2) Once it commits, both changes are returned in txid order, nothing is skipped.
+    """
+    user = await _user(db_session, "Ordered")
+    sync = SyncController(db_session)
+
+    async with async_engine.connect() as slow:
+        await slow.execute(insert(ChangeLog).values(entity="event", event_id=999, row_id=999))
+        event_id = await EventController(db_session).add_event(_event("Fast", user))
+
+        held = await sync.changes_since((0, 0), limit=100)
+        assert held["events"] == {"upserted": [], "deleted": []}
+        assert held["position"] == (0, 0)
+
+        await slow.commit()
+
+    changes = await sync.changes_since((0, 0), limit=100)
+    assert [e.id for e in changes["events"]["upserted"]] == [event_id]
+    assert changes["events"]["deleted"] == [999]
+
+
+@pytest.mark.asyncio
+async def test_cascading_deletes_are_logged(db_session: AsyncSession):
+    """
+    Deleting a user logs the events, comments, likes and attendance removed with them.
+    """
+    owner = await _user(db_session, "Owner")
+    other = await _user(db_session, "Other")
+    event_id = await EventController(db_session).add_event(_event("Owned", owner))
+    comment_id = await CommentController(db_session).add_comment(CommentBase(event_id=event_id, user_id=other.id, content="x"))
+    await LikeController(db_session).add_like(LikeBase(user_id=owner.id, event_id=event_id))
+
+    sync = SyncController(db_session)
+    position = await sync.head()
+    owner_id = owner.id
+    assert await UserController(db_session).delete_user(owner_id)
+
+    changes = await sync.changes_since(position, limit=100)
+    assert changes["events"]["deleted"] == [event_id]
+    assert changes["comments"]["deleted"] == [comment_id]
+    assert changes["likes"]["deleted"] == [{"event_id": event_id, "user_id": owner_id}]
+
+
+@pytest.mark.asyncio
+async def test_sync_endpoint(client, db_session: AsyncSession):
+    """
+    1) GET /sync without a token returns only a token.
+    2) Polling with it returns the changes made since, and a new token.
+    3) Malformed tokens get 400, expired ones 410.
+    """
+    user = await _user(db_session, "Client")
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+
+    start = await client.get("/sync", headers=headers)
+    assert start.status_code == 200
+    assert start.json()["events"] == {"upserted": [], "deleted": []}
+
+    event_id = await EventController(db_session).add_event(_event("Polled", user))
+    await EventController(db_session).update_event(event_id, EventUpdate(title="Polled again"))
+
+    polled = await client.get("/sync", params={"since": start.json()["token"]}, headers=headers)
+    body = polled.json()
+    assert polled.status_code == 200
+    assert [e["title"] for e in body["events"]["upserted"]] == ["Polled again"]
+    assert body["token"] != start.json()["token"]
+
+    assert (await client.get("/sync", params={"since": "not-a-token"}, headers=headers)).status_code == 400
+    expired = encode_sync_token(0, 0, issued_at=0)
+    assert (await client.get("/sync", params={"since": expired}, headers=headers)).status_code == 410
@@ -0,0 +1,114 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api import tracing as tracing_module
+from api import user_auth
+from api.response_cache import MemoryCacheBackend, response_cache
+from api.tracing import build_exporter, tracing
+from db.db_models import Users, Events
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest_asyncio.fixture
+async def spans(db_session: AsyncSession):
+    exporter = InMemorySpanExporter()
+    tracing.configure(exporter, ratio=1.0, batch=False)
+    tracing_module.install(db_session.bind)
+    try:
+        yield exporter
+    finally:
+        tracing.configure(None)
+
+
+async def _seed(db_session: AsyncSession):
+    user = Users(name="Trace User", email="trace@example.com", password_hash="x", role="student")
+    db_session.add(user)
+    await db_session.commit()
+    event = Events(title="Traced Event", datetime=datetime.utcnow() + timedelta(days=1), created_by=user.id)
+    db_session.add(event)
+    await db_session.commit()
+    headers = {"Authorization": "Bearer " + user_auth.create_access_token(user_auth.token_claims(user))}
+    return event, headers
+
+
+@pytest.mark.asyncio
+async def test_request_spans_nest_auth_controllers_and_sql(client, db_session: AsyncSession, spans):
+    """
+    1) The request span is named after the route and continues the caller's traceparent.
+    2) get_current_user (with token decoding) and controller methods are its children.
+    3) SQL statements are children of the controller method running them, without parameters.
+    """
+    event, headers = await _seed(db_session)
+    headers["traceparent"] = f"00-{TRACE_ID}-{PARENT_ID}-01"
+    assert (await client.get(f"/events/{event.id}", headers=headers)).status_code == 200
+
+    finished = spans.get_finished_spans()
+    by_name = {s.name: s for s in finished}
+    request = by_name["GET /events/{event_id}"]
+    assert format(request.context.trace_id, "032x") == TRACE_ID
+    assert format(request.parent.span_id, "016x") == PARENT_ID
+    assert request.attributes["http.route"] == "/events/{event_id}"
+    assert request.attributes["http.response.status_code"] == 200
+    assert all(s.context.trace_id == request.context.trace_id for s in finished)
+
+    auth = by_name["get_current_user"]
+    assert auth.parent.span_id == request.context.span_id
+    assert by_name["decode_token"].parent.span_id == auth.context.span_id
+
+    controller = by_name["EventController.get_event_version"]
+    assert controller.parent.span_id == request.context.span_id
+    sql = [s for s in finished if s.parent and s.parent.span_id == controller.context.span_id]
+    assert sql and sql[0].name == "SELECT"
+    assert sql[0].attributes["db.system"] == "postgresql"
+    assert "?" in sql[0].attributes["db.statement"] and str(event.id) not in sql[0].attributes["db.statement"]
+
+
+@pytest.mark.asyncio
+async def test_sampling_follows_the_ratio_and_the_callers_decision(client, db_session: AsyncSession, spans):
+    """
+    1) With ratio 0 a request starting its own trace records nothing, SQL included.
+    2) A caller's sampled traceparent is recorded anyway, an unsampled one is not.
+    3) With tracing off the app serves requests as usual.
+    """
+    event, headers = await _seed(db_session)
+    exporter = InMemorySpanExporter()  # configure() shuts the previous exporter down
+    tracing.configure(exporter, ratio=0.0, batch=False)
+    path = f"/events/{event.id}"
+
+    assert (await client.get(path, headers=headers)).status_code == 200
+    assert (await client.get(path, headers={**headers, "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})).status_code == 200
+    assert exporter.get_finished_spans() == ()
+
+    response_cache.backend = MemoryCacheBackend()  # so the sampled request reads the database
+    assert (await client.get(path, headers={**headers, "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})).status_code == 200
+    recorded = len(exporter.get_finished_spans())
+    assert {"GET /events/{event_id}", "get_current_user", "SELECT"} <= {s.name for s in exporter.get_finished_spans()}
+
+    tracing.configure(None)
+    assert (await client.get(path, headers=headers)).status_code == 200
+    assert not tracing.enabled and len(exporter.get_finished_spans()) == recorded
+
+
+@pytest.mark.asyncio
+async def test_file_exporter_writes_json_lines(client, db_session: AsyncSession, monkeypatch, tmp_path):
+    """Finished spans are appended to TRACING_FILE as one JSON object per line once exported."""
+    event, headers = await _seed(db_session)
+    monkeypatch.setenv("TRACING_FILE", str(tmp_path / "traces.jsonl"))
+    tracing.configure(build_exporter("file"), ratio=1.0)
+    try:
+        await client.get(f"/events/{event.id}", headers=headers)
+    finally:
+        tracing.configure(None)  # flushes the batch
+
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    assert lines and "GET /events/{event_id}" in {json.loads(line)["name"] for line in lines}
+    with pytest.raises(ValueError):
+        build_exporter("zipkin")
+    assert build_exporter("off") is None
@@ -1,7 +1,7 @@
 import pytest
 from sqlalchemy.exc import IntegrityError
 
-from db.db_controller_user import UserController
+from db.db_controller_user import UserController, public_profile_cache
 from api.api_objects import UserCreate, UserUpdate
 
 
@@ -128,3 +128,33 @@ async def test_delete_user_and_login(db_session):
     assert await ctrl.login_user(email="eve@example.com", password="secret") is None
 
     assert await ctrl.delete_user(uid) is False
+
+
+@pytest.mark.asyncio
+async def test_get_public_profiles_batch_and_cache(db_session, count_queries):
+    """
+    1) Three users are resolved with one IN query, in the requested order, duplicates collapsed.
+    2) A second lookup is served from the profile cache without SQL.
+    3) update_user(...) invalidates only that user's cached profile.
+    """
+    public_profile_cache.clear()
+    ctrl = UserController(db_session)
+    ids = []
+    for i in range(3):
+        ids.append(await ctrl.add_user(UserCreate(name=f"Batch {i}", email=f"batch{i}@example.com", role="student", password="pw")))
+
+    with count_queries() as statements:
+        profiles = await ctrl.get_public_profiles([ids[2], ids[0], ids[1], ids[0], 9999])
+        assert [p.name for p in profiles] == ["Batch 2", "Batch 0", "Batch 1"]
+        assert len(statements) == 1
+
+        again = await ctrl.get_public_profiles(ids)
+        assert [p.id for p in again] == ids
+        assert len(statements) == 1
+
+    await ctrl.update_user(ids[1], UserUpdate(name="Renamed"))
+    assert public_profile_cache.get(ids[1]) is None
+    assert public_profile_cache.get(ids[0]) is not None
+
+    refreshed = await ctrl.get_public_profiles([ids[1]])
+    assert refreshed[0].name == "Renamed"
@@ -2,6 +2,7 @@ import 'dart:convert';
 import 'package:http/http.dart' as http;
 import '../config.dart';
 import '../services/auth_service.dart';
+import '../services/conditional_http.dart';
 
 class AttendanceApi {
   Future<Map<String, String>> _authHeaders() async {
@@ -38,7 +39,7 @@ class AttendanceApi {
   Future<List<Map<String, dynamic>>> getAttendanceByEvent(int eventId) async {
     final url = Uri.parse('$baseUrl/attendance/event/$eventId');
     final headers = await _authHeaders();
-    final response = await http.get(url, headers: headers);
+    final response = await ConditionalHttp.get(url, headers: headers);
 
     if (response.statusCode == 200) {
       final List<dynamic> jsonList = jsonDecode(response.body);
@@ -3,11 +3,12 @@ import 'package:http/http.dart' as http;
 import '../models/comment.dart';
 import '../config.dart';
 import '../services/auth_service.dart';
+import '../services/conditional_http.dart';
 
 class CommentsApi {
   static Future<List<Comment>> getCommentsForEvent(int eventId) async {
     final token = await AuthService.getToken();
-    final response = await http.get(
+    final response = await ConditionalHttp.get(
       Uri.parse('$baseUrl/comments/$eventId'),
       headers: {
         'Content-Type': 'application/json',
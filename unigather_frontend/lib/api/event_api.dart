@@ -1,23 +1,60 @@
 import 'dart:convert';
 import 'package:http/http.dart' as http;
 import '../models/event.dart';
+import '../models/event_detail.dart';
 import '../config.dart';
 import '../services/auth_service.dart';
+import '../services/conditional_http.dart';
 
 class EventApi {
   static Future<List<Event>> getEvents({
     int? createdBy,
     String? visibility,
+    bool upcoming = false,
+    DateTime? dateFrom,
+    DateTime? dateTo,
+  }) async {
+    final events = <Event>[];
+    String? cursor;
+    do {
+      final page = await getEventsPage(
+        createdBy: createdBy,
+        visibility: visibility,
+        upcoming: upcoming,
+        dateFrom: dateFrom,
+        dateTo: dateTo,
+        cursor: cursor,
+      );
+      events.addAll(page.events);
+      cursor = page.nextCursor;
+    } while (cursor != null);
+    return events;
+  }
+
+  /// Fetches a single page of events; pass [EventPage.nextCursor] to get the next one.
+  static Future<EventPage> getEventsPage({
+    int? createdBy,
+    String? visibility,
+    bool upcoming = false,
+    DateTime? dateFrom,
+    DateTime? dateTo,
+    int? limit,
+    String? cursor,
   }) async {
     final token = await AuthService.getToken();
     final uri = Uri.parse('$baseUrl/events').replace(
       queryParameters: {
         if (createdBy != null) 'created_by': createdBy.toString(),
         if (visibility != null) 'visibility': visibility,
+        if (upcoming) 'upcoming': 'true',
+        if (dateFrom != null) 'date_from': dateFrom.toIso8601String(),
+        if (dateTo != null) 'date_to': dateTo.toIso8601String(),
+        if (limit != null) 'limit': limit.toString(),
+        if (cursor != null) 'cursor': cursor,
       },
     );
 
-    final response = await http.get(
+    final response = await ConditionalHttp.get(
       uri,
       headers: {
         'Authorization': 'Bearer $token',
@@ -27,7 +64,10 @@ class EventApi {
 
     if (response.statusCode == 200) {
       final List<dynamic> data = jsonDecode(response.body);
-      return data.map((json) => Event.fromJson(json)).toList();
+      return EventPage(
+        data.map((json) => Event.fromJson(json)).toList(),
+        response.headers['x-next-cursor'],
+      );
     } else {
       throw Exception('Failed to load events');
     }
@@ -36,7 +76,7 @@ class EventApi {
   static Future<Event> getEvent(int eventId) async {
     final token = await AuthService.getToken();
     final uri = Uri.parse('$baseUrl/events/$eventId');
-    final response = await http.get(
+    final response = await ConditionalHttp.get(
       uri,
       headers: {
         'Authorization': 'Bearer $token',
@@ -51,6 +91,120 @@ class EventApi {
     }
   }
 
+  /// Full text search over title, location and description, best matches
+  /// first; pass [EventPage.nextCursor] to get the next page.
+  static Future<EventPage> searchEvents(
+    String query, {
+    int? limit,
+    String? cursor,
+  }) async {
+    final token = await AuthService.getToken();
+    final uri = Uri.parse('$baseUrl/events/search').replace(
+      queryParameters: {
+        'q': query,
+        if (limit != null) 'limit': limit.toString(),
+        if (cursor != null) 'cursor': cursor,
+      },
+    );
+    final response = await http.get(
+      uri,
+      headers: {
+        'Authorization': 'Bearer $token',
+        'Content-Type': 'application/json',
+      },
+    );
+
+    if (response.statusCode == 200) {
+      final List<dynamic> data = jsonDecode(response.body);
+      return EventPage(
+        data.map((json) => Event.fromJson(json)).toList(),
+        response.headers['x-next-cursor'],
+      );
+    } else {
+      throw Exception('Failed to search events');
+    }
+  }
+
+  /// Upcoming events the user's friends are going to, interested in, liked
+  /// or created, best first. Pass [EventPage.nextCursor] to get the next page.
+  static Future<EventPage> getFeed({int? limit, String? cursor}) async {
+    final token = await AuthService.getToken();
+    final uri = Uri.parse('$baseUrl/feed').replace(
+      queryParameters: {
+        if (limit != null) 'limit': limit.toString(),
+        if (cursor != null) 'cursor': cursor,
+      },
+    );
+    final response = await http.get(
+      uri,
+      headers: {
+        'Authorization': 'Bearer $token',
+        'Content-Type': 'application/json',
+      },
+    );
+
+    if (response.statusCode == 200) {
+      final List<dynamic> data = jsonDecode(response.body);
+      return EventPage(
+        data.map((json) => Event.fromJson(json)).toList(),
+        response.headers['x-next-cursor'],
+      );
+    } else {
+      throw Exception('Failed to load feed');
+    }
+  }
+
+  /// Events within [radiusKm] of the given point, nearest first. Only events
+  /// the server could geocode are returned, with their coordinates set.
+  static Future<List<Event>> getNearbyEvents(
+    double latitude,
+    double longitude, {
+    double radiusKm = 5,
+    int? limit,
+  }) async {
+    final token = await AuthService.getToken();
+    final uri = Uri.parse('$baseUrl/events/nearby').replace(
+      queryParameters: {
+        'lat': latitude.toString(),
+        'lon': longitude.toString(),
+        'radius': radiusKm.toString(),
+        if (limit != null) 'limit': limit.toString(),
+      },
+    );
+    final response = await http.get(
+      uri,
+      headers: {
+        'Authorization': 'Bearer $token',
+        'Content-Type': 'application/json',
+      },
+    );
+
+    if (response.statusCode == 200) {
+      final List<dynamic> data = jsonDecode(response.body);
+      return data.map((json) => Event.fromJson(json)).toList();
+    } else {
+      throw Exception('Failed to load nearby events');
+    }
+  }
+
+  static Future<EventDetail> getEventDetail(int eventId) async {
+    final token = await AuthService.getToken();
+    final uri = Uri.parse('$baseUrl/events/$eventId/detail');
+    final response = await http.get(
+      uri,
+      headers: {
+        'Authorization': 'Bearer $token',
+        'Content-Type': 'application/json',
+      },
+    );
+
+    if (response.statusCode == 200) {
+      return EventDetail.fromJson(jsonDecode(response.body));
+    } else {
+      throw Exception('Event not found');
+    }
+  }
+
   static Future<void> createEvent(Event event) async {
     final token = await AuthService.getToken();
     final uri = Uri.parse('$baseUrl/events');
@@ -103,3 +257,10 @@ class EventApi {
     }
   }
 }
+
+class EventPage {
+  final List<Event> events;
+  final String? nextCursor;
+
+  EventPage(this.events, this.nextCursor);
+}
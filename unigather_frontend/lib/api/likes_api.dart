@@ -39,6 +39,26 @@ class LikesApi {
     }
   }
 
+  /// Likes (or with [remove], unlikes) several events as the signed-in user in one request,
+  /// e.g. when flushing actions queued offline. Returns per event whether it changed.
+  static Future<List<bool>> batchLikes(List<int> eventIds, {bool remove = false}) async {
+    final token = await AuthService.getToken();
+    final uri = Uri.parse('$baseUrl/likes/batch');
+    final request = http.Request(remove ? 'DELETE' : 'POST', uri)
+      ..headers.addAll({
+        'Content-Type': 'application/json',
+        'Authorization': 'Bearer $token',
+      })
+      ..body = jsonEncode({'event_ids': eventIds});
+    final response = await http.Response.fromStream(await request.send());
+
+    if (response.statusCode != 200) {
+      throw Exception('Failed to update likes');
+    }
+    final List<dynamic> results = jsonDecode(response.body)['results'];
+    return results.map((r) => r['changed'] as bool).toList();
+  }
+
   static Future<List<Like>> getUserLikes(int userId) async {
     final token = await AuthService.getToken();
     final uri = Uri.parse('$baseUrl/likes/$userId');
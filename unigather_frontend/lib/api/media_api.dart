@@ -3,12 +3,13 @@ import 'package:http/http.dart' as http;
 import '../models/media.dart';
 import '../config.dart';
 import '../services/auth_service.dart';
+import '../services/conditional_http.dart';
 
 class MediaApi {
   static Future<List<Media>> getMediaForEvent(int eventId) async {
     final token = await AuthService.getToken();
     final uri = Uri.parse('$baseUrl/media/event/$eventId');
-    final response = await http.get(
+    final response = await ConditionalHttp.get(
       uri,
       headers: {'Authorization': 'Bearer $token'},
     );
@@ -38,6 +39,22 @@ class MediaApi {
     }
   }
 
+  /// Uploads a file from disk (streamed, not read into memory) and returns the new media id.
+  static Future<int> uploadMedia(int eventId, String filePath) async {
+    final token = await AuthService.getToken();
+    final uri = Uri.parse('$baseUrl/media/upload?event_id=$eventId');
+    final request = http.MultipartRequest('POST', uri)
+      ..headers['Authorization'] = 'Bearer $token'
+      // the server tells the type from the file name
+      ..files.add(await http.MultipartFile.fromPath('file', filePath));
+    final response = await http.Response.fromStream(await request.send());
+
+    if (response.statusCode != 200) {
+      throw Exception('Failed to upload media');
+    }
+    return jsonDecode(response.body)['media_id'];
+  }
+
   static Future<void> deleteMedia(int mediaId) async {
     final token = await AuthService.getToken();
     final uri = Uri.parse('$baseUrl/media/$mediaId');
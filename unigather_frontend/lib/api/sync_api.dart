@@ -0,0 +1,82 @@
+import 'dart:convert';
+import 'package:http/http.dart' as http;
+import '../models/comment.dart';
+import '../models/event.dart';
+import '../models/like.dart';
+import '../config.dart';
+import '../services/auth_service.dart';
+
+class SyncApi {
+  /// Fetches the changes made since [token]; without a token only a starting
+  /// token is returned. Throws [SyncExpired] when the token is too old, the
+  /// caller then has to reload everything and start over.
+  static Future<SyncChanges> getChanges({String? token}) async {
+    final authToken = await AuthService.getToken();
+    final uri = Uri.parse('$baseUrl/sync').replace(
+      queryParameters: token != null ? {'since': token} : null,
+    );
+    final response = await http.get(
+      uri,
+      headers: {'Authorization': 'Bearer $authToken'},
+    );
+
+    if (response.statusCode == 200) {
+      return SyncChanges.fromJson(jsonDecode(response.body));
+    } else if (response.statusCode == 410 || response.statusCode == 400) {
+      throw SyncExpired();
+    } else {
+      throw Exception('Failed to sync changes');
+    }
+  }
+}
+
+class SyncExpired implements Exception {}
+
+class SyncChanges {
+  final String token;
+  final bool hasMore;
+  final List<Event> events;
+  final List<int> deletedEvents;
+  final List<Comment> comments;
+  final List<int> deletedComments;
+  final List<Like> likes;
+  final List<Like> deletedLikes;
+  final List<Map<String, dynamic>> attendance;
+  final List<Like> deletedAttendance;
+
+  SyncChanges({
+    required this.token,
+    required this.hasMore,
+    required this.events,
+    required this.deletedEvents,
+    required this.comments,
+    required this.deletedComments,
+    required this.likes,
+    required this.deletedLikes,
+    required this.attendance,
+    required this.deletedAttendance,
+  });
+
+  factory SyncChanges.fromJson(Map<String, dynamic> json) {
+    // deleted likes / attendance are {event_id, user_id} keys
+    List<Like> keys(dynamic list) =>
+        (list as List<dynamic>).map((json) => Like.fromJson(json)).toList();
+
+    return SyncChanges(
+      token: json['token'],
+      hasMore: json['has_more'],
+      events: (json['events']['upserted'] as List<dynamic>)
+          .map((json) => Event.fromJson(json))
+          .toList(),
+      deletedEvents: List<int>.from(json['events']['deleted']),
+      comments: (json['comments']['upserted'] as List<dynamic>)
+          .map((json) => Comment.fromJson(json))
+          .toList(),
+      deletedComments: List<int>.from(json['comments']['deleted']),
+      likes: keys(json['likes']['upserted']),
+      deletedLikes: keys(json['likes']['deleted']),
+      attendance: List<Map<String, dynamic>>.from(json['attendance']['upserted']),
+      deletedAttendance: keys(json['attendance']['deleted']),
+    );
+  }
+}
@@ -7,6 +7,13 @@ class Event {
   final DateTime datetime;
   final String location;
   final DateTime? createdAt;
+  final int likeCount;
+  final int goingCount;
+  final int interestedCount;
+  final int commentCount;
+  final double? latitude;
+  final double? longitude;
+  final double? distanceKm;
 
   Event({
     this.id,
@@ -17,6 +24,13 @@ class Event {
     required this.datetime,
     required this.location,
     this.createdAt,
+    this.likeCount = 0,
+    this.goingCount = 0,
+    this.interestedCount = 0,
+    this.commentCount = 0,
+    this.latitude,
+    this.longitude,
+    this.distanceKm,
   });
 
   factory Event.fromJson(Map<String, dynamic> json) => Event(
@@ -29,6 +43,13 @@ class Event {
     location: json['location'],
     createdAt:
         json['created_at'] != null ? DateTime.parse(json['created_at']) : null,
+    likeCount: json['like_count'] ?? 0,
+    goingCount: json['going_count'] ?? 0,
+    interestedCount: json['interested_count'] ?? 0,
+    commentCount: json['comment_count'] ?? 0,
+    latitude: (json['latitude'] as num?)?.toDouble(),
+    longitude: (json['longitude'] as num?)?.toDouble(),
+    distanceKm: (json['distance_km'] as num?)?.toDouble(),
   );
 
   Map<String, dynamic> toJson() => {
@@ -0,0 +1,44 @@
+import 'comment.dart';
+import 'event.dart';
+import 'media.dart';
+
+/// Response of GET /events/{id}/detail: everything the event page shows.
+class EventDetail {
+  final Event event;
+  final Map<String, int> attendanceCounts;
+  final String? viewerStatus;
+  final int likeCount;
+  final bool likedByViewer;
+  final List<Media> media;
+  final List<CommentWithUser> comments;
+
+  EventDetail({
+    required this.event,
+    required this.attendanceCounts,
+    required this.viewerStatus,
+    required this.likeCount,
+    required this.likedByViewer,
+    required this.media,
+    required this.comments,
+  });
+
+  int get goingCount => attendanceCounts['going'] ?? 0;
+
+  factory EventDetail.fromJson(Map<String, dynamic> json) => EventDetail(
+    event: Event.fromJson(json['event']),
+    attendanceCounts: Map<String, int>.from(json['attendance_counts']),
+    viewerStatus: json['viewer_status'],
+    likeCount: json['like_count'],
+    likedByViewer: json['liked_by_viewer'],
+    media: (json['media'] as List).map((m) => Media.fromJson(m)).toList(),
+    comments:
+        (json['comments'] as List)
+            .map(
+              (c) => CommentWithUser(
+                comment: Comment.fromJson(c),
+                userName: c['author']?['name'] ?? 'Unknown User',
+              ),
+            )
+            .toList(),
+  );
+}
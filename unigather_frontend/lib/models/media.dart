@@ -3,12 +3,17 @@ class Media {
   final int eventId;
   final String url;
   final String type; // e.g., "image", "video"
+  // uploaded images only, once the server has rendered it
+  final String? thumbnailUrl;
+  final String? status; // "processing", "ready", "failed"
 
   Media({
     required this.id,
     required this.eventId,
     required this.url,
     required this.type,
+    this.thumbnailUrl,
+    this.status,
   });
 
   factory Media.fromJson(Map<String, dynamic> json) {
@@ -17,6 +22,8 @@ class Media {
       eventId: json['event_id'],
       url: json['url'],
       type: json['type'],
+      thumbnailUrl: (json['variants'] as Map<String, dynamic>?)?['thumb'],
+      status: json['status'],
     );
   }
 
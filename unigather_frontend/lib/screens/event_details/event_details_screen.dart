@@ -3,10 +3,8 @@ import 'package:unigather_frontend/config.dart';
 import '../../api/attendance_api.dart';
 import '../../api/comments_api.dart';
 import '../../api/likes_api.dart';
-import '../../api/user_api.dart';
 import '../../models/event.dart';
 import '../../models/media.dart';
-import '../../api/media_api.dart';
 import 'package:share_plus/share_plus.dart';
 import '../../api/event_api.dart';
 import '../../services/auth_service.dart';
@@ -39,29 +37,37 @@ class _EventDetailsScreenState extends State<EventDetailsScreen> {
   @override
   void initState() {
     super.initState();
-    _loadUserData();
-    _fetchMedia();
+    _loadDetail();
     _fetchSimilarEvents();
-    loadCommentsWithUserNames();
   }
 
-  Future<void> _loadUserData() async {
-    _userId =
-        await AuthService.getCurrentUserId(); // Assumes AuthService has this
-    final attendanceList = await AttendanceApi().getAttendanceByEvent(
-      widget.event.id!,
-    );
-    final userIsGoing = attendanceList.any(
-      (a) => a['user_id'] == _userId && a['status'] == 'going',
-    );
-    final likeList = await LikesApi.getUserLikes(_userId!);
-    final liked = likeList.any((like) => like.eventId == widget.event.id);
-
+  // Event, attendance, likes, media and comments with authors in one request
+  Future<void> _loadDetail() async {
     setState(() {
-      _isAttending = userIsGoing;
-      _goingCount = attendanceList.where((a) => a['status'] == 'going').length;
-      _isLiked = liked;
+      _loadingComments = true;
     });
+
+    try {
+      _userId ??= await AuthService.getCurrentUserId();
+      final detail = await EventApi.getEventDetail(widget.event.id!);
+
+      setState(() {
+        _isAttending = detail.viewerStatus == 'going';
+        _goingCount = detail.goingCount;
+        _isLiked = detail.likedByViewer;
+        _mediaList = detail.media;
+        _isLoading = false;
+        _comments = detail.comments.map((c) => c.comment).toList();
+        commentsWithUsers = detail.comments;
+        _loadingComments = false;
+      });
+    } catch (e) {
+      setState(() {
+        _isLoading = false;
+        _loadingComments = false;
+      });
+      debugPrint('Error loading event details: $e');
+    }
   }
 
   Future<void> _toggleAttendance() async {
@@ -99,26 +105,14 @@ class _EventDetailsScreenState extends State<EventDetailsScreen> {
     }
   }
 
-  Future<void> _fetchMedia() async {
-    try {
-      final media = await MediaApi.getMediaForEvent(widget.event.id!);
-      setState(() {
-        _mediaList = media;
-        _isLoading = false;
-      });
-    } catch (e) {
-      setState(() => _isLoading = false);
-    }
-  }
-
   List<Event> _similarEvents = [];
   bool _loadingSimilar = true;
 
   void _fetchSimilarEvents() async {
     try {
-      final events = await EventApi.getEvents();
+      final page = await EventApi.getEventsPage(upcoming: true, limit: 10);
       setState(() {
-        _similarEvents = events;
+        _similarEvents = page.events;
         _loadingSimilar = false;
       });
     } catch (e) {
@@ -127,39 +121,6 @@ class _EventDetailsScreenState extends State<EventDetailsScreen> {
     }
   }
 
-  Future<void> loadCommentsWithUserNames() async {
-    setState(() {
-      _loadingComments = true;
-    });
-
-    try {
-      final comments = await CommentsApi.getCommentsForEvent(widget.event.id!);
-
-      final List<CommentWithUser> combined = [];
-
-      for (final comment in comments) {
-        try {
-          final user = await UserApi.getUser(comment.userId);
-          final userName = user?.name ?? 'Unknown User';
-          combined.add(CommentWithUser(comment: comment, userName: userName));
-        } catch (e) {
-          combined.add(CommentWithUser(comment: comment, userName: 'Unknown'));
-        }
-      }
-
-      setState(() {
-        _comments = comments;
-        commentsWithUsers = combined;
-        _loadingComments = false;
-      });
-    } catch (e) {
-      setState(() {
-        _loadingComments = false;
-      });
-      debugPrint('Error loading comments with usernames: $e');
-    }
-  }
-
   Future<void> _submitComment() async {
     if (_commentController.text.trim().isEmpty || _userId == null) return;
 
@@ -174,7 +135,7 @@ class _EventDetailsScreenState extends State<EventDetailsScreen> {
     try {
       await CommentsApi.addComment(newComment);
       _commentController.clear();
-      await loadCommentsWithUserNames(); // Refresh
+      await _loadDetail(); // Refresh
     } catch (e) {
       print('Failed to post comment: $e');
     }
@@ -1,7 +1,6 @@
 import 'package:flutter/material.dart';
 import 'package:flutter_map/flutter_map.dart';
 import 'package:latlong2/latlong.dart';
-import 'package:geocoding/geocoding.dart';
 
 import '../../main.dart';
 import '../../models/event.dart';
@@ -21,6 +20,8 @@ class _NearbyScreenState extends State<NearbyScreen> with RouteAware {
   Map<int, LatLng> _eventCoordinates = {};
   bool _isLoading = true;
   final Color uniRed = const Color.fromARGB(255, 124, 0, 0);
+  static final LatLng _mapCenter = LatLng(51.1091, 17.0605); // Plac Grunwaldzki
+  static const double _radiusKm = 5;
   @override
   void didChangeDependencies() {
     super.didChangeDependencies();
@@ -56,24 +57,19 @@ class _NearbyScreenState extends State<NearbyScreen> with RouteAware {
 
   Future<void> _loadEventsAndCoordinates() async {
     try {
-      final fetchedEvents = await EventApi.getEvents();
-      Map<int, LatLng> coordsMap = {};
-
-      for (var event in fetchedEvents) {
-        if (event.id == null) continue;
-
-        try {
-          List<Location> locations = await locationFromAddress(event.location);
-          if (locations.isNotEmpty) {
-            coordsMap[event.id!] = LatLng(
-              locations[0].latitude,
-              locations[0].longitude,
-            );
-          }
-        } catch (e) {
-          debugPrint('Geocoding failed for "${event.location}": $e');
-        }
-      }
+      // the server geocodes events when they are saved, no lookups on the device
+      final fetchedEvents = await EventApi.getNearbyEvents(
+        _mapCenter.latitude,
+        _mapCenter.longitude,
+        radiusKm: _radiusKm,
+      );
+      Map<int, LatLng> coordsMap = {
+        for (var event in fetchedEvents)
+          if (event.id != null &&
+              event.latitude != null &&
+              event.longitude != null)
+            event.id!: LatLng(event.latitude!, event.longitude!),
+      };
 
       setState(() {
         events = fetchedEvents;
@@ -133,7 +129,7 @@ class _NearbyScreenState extends State<NearbyScreen> with RouteAware {
               height: 400,
               child: FlutterMap(
                 options: MapOptions(
-                  center: LatLng(51.1091, 17.0605), // Plac Grunwaldzki
+                  center: _mapCenter,
                   zoom: 15.0,
                 ),
                 children: [
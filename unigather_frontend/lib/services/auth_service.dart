@@ -1,6 +1,7 @@
 import 'dart:convert';
 import 'package:shared_preferences/shared_preferences.dart';
 import '../models/user.dart';
+import 'conditional_http.dart';
 
 class AuthService {
   static const _tokenKey = 'access_token';
@@ -35,6 +36,7 @@ class AuthService {
     final prefs = await SharedPreferences.getInstance();
     await prefs.remove(_tokenKey);
     await prefs.remove(_userKey);
+    ConditionalHttp.clear();
   }
 
   static Future<int?> getCurrentUserId() async {
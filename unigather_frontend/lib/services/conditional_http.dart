@@ -0,0 +1,37 @@
+import 'package:http/http.dart' as http;
+
+/// GET with ETag revalidation: remembers the last response per URL and sends
+/// its ETag as If-None-Match, so an unchanged list comes back as an empty 304
+/// and the remembered response is returned instead.
+class ConditionalHttp {
+  static const int _maxEntries = 200;
+  static final Map<String, http.Response> _responses = {};
+
+  static Future<http.Response> get(Uri uri, {Map<String, String>? headers}) async {
+    final key = uri.toString();
+    final cached = _responses[key];
+    final etag = cached?.headers['etag'];
+
+    final response = await http.get(
+      uri,
+      headers: {
+        ...?headers,
+        if (etag != null) 'If-None-Match': etag,
+      },
+    );
+
+    if (response.statusCode == 304 && cached != null) {
+      return cached;
+    }
+    _responses.remove(key);
+    if (response.statusCode == 200 && response.headers['etag'] != null) {
+      _responses[key] = response;
+      if (_responses.length > _maxEntries) {
+        _responses.remove(_responses.keys.first);
+      }
+    }
+    return response;
+  }
+
+  static void clear() => _responses.clear();
+}